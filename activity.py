@@ -0,0 +1,395 @@
+import json
+import logging
+import os
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from predictions import area_mapping, area_range, crm_cd_range
+from ingestion import FileLock
+from storage import CsvStore, open_store, parse_date_occ, parse_dates_occ
+
+
+ACTIVITY_SNAPSHOT_PATH = os.environ.get("CRPS_ACTIVITY_SNAPSHOT", "activity_counts.npz")
+
+# Days of per-(AREA, Crm Cd) counts kept in the ring buffer
+HISTORY_DAYS = int(os.environ.get("CRPS_ACTIVITY_DAYS", "365"))
+
+# Dataset columns the counters are built from
+ACTIVITY_COLUMNS = ["DATE OCC", "AREA", "AREA NAME", "Crm Cd"]
+
+AREA_CODES = {name: code for code, name in area_mapping.items()}
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def source_offsets(paths):
+    """
+    Current size of each crime CSV, 0 for files that do not exist yet
+    """
+    return {path: os.path.getsize(path) if os.path.exists(path) else 0 for path in paths}
+
+
+class ActivityCounters:
+    """
+    Crime counts per (AREA, Crm Cd, day) over the last ``history_days`` days
+
+    Counts live in one uint32 array of shape (days, areas, crime codes)
+    used as a ring buffer: day ``d`` is stored in slot ``d % days`` and a
+    slot is zeroed when the day it holds falls out of the window. Adding a
+    record is an array increment and a window sum reads only the slots of
+    the window, so neither touches the stored datasets.
+
+    Snapshots are checkpoints of storage rather than of a worker's counts:
+    they count the rows of each dataset CSV before the byte offset recorded
+    with them, see ``restore``. Only the non-zero cells are written, so a
+    snapshot is a small fraction of the in-memory array.
+    """
+
+    def __init__(self, history_days=HISTORY_DAYS, counts=None, last_day=None, offsets=None):
+        self.history_days = history_days
+        self.counts = counts if counts is not None else np.zeros(
+            (history_days, len(area_range), len(crm_cd_range)), dtype=np.uint32
+        )
+        self.last_day = last_day
+        # Dataset CSV sizes the counts were taken at, when built from storage
+        self.offsets = offsets
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def _advance(self, day):
+        # Zero the slots of the days between the newest stored day and ``day``
+        if self.last_day is None or day <= self.last_day:
+            self.last_day = day if self.last_day is None else self.last_day
+            return
+        if day - self.last_day >= self.history_days:
+            self.counts[:] = 0
+        else:
+            self.counts[np.arange(self.last_day + 1, day + 1) % self.history_days] = 0
+        self.last_day = day
+
+    def add_counts(self, days, areas, codes):
+        """
+        Count crimes given as arrays of day ordinals, AREA codes and Crm Cds
+
+        Records dated in the future, before the window or with codes outside
+        ``area_range``/``crm_cd_range`` are not counted.
+        """
+        days, areas, codes = (
+            np.asarray(values, dtype=np.float64) for values in (days, areas, codes)
+        )
+        today = date.today().toordinal()
+        keep = (
+            (days <= today) & (days > today - self.history_days)
+            & (areas >= area_range.start) & (areas < area_range.stop)
+            & (codes >= crm_cd_range.start) & (codes < crm_cd_range.stop)
+        )
+        flat = np.ravel_multi_index(
+            (
+                days[keep].astype(np.int64) % self.history_days,
+                areas[keep].astype(np.int64) - area_range.start,
+                codes[keep].astype(np.int64) - crm_cd_range.start,
+            ),
+            self.counts.shape,
+        )
+        cells, counts = np.unique(flat, return_counts=True)
+        with self._lock:
+            self._advance(today)
+            self.counts.reshape(-1)[cells] += counts.astype(np.uint32)
+            self.dropped += int((~keep).sum())
+
+    def add(self, record):
+        """
+        Count one crime record
+
+        Args:
+            record (dict): Row keyed by dataset column names
+        """
+        occurred = parse_date_occ(record.get("DATE OCC"))
+        # Reports may name the area without its code
+        area = record.get("AREA") or AREA_CODES.get(record.get("AREA NAME"))
+        code = record.get("Crm Cd")
+        if occurred is None or area in (None, "") or code in (None, ""):
+            with self._lock:
+                self.dropped += 1
+            return
+        self.add_counts([occurred.toordinal()], [float(area)], [float(code)])
+
+    def add_frame(self, df):
+        """
+        Count every row of a DataFrame of crime records
+        """
+        if not {"DATE OCC", "Crm Cd"} <= set(df.columns):
+            return
+        occurred = parse_dates_occ(df["DATE OCC"])
+        days = (occurred.dt.normalize() - pd.Timestamp("1970-01-01")).dt.days + EPOCH_ORDINAL
+        areas = pd.Series(np.nan, index=df.index)
+        if "AREA" in df:
+            areas = pd.to_numeric(df["AREA"], errors="coerce")
+        if "AREA NAME" in df:
+            areas = areas.fillna(df["AREA NAME"].astype("object").map(AREA_CODES))
+        codes = pd.to_numeric(df["Crm Cd"], errors="coerce")
+        self.add_counts(
+            days.to_numpy(dtype=np.float64, na_value=np.nan),
+            areas.to_numpy(dtype=np.float64, na_value=np.nan),
+            codes.to_numpy(dtype=np.float64, na_value=np.nan),
+        )
+
+    @classmethod
+    def rebuild(cls, paths, history_days=HISTORY_DAYS):
+        """
+        Build the counters from scratch out of the stored datasets
+
+        Args:
+            paths (list): Crime dataset paths, read through ``open_store``
+        """
+        counters = cls(history_days)
+        for path in paths:
+            store = open_store(path)
+            columns = [col for col in ACTIVITY_COLUMNS if col in store.columns()]
+            if not {"DATE OCC", "Crm Cd"} <= set(columns):
+                continue
+            counters.add_frame(store.read(columns=columns))
+            logging.info(f"Counted recent crime activity from {path}.")
+        return counters
+
+    def add_tail(self, path, offset):
+        """
+        Count the rows of a crime CSV that start at or after byte ``offset``
+        """
+        store = CsvStore(path, offset)
+        columns = [col for col in ACTIVITY_COLUMNS if col in store.columns()]
+        if {"DATE OCC", "Crm Cd"} <= set(columns):
+            self.add_frame(store.read(columns=columns))
+
+    @classmethod
+    def restore(cls, paths, path=ACTIVITY_SNAPSHOT_PATH, history_days=HISTORY_DAYS):
+        """
+        Count every row stored in ``paths``, starting from the last snapshot
+
+        The snapshot counts the rows before the CSV offsets it records, so
+        only rows appended since, by any worker or by bulk imports, are read.
+        Without a usable snapshot the counters are rebuilt from scratch. The
+        caller holds the dataset lock so the files do not grow meanwhile.
+
+        Args:
+            paths (list): Crime dataset CSV paths
+            path (str): Snapshot written by ``save``
+
+        Returns:
+            ActivityCounters: Counters of the stored rows, with ``offsets``
+            set to the current file sizes
+        """
+        offsets = source_offsets(paths)
+        counters = None
+        if os.path.exists(path):
+            try:
+                counters = cls.load(path)
+            except (KeyError, ValueError, OSError) as e:
+                logging.warning(f"Ignoring activity snapshot {path}: {e}")
+        usable = (
+            counters is not None
+            and counters.offsets is not None
+            and set(counters.offsets) == set(paths)
+            and all(counters.offsets[p] <= offsets[p] for p in paths)
+        )
+        if usable:
+            for p in paths:
+                if offsets[p] > counters.offsets[p]:
+                    counters.add_tail(p, counters.offsets[p])
+        else:
+            counters = cls.rebuild(paths, history_days)
+        counters.offsets = offsets
+        return counters
+
+    def save(self, path=ACTIVITY_SNAPSHOT_PATH):
+        """
+        Snapshot the counters to disk, replacing any previous snapshot at once
+
+        Only counters fresh from ``restore`` or ``rebuild`` match the
+        offsets they are saved with; counts added since may be stored
+        after those offsets and would be counted twice.
+        """
+        if self.offsets is None:
+            raise ValueError("Only counters built from storage can be snapshotted.")
+        with self._lock:
+            flat = self.counts.reshape(-1)
+            cells = np.flatnonzero(flat)
+            values = flat[cells]
+            last_day = -1 if self.last_day is None else self.last_day
+        # Per-process temporary file; uvicorn workers share the snapshot path
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                shape=self.counts.shape,
+                cells=cells,
+                values=values,
+                last_day=last_day,
+                area_start=area_range.start,
+                crm_cd_start=crm_cd_range.start,
+                offsets=json.dumps(self.offsets),
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=ACTIVITY_SNAPSHOT_PATH):
+        with np.load(path) as snapshot:
+            if (int(snapshot["area_start"]), int(snapshot["crm_cd_start"])) != (
+                area_range.start, crm_cd_range.start
+            ):
+                raise ValueError(f"{path} was written for other AREA/Crm Cd ranges.")
+            counts = np.zeros(tuple(snapshot["shape"]), dtype=np.uint32)
+            counts.reshape(-1)[snapshot["cells"]] = snapshot["values"]
+            last_day = int(snapshot["last_day"])
+            offsets = json.loads(str(snapshot["offsets"])) if "offsets" in snapshot.files else None
+        counters = cls(len(counts), counts, None if last_day < 0 else last_day, offsets)
+        with counters._lock:
+            counters._advance(date.today().toordinal())
+        return counters
+
+    def window_counts(self, days, end=None, area=None, crm_cd=None):
+        """
+        Counts per (AREA, Crm Cd) over the ``days`` days ending on ``end``
+
+        Args:
+            days (int): Window length in days
+            end (date): Last day of the window, today by default
+            area (int): Only sum this AREA
+            crm_cd (int): Only sum this crime code
+
+        Returns:
+            ndarray: int64 counts of shape (areas, crime codes), indexed from
+            ``area_range.start`` and ``crm_cd_range.start``, with a single
+            row or column when ``area`` or ``crm_cd`` is given
+        """
+        today = date.today().toordinal()
+        end_day = today if end is None else end.toordinal()
+        if days < 1 or end_day > today or end_day - days + 1 <= today - self.history_days:
+            raise ValueError(
+                f"Windows must lie within the last {self.history_days} days."
+            )
+        slots = np.arange(end_day - days + 1, end_day + 1) % self.history_days
+        areas = codes = slice(None)
+        if area is not None:
+            areas = slice(area - area_range.start, area - area_range.start + 1)
+        if crm_cd is not None:
+            codes = slice(crm_cd - crm_cd_range.start, crm_cd - crm_cd_range.start + 1)
+        with self._lock:
+            self._advance(today)
+            return self.counts[slots, areas, codes].sum(axis=0, dtype=np.int64)
+
+    def query(self, windows, end=None, area=None, crm_cd=None):
+        """
+        Window sums for an area and/or crime code, with a breakdown
+
+        Args:
+            windows (list): Window lengths in days
+            end (date): Last day of every window, today by default
+            area (int): AREA code to restrict to
+            crm_cd (int): Crime code to restrict to
+
+        Returns:
+            dict: Per window its first day, total, and counts by Crm Cd (or
+            by AREA when ``crm_cd`` is given), non-zero entries only
+        """
+        if area is not None and area not in area_range:
+            raise ValueError(f"Unknown AREA {area}")
+        if crm_cd is not None and crm_cd not in crm_cd_range:
+            raise ValueError(f"Unknown Crm Cd {crm_cd}")
+        end = end or date.today()
+        results = []
+        for days in windows:
+            counts = self.window_counts(days, end, area, crm_cd)
+            area_labels = list(area_range) if area is None else [area]
+            code_labels = list(crm_cd_range) if crm_cd is None else [crm_cd]
+            if crm_cd is None:
+                by, values, labels = "by_crm_cd", counts.sum(axis=0), code_labels
+            else:
+                by, values, labels = "by_area", counts.sum(axis=1), area_labels
+            results.append(
+                {
+                    "days": days,
+                    "start": (end - timedelta(days=days - 1)).isoformat(),
+                    "total": int(values.sum()),
+                    by: {int(labels[i]): int(values[i]) for i in np.flatnonzero(values)},
+                }
+            )
+        return {"end": end.isoformat(), "area": area, "crm_cd": crm_cd, "windows": results}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "history_days": self.history_days,
+                "last_day": date.fromordinal(self.last_day).isoformat() if self.last_day else None,
+                "records": int(self.counts.sum(dtype=np.int64)),
+                "dropped": self.dropped,
+            }
+
+
+class SnapshotWriter:
+    """
+    Checkpoints the stored datasets' activity every ``interval`` seconds
+
+    Each checkpoint is the previous snapshot plus the rows appended since,
+    counted from storage under the dataset lock, so it holds the records
+    of every worker and import. Every worker runs a writer, but only the
+    one holding ``<path>.lock`` writes; the others take over the lock
+    when its holder exits.
+    """
+
+    def __init__(self, paths, lock_path, path=ACTIVITY_SNAPSHOT_PATH, interval=60.0):
+        self.paths = paths
+        self.lock_path = lock_path
+        self.path = path
+        self.interval = interval
+        self._owner_lock = FileLock(f"{path}.lock")
+        self._owner = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def save(self):
+        """
+        Write a checkpoint if this writer owns the snapshot
+
+        Returns:
+            bool: True if a snapshot was written
+        """
+        if not self._owner:
+            self._owner = self._owner_lock.acquire(blocking=False)
+            if not self._owner:
+                return False
+        try:
+            with FileLock(self.lock_path):
+                counters = ActivityCounters.restore(self.paths, self.path)
+            counters.save(self.path)
+        except Exception as e:
+            logging.error(f"Error saving {self.path}: {e}")
+            return False
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the thread, write a final snapshot and give up ownership
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.save()
+        if self._owner:
+            self._owner_lock.release()
+            self._owner = False
@@ -0,0 +1,272 @@
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+from storage import add_partition_columns, open_store, parse_date_occ
+
+
+MONTH_LABELS = [
+    "Jan", "Feb", "Mar", "Apr", "May", "Jun",
+    "Jul", "Aug", "Sep", "Oct", "Nov", "Dec",
+]
+SEX_LABELS = {"M": "M = Male", "F": "F = Female", "X": "X = Unknown"}
+QUARTILE_COLORS = {"0 to 50%": "orange", "50 to 100%": "red"}
+
+# Dataset columns the chart aggregates are built from
+AGGREGATE_COLUMNS = ["DATE OCC", "Vict Sex", "AREA NAME"]
+
+
+def normalize_vict_sex(value):
+    """
+    Map a Vict Sex value onto M/F/X the way the notebook cleans it
+
+    Missing values, 'H' and '-' all count as unknown (X).
+    """
+    return value if isinstance(value, str) and value in ("M", "F") else "X"
+
+
+def classify_quartile(value, median):
+    if value <= median:
+        return "0 to 50%"
+    else:
+        return "50 to 100%"
+
+
+class CrimeAggregates:
+    """
+    Chart aggregates maintained incrementally as crime records arrive
+
+    Holds monthly crime counts, the victim-sex distribution and per-area
+    counts. ``add`` updates them in O(1) per record and chart requests read
+    cached figures that are only rebuilt after a change.
+    """
+
+    def __init__(self):
+        self.monthly = Counter()
+        self.vict_sex = Counter()
+        self.areas = Counter()
+        self._lock = threading.Lock()
+        self._charts = {}
+
+    def add(self, record):
+        """
+        Count one crime record
+
+        Args:
+            record (dict): Row keyed by dataset column names
+        """
+        occurred = parse_date_occ(record.get("DATE OCC"))
+        with self._lock:
+            if occurred is not None:
+                self.monthly[(occurred.year, occurred.month)] += 1
+            self.vict_sex[normalize_vict_sex(record.get("Vict Sex"))] += 1
+            area = record.get("AREA NAME")
+            if area:
+                self.areas[area] += 1
+            self._charts.clear()
+
+    def add_frame(self, df):
+        """
+        Count every row of a DataFrame of crime records in one vectorized pass
+        """
+        monthly, vict_sex, areas = _count_frame(df)
+        with self._lock:
+            self.monthly.update(monthly)
+            self.vict_sex.update(vict_sex)
+            self.areas.update(areas)
+            self._charts.clear()
+
+    @classmethod
+    def rebuild(cls, paths):
+        """
+        Build aggregates from scratch out of the stored datasets
+
+        Args:
+            paths (list): Crime dataset paths, read through ``open_store``
+
+        Returns:
+            CrimeAggregates: Aggregates over every stored record
+        """
+        aggregates = cls()
+        for path in paths:
+            store = open_store(path)
+            columns = [col for col in AGGREGATE_COLUMNS if col in store.columns()]
+            if not columns:
+                continue
+            aggregates.add_frame(store.read(columns=columns))
+            logging.info(f"Aggregated crime records from {path}.")
+        return aggregates
+
+    def snapshot(self):
+        """
+        Copy of the raw counters, for comparisons and debugging
+        """
+        with self._lock:
+            return {
+                "monthly": dict(self.monthly),
+                "vict_sex": dict(self.vict_sex),
+                "areas": dict(self.areas),
+            }
+
+    def check_consistency(self, paths):
+        """
+        Compare the incremental counters with a rebuild from storage
+
+        Records that are queued but not yet committed to storage show up as
+        differences until the writer catches up.
+
+        Args:
+            paths (list): Crime dataset paths the aggregates were built from
+
+        Returns:
+            dict: ``consistent`` flag and, per counter, the keys whose
+            incremental and batch counts differ
+        """
+        incremental = self.snapshot()
+        batch = self.rebuild(paths).snapshot()
+        differences = {}
+        for name in incremental:
+            keys = set(incremental[name]) | set(batch[name])
+            diff = {
+                str(key): {
+                    "incremental": incremental[name].get(key, 0),
+                    "batch": batch[name].get(key, 0),
+                }
+                for key in keys
+                if incremental[name].get(key, 0) != batch[name].get(key, 0)
+            }
+            if diff:
+                differences[name] = diff
+        return {"consistent": not differences, "differences": differences}
+
+    def _cached(self, key, build):
+        with self._lock:
+            chart = self._charts.get(key)
+            if chart is None:
+                chart = self._charts[key] = build()
+            return chart
+
+    def latest_year(self):
+        with self._lock:
+            years = [year for year, _ in self.monthly]
+        return max(years) if years else datetime.now().year
+
+    def crime_frequency_graph(self, year=None):
+        """
+        Monthly crime frequency line chart for one year
+
+        Args:
+            year (int): Year to plot, the most recent year with data if None
+        """
+        year = year or self.latest_year()
+
+        def build():
+            return {
+                "data": [
+                    {
+                        "type": "scatter",
+                        "mode": "lines+markers",
+                        "x": list(range(1, 13)),
+                        "y": [self.monthly.get((year, month), 0) for month in range(1, 13)],
+                        "line": {"color": "dodgerblue", "width": 3},
+                        "marker": {"size": 8},
+                    }
+                ],
+                "layout": {
+                    "height": 600,
+                    "width": 800,
+                    "template": "plotly_white",
+                    "title": f"Monthly Crime Frequency for Year {year}",
+                    "xaxis": {
+                        "title": "Month",
+                        "tickmode": "array",
+                        "tickvals": list(range(1, 13)),
+                        "ticktext": MONTH_LABELS,
+                    },
+                    "yaxis": {"title": "Number of Crimes"},
+                },
+            }
+
+        return self._cached(("frequency", year), build)
+
+    def gender_distribution_graph(self):
+        """
+        Victim-sex distribution pie chart
+        """
+
+        def build():
+            return {
+                "data": [
+                    {
+                        "type": "pie",
+                        "values": [self.vict_sex.get(sex, 0) for sex in SEX_LABELS],
+                        "labels": list(SEX_LABELS.values()),
+                        "hoverinfo": "label+percent",
+                        "hole": 0.3,
+                    }
+                ],
+                "layout": {
+                    "height": 600,
+                    "width": 800,
+                    "template": "plotly_white",
+                    "title": "Distribution of Victims Affected by Crime (Gender)",
+                    "showlegend": True,
+                },
+            }
+
+        return self._cached("gender", build)
+
+    def risky_areas_graph(self):
+        """
+        Per-area crime counts colored by the median split of the counts
+        """
+
+        def build():
+            counts = pd.Series(self.areas, dtype="int64").sort_values(
+                ascending=False, kind="stable"
+            )
+            median = counts.quantile(0.5) if len(counts) else 0
+            colors = [QUARTILE_COLORS[classify_quartile(value, median)] for value in counts]
+            return {
+                "data": [
+                    {
+                        "type": "bar",
+                        "x": counts.index.tolist(),
+                        "y": counts.tolist(),
+                        "marker": {"color": colors},
+                    }
+                ],
+                "layout": {
+                    "height": 600,
+                    "width": 800,
+                    "template": "plotly_white",
+                    "title": "Risky Area Names with Percentage Distribution",
+                    "xaxis": {"title": "Area Name"},
+                    "yaxis": {"title": "Crime Count"},
+                },
+            }
+
+        return self._cached("areas", build)
+
+
+def _count_frame(df):
+    """
+    Vectorized monthly, victim-sex and area counts of a crime DataFrame
+    """
+    monthly = Counter()
+    vict_sex = Counter()
+    areas = Counter()
+    if "DATE OCC" in df:
+        dated = add_partition_columns(df[["DATE OCC"]].copy()).dropna(subset=["year"])
+        for (year, month), count in dated.groupby(["year", "month"]).size().items():
+            monthly[(int(year), int(month))] = int(count)
+    if "Vict Sex" in df:
+        sexes = df["Vict Sex"].astype("object").map(normalize_vict_sex)
+        vict_sex.update({sex: int(count) for sex, count in sexes.value_counts().items()})
+    if "AREA NAME" in df:
+        counts = df["AREA NAME"].astype("object").dropna().value_counts()
+        areas.update({area: int(count) for area, count in counts.items()})
+    return monthly, vict_sex, areas
@@ -1,14 +1,35 @@
 import logging
 import json
-import joblib
-from fastapi.responses import JSONResponse
-from fastapi import FastAPI, HTTPException, Query
+import base64
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 import os
-from typing import Optional
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import tempfile
+import threading
 import uvicorn
 import pandas as pd
-from predictions import area_mapping, crime_code_mapping, high_risk_json
+from predictions import area_mapping, crime_code_mapping, get_prediction_store, load_predictions, prediction_resource
+from forecast_cube import HorizonCube
+from ingestion import CSV_COLUMNS, FileLock, QueuedCsvWriter, record_to_row
+from bulk_import import CONTENT_TYPES, FORMATS, import_records
+from aggregates import CrimeAggregates
+from spatial_index import SpatialIndex
+from activity import ACTIVITY_SNAPSHOT_PATH, ActivityCounters, SnapshotWriter
+from resources import LazyResource, warm_up
+from model_serving import RISK_THRESHOLD, load_model
+from feature_encoders import FeatureEncoder, record_features
+from batching import MicroBatcher
+from risk_table import load_risk_table
+from response_cache import ResponseCache, encode_json
+from scheduler import RefreshScheduler
+from shared_snapshot import SHARED_DIR, SnapshotWatcher
+from metrics import REGISTRY, timer
+from instrumentation import InstrumentationMiddleware, profiles
+import numpy as np
 from datetime import datetime, timedelta
 
 # Set up logging configuration
@@ -16,16 +37,87 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# How startup resources are loaded: "background" warms them up after the
+# server starts accepting connections, "eager" before, "lazy" on first use
+WARMUP_MODE = os.environ.get("CRPS_WARMUP", "background")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    if WARMUP_MODE == "eager":
+        warm_up(warmup_resources)
+    elif WARMUP_MODE == "background":
+        threading.Thread(
+            target=warm_up, args=(warmup_resources,), name="warm-up", daemon=True
+        ).start()
+    prediction_refresher.start()
+    if SHARED_DIR:
+        snapshot_watcher.start()
+    activity_snapshots.start()
+    yield
+    prediction_refresher.stop()
+    snapshot_watcher.stop()
+    activity_snapshots.stop()
+    await predict_batcher.stop()
+    # Write out any queued crime records before the worker exits
+    if crime_writer_resource.loaded:
+        crime_writer_resource.get().close()
+
+
 # Create the app object
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Latency and payload sizes of every route, exposed on /metrics
+app.add_middleware(InstrumentationMiddleware)
+
+# Load the pre-trained hotspot model once per worker (CRPS_MODEL_PATH)
+model_resource = LazyResource("model", load_model)
+
+# Encoded read-endpoint responses, dropped when the data they show changes:
+# "predictions" on regeneration, "crimes" when records are ingested
+response_cache = ResponseCache()
+
+# Predictions are regenerated in the background every CRPS_REFRESH_INTERVAL
+# seconds (0 disables) and just after midnight, then swapped in atomically.
+# With CRPS_SHARED_DIR the supervisor in shared_snapshot.py regenerates them
+# for every worker instead, and workers attach to each version it publishes
+prediction_refresher = RefreshScheduler(
+    prediction_resource,
+    load_predictions,
+    interval=0 if SHARED_DIR else float(os.environ.get("CRPS_REFRESH_INTERVAL", "0")),
+    at_midnight=not SHARED_DIR and os.environ.get("CRPS_REFRESH_AT_MIDNIGHT", "1") == "1",
+)
+snapshot_watcher = SnapshotWatcher(prediction_resource, SHARED_DIR)
+
+# Prefix-summed (day, AREA, Crm Cd) cube of the predictions behind /forecast,
+# rebuilt whenever a new prediction snapshot is swapped in
+forecast_resource = LazyResource(
+    "forecast cube", lambda: HorizonCube.from_store(get_prediction_store())
+)
+
 
-# Load the pre-trained XGBoost model (replace with the correct path)
-# try:
-#     model = joblib.load('xgboost_model.joblib')
-#     logging.info("Model loaded successfully.")
-# except Exception as e:
-#     logging.error(f"Error loading model: {e}")
-#     raise HTTPException(status_code=500, detail="Model loading failed.")
+def rebuild_forecast(predictions):
+    if forecast_resource.loaded:
+        with timer("forecast_build"):
+            forecast_resource.set(HorizonCube.from_store(predictions[1]))
+
+
+prediction_resource.on_change(rebuild_forecast)
+
+# Fitted encoders of raw record fields (CRPS_ENCODERS_PATH), saved by training
+encoder_resource = LazyResource("feature encoders", FeatureEncoder.load)
+
+# Precomputed model outputs (CRPS_RISK_TABLE), used instead of the model for
+# inputs the table covers; None when missing or built from another model
+risk_table_resource = LazyResource("risk table", load_risk_table)
+
+# Concurrent /predict calls are scored together, up to CRPS_BATCH_MAX_ROWS rows
+# per model call after waiting at most CRPS_BATCH_MAX_WAIT_MS for more to arrive
+predict_batcher = MicroBatcher(
+    lambda X: model_resource.get().predict(X),
+    max_batch=int(os.environ.get("CRPS_BATCH_MAX_ROWS", "256")),
+    max_wait=float(os.environ.get("CRPS_BATCH_MAX_WAIT_MS", "2")) / 1000,
+)
 
 def parse_date(date_str):
     """
@@ -73,6 +165,40 @@ class CrimeData(BaseModel):
     Vict_Descent: int
     Weapon_Desc: int
     case_solved: int
+    year: int = Field(default_factory=lambda: datetime.now().year)
+
+
+def crime_data_matrix(records):
+    """
+    Stack CrimeData inputs into one feature matrix in model column order
+    """
+    return np.array(
+        [
+            [r.AREA, r.Crm_Cd, r.Vict_Sex, r.Vict_Descent, r.Weapon_Desc, r.year, r.case_solved]
+            for r in records
+        ],
+        dtype=np.float32,
+    ).reshape(-1, 7)
+
+
+def score_matrix(X):
+    """
+    Model outputs for feature rows, read from the risk table where it covers them
+    """
+    table = risk_table_resource.get()
+    if table is None:
+        return model_resource.get().predict(X)
+    probabilities, hit = table.lookup(X)
+    if not hit.all():
+        probabilities[~hit] = model_resource.get().predict(X[~hit])
+    return probabilities
+
+
+def risk_response(probabilities):
+    return [
+        {"probability": float(p), "risk": "High" if p >= RISK_THRESHOLD else "Low"}
+        for p in probabilities
+    ]
 
 
 # Index route
@@ -82,74 +208,131 @@ def health_check():
     return {"message": "Server is live!"}
 
 
-@app.get("/predictions")
-def fetch_high_risk_predictions(filter: Optional[str] = Query(None, description="Filter predictions by date range")):
+# Readiness route, OK once every startup resource has been loaded
+@app.get("/ready")
+def readiness_check():
+    ready = all(resource.loaded for resource in startup_resources)
+    content = {
+        "ready": ready,
+        "resources": {resource.name: resource.status() for resource in startup_resources},
+    }
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
+
+# Area entries per page when /predictions is paginated without a limit
+DEFAULT_PAGE_SIZE = 5
+
+
+def prediction_window(filter):
+    """
+    Resolve a /predictions filter to the prediction store and its record slice
+
+    Args:
+        filter (str): One of 'today', 'aweek', 'twoweeks', 'amonth'
+
+    Returns:
+        tuple: Store and the ``(lo, hi)`` bounds of the window's records
+    """
+    # Set default filter to 'amonth' if no filter is provided
+    if filter is None:
+        filter = 'amonth'
+
+    # Validate filter parameter
+    valid_filters = ['today', 'aweek', 'twoweeks', 'amonth']
+
+    if filter not in valid_filters:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid filter. Must be one of {', '.join(valid_filters)}"
+        )
+
+    # Get date range for filtering
+    start_date, end_date = get_date_range(filter)
+
+    if start_date is None or end_date is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid date range"
+        )
+
+    store = get_prediction_store()
+    lo, hi = store.window_bounds(start_date, end_date)
+    return store, lo, hi
+
+
+def encode_cursor(version, lo, hi, offset):
+    position = json.dumps([version, lo, hi, offset]).encode()
+    return base64.urlsafe_b64encode(position).decode()
+
+
+def decode_cursor(cursor):
     try:
-        # Convert JSON string to Python list
-        predictions = json.loads(high_risk_json)
-        
-        # Set default filter to 'amonth' if no filter is provided
-        if filter is None:
-            filter = 'amonth'
-        
-        # Validate filter parameter
-        valid_filters = ['today', 'aweek', 'twoweeks', 'amonth']
-        
-        if filter not in valid_filters:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid filter. Must be one of {', '.join(valid_filters)}"
-            )
-        
-        # Get date range for filtering
-        start_date, end_date = get_date_range(filter)
-        
-        if start_date is None or end_date is None:
+        version, lo, hi, offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return version, int(lo), int(hi), int(offset)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def prediction_page(filter, limit, cursor):
+    """
+    One page of area entries, in the order of the unpaginated response
+
+    The cursor pins the prediction snapshot and date window of the first
+    page, so later pages stay consistent with it even across midnight.
+    """
+    if cursor is None:
+        store, lo, hi = prediction_window(filter)
+        offset = 0
+    else:
+        store = get_prediction_store()
+        version, lo, hi, offset = decode_cursor(cursor)
+        if version != store.version:
             raise HTTPException(
-                status_code=400, 
-                detail="Invalid date range"
+                status_code=410,
+                detail="Predictions were regenerated; restart from the first page"
             )
+    limit = limit or DEFAULT_PAGE_SIZE
+    index = store.area_index(lo, hi)
+    entries = list(store.iter_area_groups(lo, hi, index[offset:offset + limit]))
+    next_offset = offset + limit
+    return {
+        "predictions": entries,
+        "next_cursor": (
+            encode_cursor(store.version, lo, hi, next_offset) if next_offset < len(index) else None
+        ),
+    }
 
-        # Group predictions by AREA NAME with consolidated information
-        grouped_predictions = {}
-        for pred in predictions:
-            # Parse prediction date
-            pred_date = parse_date(pred['dates'])
-            
-            # Skip if date is invalid or outside the range
-            if not pred_date or pred_date < start_date or pred_date >= end_date:
-                continue
-            
-            key = pred['AREA NAME']
-            
-            if key not in grouped_predictions:
-                # Create a new entry if it doesn't exist
-                grouped_predictions[key] = {
-                    'dates': [pred['dates']],
-                    'AREA NAME': pred['AREA NAME'],
-                    'Crm Cd Desc': [pred['Crm Cd Desc']],
-                    'Risk': pred['Risk'],
-                    'Probability': [pred['Probability']]
-                }
-            else:
-                # Append information to existing entry
-                # Avoid duplicate dates
-                if pred['dates'] not in grouped_predictions[key]['dates']:
-                    grouped_predictions[key]['dates'].append(pred['dates'])
-                
-                # Avoid duplicate crime descriptions
-                if pred['Crm Cd Desc'] not in grouped_predictions[key]['Crm Cd Desc']:
-                    grouped_predictions[key]['Crm Cd Desc'].append(pred['Crm Cd Desc'])
-                
-                # Add probability
-                grouped_predictions[key]['Probability'].append(pred['Probability'])
-        
-        # Convert grouped predictions to a list
-        response = {
-            "predictions": list(grouped_predictions.values())
-        }
-        
-        return JSONResponse(content=response)
+
+@app.get("/predictions")
+def fetch_high_risk_predictions(
+    request: Request,
+    filter: Optional[str] = Query(None, description="Filter predictions by date range"),
+    limit: Optional[int] = Query(None, ge=1, description="Area entries per page; paginates the response"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    format: str = Query("grouped", description="grouped, or compact for columns of AREA/Crm Cd codes"),
+):
+    try:
+        if format not in ("grouped", "compact"):
+            raise HTTPException(status_code=400, detail="Invalid format. Must be grouped or compact")
+        if limit is not None or cursor is not None:
+            if format == "compact":
+                raise HTTPException(status_code=400, detail="Only the grouped format is paginated")
+            return JSONResponse(content=prediction_page(filter, limit, cursor))
+
+        # Slice the date-indexed store and group by AREA NAME, or return the
+        # slice's columns; windows that cover the same records share one
+        # cached response
+        store, lo, hi = prediction_window(filter)
+
+        def build():
+            if format == "compact":
+                return {"predictions": store.columns(lo, hi)}
+            with timer("grouping"):
+                return {"predictions": list(store.iter_area_groups(lo, hi))}
+
+        return response_cache.respond(
+            request, ("predictions", format, lo, hi), build, tags=("predictions",)
+        )
 
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -158,127 +341,243 @@ def fetch_high_risk_predictions(filter: Optional[str] = Query(None, description=
         logging.error(f"Error fetching high-risk data: {e}")
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
-# Crime frequency graph data
-graph_data_1 = {
-    "data": [
-        {
-            "type": "scatter",
-            "mode": "lines+markers",
-            "x": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12],
-            "y": [10, 15, 13, 9, 12, 14, 11, 17, 16, 19, 18, 20],
-            "line": {"color": "dodgerblue", "width": 3},
-            "marker": {"size": 8},
-        }
-    ],
-    "layout": {
-        "height": 600,
-        "width": 800,
-        "template": "plotly_white",
-        "title": "Monthly Crime Frequency for Year 2024",
-        "xaxis": {
-            "title": "Month",
-            "tickmode": "array",
-            "tickvals": list(range(1, 13)),
-            "ticktext": [
-                "Jan",
-                "Feb",
-                "Mar",
-                "Apr",
-                "May",
-                "Jun",
-                "Jul",
-                "Aug",
-                "Sep",
-                "Oct",
-                "Nov",
-                "Dec",
-            ],
-        },
-        "yaxis": {"title": "Number of Crimes"},
-    },
-}
-
-# Gender distribution pie chart data
-graph_data_2 = {
-    "data": [
-        {
-            "type": "pie",
-            "values": [500, 300, 100],
-            "labels": ["M = Male", "F = Female", "X = Unknown"],
-            "hoverinfo": "label+percent",
-            "hole": 0.3,
+
+# Stream the grouped predictions as newline-delimited JSON, one area per line
+@app.get("/predictions/stream")
+def stream_high_risk_predictions(filter: Optional[str] = Query(None, description="Filter predictions by date range")):
+    try:
+        store, lo, hi = prediction_window(filter)
+
+        def lines():
+            for entry in store.iter_area_groups(lo, hi):
+                yield encode_json(entry) + b"\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error streaming high-risk data: {e}")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+# Age and generation time of the prediction snapshot being served
+@app.get("/predictions/metrics")
+def prediction_metrics():
+    try:
+        store = get_prediction_store()
+        return {
+            "snapshot_version": store.version,
+            "snapshot_records": len(store),
+            "snapshot_generated_at": store.created_at.isoformat(),
+            "snapshot_age_seconds": (datetime.now() - store.created_at).total_seconds(),
+            "initial_load_seconds": prediction_resource.load_seconds,
+            "shared_dir": SHARED_DIR,
+            "refresh": prediction_refresher.metrics(),
         }
-    ],
-    "layout": {
-        "height": 600,
-        "width": 800,
-        "template": "plotly_white",
-        "title": "Distribution of Victims Affected by Crime (Gender)",
-        "showlegend": True,
-    },
-}
 
-# Risky area names bar chart data
-df = pd.read_csv("df1.csv")
-area_names = df["AREA NAME"].value_counts().index.tolist()
-values = df["AREA NAME"].value_counts().values.tolist()
-quartiles = df["AREA NAME"].value_counts().quantile([0.25, 0.5, 0.75])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
-def classify_quartile(value):
-    if value <= quartiles[0.5]:
-        return "0 to 50%"
-    else:
-        return "50 to 100%"
+# Regenerate the predictions now instead of waiting for the schedule; a
+# worker serving a shared snapshot re-attaches to the current version
+@app.post("/predictions/refresh")
+def refresh_predictions():
+    if not prediction_refresher.refresh_now():
+        raise HTTPException(status_code=500, detail=prediction_refresher.last_error)
+    if SHARED_DIR:
+        return {"message": "Attached the current prediction snapshot."}
+    return {"message": "Predictions regenerated successfully."}
+
+
+def forecast_range(cube, start, end):
+    """
+    Resolve /forecast start and end parameters, by default today to the end
+    of the horizon
+    """
+    dates = []
+    for value, default in ((start, datetime.now().date()), (end, cube.end)):
+        if value is None:
+            dates.append(default)
+            continue
+        parsed = parse_date(value)
+        if parsed is None:
+            raise HTTPException(status_code=400, detail="Invalid date, expected DD/MM/YYYY")
+        dates.append(parsed.date())
+    return tuple(dates)
+
+
+# Prediction counts and probabilities over any date range, optionally for one
+# AREA and/or crime code, read from the horizon cube
+@app.get("/forecast")
+def get_forecast(
+    start: Optional[str] = Query(None, description="First day, DD/MM/YYYY, today by default"),
+    end: Optional[str] = Query(None, description="Last day, DD/MM/YYYY, the end of the horizon by default"),
+    area: Optional[int] = Query(None, description="AREA code"),
+    crm_cd: Optional[int] = Query(None, description="Crime code"),
+):
+    try:
+        cube = forecast_resource.get()
+        start_date, end_date = forecast_range(cube, start, end)
+        return cube.query(start_date, end_date, area, crm_cd)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error querying the forecast: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# The k areas with the highest summed probability over a date range, or per day
+@app.get("/forecast/top_areas")
+def get_forecast_top_areas(
+    start: Optional[str] = Query(None, description="First day, DD/MM/YYYY, today by default"),
+    end: Optional[str] = Query(None, description="Last day, DD/MM/YYYY, the end of the horizon by default"),
+    k: int = Query(5, ge=1, description="Areas to return"),
+    crm_cd: Optional[int] = Query(None, description="Only rank by this crime code"),
+    per_day: bool = Query(False, description="Rank each day of the range separately"),
+):
+    try:
+        cube = forecast_resource.get()
+        start_date, end_date = forecast_range(cube, start, end)
+        return cube.top_areas(start_date, end_date, k, crm_cd, per_day)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error ranking forecast areas: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Score one input with the hotspot model, batched with concurrent requests
+@app.post("/predict")
+async def predict(record: CrimeData):
+    try:
+        X = crime_data_matrix([record])
+        # The first load opens the memory map and hashes the model file, so
+        # it runs off the event loop; later calls return the cached table
+        if risk_table_resource.loaded:
+            table = risk_table_resource.get()
+        else:
+            table = await run_in_threadpool(risk_table_resource.get)
+        if table is not None:
+            probabilities, hit = table.lookup(X)
+            if hit[0]:
+                return risk_response(probabilities)[0]
+        probability = await predict_batcher.submit(X[0])
+        return risk_response([probability])[0]
+
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error running model inference: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Score many inputs in a single forward pass
+@app.post("/predict/batch")
+def predict_batch(records: List[CrimeData]):
+    try:
+        probabilities = score_matrix(crime_data_matrix(records))
+        return {"predictions": risk_response(probabilities)}
 
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error running model inference: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-quartiles_percentage = pd.Series(values).apply(classify_quartile)
-colors = {"0 to 50%": "orange", "50 to 100%": "red"}
 
-graph_data_3 = {
-    "data": [
-        {
-            "type": "bar",
-            "x": area_names,
-            "y": values,
-            "marker": {"color": quartiles_percentage.map(colors).tolist()},
+# Describe the loaded model and its preprocessing
+@app.get("/predict/info")
+def predict_info():
+    try:
+        table = risk_table_resource.get()
+        return {
+            **model_resource.get().info(),
+            "risk_table": table.info() if table is not None else None,
         }
-    ],
-    "layout": {
-        "height": 600,
-        "width": 800,
-        "template": "plotly_white",
-        "title": "Risky Area Names with Percentage Distribution",
-        "xaxis": {"title": "Area Name"},
-        "yaxis": {"title": "Crime Count"},
-    },
-}
+
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Queue depth, batch sizes and queueing delay of the /predict batcher
+@app.get("/predict/metrics")
+def predict_metrics():
+    return predict_batcher.metrics()
 
 
 # Endpoint for the crime frequency graph
 @app.get("/crime_frequency_graph")
-def get_crime_frequency_graph():
-    logging.info("Returning graph data for the 2024 monthly crime frequency.")
-    return JSONResponse(content=graph_data_1)
+def get_crime_frequency_graph(request: Request, year: Optional[int] = Query(None, description="Year to plot, latest year with data by default")):
+    logging.info("Returning graph data for the monthly crime frequency.")
+    return response_cache.respond(
+        request,
+        ("crime_frequency_graph", year),
+        lambda: aggregates_resource.get().crime_frequency_graph(year),
+        tags=("crimes",),
+    )
 
 
 # Endpoint for the gender distribution pie chart
 @app.get("/gender_distribution_graph")
-def get_gender_distribution_graph():
+def get_gender_distribution_graph(request: Request):
     logging.info("Returning graph data for gender distribution in crime victims.")
-    return JSONResponse(content=graph_data_2)
+    return response_cache.respond(
+        request,
+        ("gender_distribution_graph",),
+        lambda: aggregates_resource.get().gender_distribution_graph(),
+        tags=("crimes",),
+    )
 
 
 # Endpoint for the risky area names bar chart
 @app.get("/risky_areas_graph")
-def get_risky_areas_graph():
+def get_risky_areas_graph(request: Request):
     logging.info("Returning graph data for risky area names.")
-    return JSONResponse(content=graph_data_3)
+    return response_cache.respond(
+        request,
+        ("risky_areas_graph",),
+        lambda: aggregates_resource.get().risky_areas_graph(),
+        tags=("crimes",),
+    )
 
 
 @app.get("/city_crime_mapping")
-def get_city_crime_mapping():
-    return {"city_names": area_mapping, "crime_types": crime_code_mapping}
+def get_city_crime_mapping(request: Request):
+    return response_cache.respond(
+        request,
+        ("city_crime_mapping",),
+        lambda: {"city_names": area_mapping, "crime_types": crime_code_mapping},
+    )
+
+
+# Crime counts and risk per map cell of a viewport, finer as the map zooms in
+# and coarser when the viewport spans more than MAX_VIEWPORT_TILES cells
+@app.get("/hotspots")
+def get_hotspots(
+    south: float = Query(..., ge=-90, le=90),
+    west: float = Query(..., ge=-180, le=180),
+    north: float = Query(..., ge=-90, le=90),
+    east: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(12, ge=0, le=22, description="Map zoom level"),
+):
+    if south > north or west > east:
+        raise HTTPException(status_code=400, detail="Invalid bounding box")
+    try:
+        hotspots = spatial_index_resource.get().query(south, west, north, east, zoom)
+        return Response(content=encode_json(hotspots), media_type="application/json")
+
+    except Exception as e:
+        logging.error(f"Error querying hotspots: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 CSV_FILE = "dataset.csv"
@@ -317,61 +616,292 @@ class CrimeRecord(BaseModel):
     LON: Optional[float] = None
 
 
+# Crime reports are journaled, then committed to CSV_FILE by one background
+# writer per worker; a commit happens once CRIME_WRITE_BUFFER_ROWS rows are
+# queued or the oldest has waited CRIME_WRITE_BUFFER_DELAY seconds
+WRITE_BUFFER_ROWS = int(os.environ.get("CRIME_WRITE_BUFFER_ROWS", "1"))
+WRITE_BUFFER_DELAY = float(os.environ.get("CRIME_WRITE_BUFFER_DELAY", "0"))
+
+crime_writer_resource = LazyResource(
+    "crime_writer",
+    lambda: QueuedCsvWriter(
+        CSV_FILE, max_rows=WRITE_BUFFER_ROWS, max_delay=WRITE_BUFFER_DELAY
+    ),
+)
+
+# Chart aggregates over the historical extract and the reported records,
+# updated in place as each report arrives
+AGGREGATE_SOURCES = ["df1.csv", CSV_FILE]
+
+
+def load_aggregates():
+    with FileLock(f"{CSV_FILE}.lock"), timer("aggregates_load"):
+        return CrimeAggregates.rebuild(AGGREGATE_SOURCES)
+
+
+aggregates_resource = LazyResource("aggregates", load_aggregates)
+
+
+# Per-cell crime counts at every map zoom level, for /hotspots, updated in
+# place as reports arrive like the chart aggregates
+def load_spatial_index():
+    with FileLock(f"{CSV_FILE}.lock"), timer("spatial_index_load"):
+        return SpatialIndex.rebuild(AGGREGATE_SOURCES)
+
+
+spatial_index_resource = LazyResource("spatial index", load_spatial_index)
+
+
+# Per-(AREA, Crm Cd, day) counts of recent crimes: the last snapshot
+# (CRPS_ACTIVITY_SNAPSHOT) plus the rows stored since, or a rebuild from
+# storage when there is none. Snapshots are checkpoints of storage, taken
+# every CRPS_ACTIVITY_SNAPSHOT_INTERVAL seconds and at shutdown
+def load_activity_counters():
+    with FileLock(f"{CSV_FILE}.lock"), timer("activity_load"):
+        return ActivityCounters.restore(AGGREGATE_SOURCES, ACTIVITY_SNAPSHOT_PATH)
+
+
+activity_resource = LazyResource("activity counters", load_activity_counters)
+activity_snapshots = SnapshotWriter(
+    AGGREGATE_SOURCES,
+    f"{CSV_FILE}.lock",
+    interval=float(os.environ.get("CRPS_ACTIVITY_SNAPSHOT_INTERVAL", "60")),
+)
+
+# A new prediction snapshot or rebuilt aggregates invalidate cached responses
+prediction_resource.on_change(lambda _: response_cache.invalidate("predictions"))
+aggregates_resource.on_change(lambda _: response_cache.invalidate("crimes"))
+
+
 # Endpoint to add a new record
 @app.post("/crime_reporting")
 def crime_reporting(record: CrimeRecord):
     try:
-        # Check if the file exists
-        if not os.path.exists(CSV_FILE):
-            # Create an empty dataframe with the required columns
-            columns = [
-                "DR_NO",
-                "Date Rptd",
-                "DATE OCC",
-                "TIME OCC",
-                "AREA",
-                "AREA NAME",
-                "Rpt Dist No",
-                "Part 1-2",
-                "Crm Cd",
-                "Crm Cd Desc",
-                "Mocodes",
-                "Vict Age",
-                "Vict Sex",
-                "Vict Descent",
-                "Premis Cd",
-                "Premis Desc",
-                "Weapon Used Cd",
-                "Weapon Desc",
-                "Status",
-                "Status Desc",
-                "Crm Cd 1",
-                "Crm Cd 2",
-                "Crm Cd 3",
-                "Crm Cd 4",
-                "LOCATION",
-                "Cross Street",
-                "LAT",
-                "LON",
-            ]
-            df = pd.DataFrame(columns=columns)
-            df.to_csv(CSV_FILE, index=False)
-
-        # Read the existing dataset
-        df = pd.read_csv(CSV_FILE)
-
-        # Add the new record
-        new_record = pd.DataFrame([record.model_dump()])
-        df = pd.concat([df, new_record], ignore_index=True)
-
-        # Save the updated dataset
-        df.to_csv(CSV_FILE, index=False)
+        # Load the aggregates before queueing so the record is counted once
+        aggregates = aggregates_resource.get()
+        spatial_index = spatial_index_resource.get()
+        activity = activity_resource.get()
+
+        # Returns once the record is durably queued for the dataset
+        row = record_to_row(record.model_dump())
+        with timer("csv_write"):
+            crime_writer_resource.get().append([row])
+        with timer("aggregates_update"):
+            aggregates.add(dict(zip(CSV_COLUMNS, row)))
+            spatial_index.add(dict(zip(CSV_COLUMNS, row)))
+            activity.add(dict(zip(CSV_COLUMNS, row)))
+        response_cache.invalidate("crimes")
 
         return {"message": "Record added successfully."}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+# Endpoint to add many records in one request
+@app.post("/crime_reporting/batch")
+def crime_reporting_batch(records: List[CrimeRecord]):
+    try:
+        # All rows of the batch are journaled with a single fsync
+        aggregates = aggregates_resource.get()
+        spatial_index = spatial_index_resource.get()
+        activity = activity_resource.get()
+        rows = [record_to_row(record.model_dump()) for record in records]
+        with timer("csv_write"):
+            count = crime_writer_resource.get().append(rows)
+        with timer("aggregates_update"):
+            frame = pd.DataFrame(rows, columns=CSV_COLUMNS)
+            aggregates.add_frame(frame)
+            spatial_index.add_frame(frame)
+            activity.add_frame(frame)
+        response_cache.invalidate("crimes")
+
+        return {"message": f"{count} records added successfully.", "count": count}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Bulk imports are parsed, validated and written CRPS_IMPORT_CHUNK_ROWS rows at
+# a time; uploads larger than CRPS_IMPORT_SPOOL_BYTES are spooled to disk
+IMPORT_CHUNK_ROWS = int(os.environ.get("CRPS_IMPORT_CHUNK_ROWS", "100000"))
+IMPORT_SPOOL_BYTES = int(os.environ.get("CRPS_IMPORT_SPOOL_BYTES", str(16 << 20)))
+
+
+def import_body(body, fmt, dry_run):
+    if dry_run:
+        return import_records(body, fmt, CSV_FILE, IMPORT_CHUNK_ROWS, dry_run=True)
+    aggregates = aggregates_resource.get()
+    spatial_index = spatial_index_resource.get()
+    activity = activity_resource.get()
+
+    def count_chunk(frame):
+        with timer("aggregates_update"):
+            aggregates.add_frame(frame)
+            spatial_index.add_frame(frame)
+            activity.add_frame(frame)
+        response_cache.invalidate("crimes")
+
+    return import_records(body, fmt, CSV_FILE, IMPORT_CHUNK_ROWS, on_chunk=count_chunk)
+
+
+# Endpoint to import a CSV or NDJSON file of records sent as the request body
+@app.post("/crime_reporting/import")
+async def crime_reporting_import(
+    request: Request,
+    format: Optional[str] = Query(None, description="csv or ndjson, from the Content-Type by default"),
+    dry_run: bool = Query(False, description="Validate the file without importing it"),
+):
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    fmt = format or CONTENT_TYPES.get(content_type, "csv")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown import format: {fmt}")
+    try:
+        with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as body:
+            async for block in request.stream():
+                body.write(block)
+            body.seek(0)
+            return await run_in_threadpool(import_body, body, fmt, dry_run)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error importing crime records: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Crimes reported over recent day windows, for an area and/or crime code
+@app.get("/activity")
+def get_activity(
+    windows: List[int] = Query([7, 30, 90], description="Window lengths in days"),
+    end: Optional[str] = Query(None, description="Last day of the windows, DD/MM/YYYY, today by default"),
+    area: Optional[int] = Query(None, description="AREA code"),
+    crm_cd: Optional[int] = Query(None, description="Crime code"),
+):
+    end_date = None
+    if end is not None:
+        end_date = parse_date(end)
+        if end_date is None:
+            raise HTTPException(status_code=400, detail="Invalid end date, expected DD/MM/YYYY")
+    try:
+        activity = activity_resource.get()
+        return activity.query(windows, end_date.date() if end_date else None, area, crm_cd)
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error reading crime activity: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Score raw crime records, encoded with the encoders the model was trained with
+@app.post("/predict/records")
+def predict_records(records: List[CrimeRecord]):
+    try:
+        encoder = encoder_resource.get()
+        X = encoder.transform(record_features([record.model_dump() for record in records]))
+        return {
+            "encoders_version": encoder.version,
+            "predictions": risk_response(score_matrix(X)),
+        }
+
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error running model inference: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Rebuild the chart aggregates, spatial index and activity counters from the
+# stored datasets, e.g. to count rows imported with the bulk_import CLI
+@app.post("/aggregates/rebuild")
+def rebuild_aggregates():
+    try:
+        aggregates_resource.set(load_aggregates())
+        spatial_index_resource.set(load_spatial_index())
+        activity_resource.set(load_activity_counters())
+        return {"message": "Aggregates rebuilt successfully."}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Compare the incremental chart aggregates with a rebuild from storage
+@app.get("/aggregates/consistency")
+def check_aggregates_consistency():
+    try:
+        with FileLock(f"{CSV_FILE}.lock"):
+            return aggregates_resource.get().check_consistency(AGGREGATE_SOURCES)
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Prometheus exposition of request, stage and component metrics
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# Recent request profiles (enabled with CRPS_PROFILING=1, requested per call
+# with an X-Profile header)
+@app.get("/metrics/profiles")
+def list_profiles():
+    return {"profiles": profiles.summaries()}
+
+
+# One profile as folded stacks, ready for flamegraph tools
+@app.get("/metrics/profiles/{profile_id}")
+def get_profile(profile_id: str):
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    lines = [f"{stack} {count}" for stack, count in profile["stacks"].most_common()]
+    return PlainTextResponse("\n".join(lines) + "\n")
+
+
+# Component state read at scrape time
+REGISTRY.attach(
+    "crps_predict_batch_size", "Rows per batched /predict model call", predict_batcher.batch_sizes
+)
+REGISTRY.attach(
+    "crps_predict_queue_wait_seconds", "Time /predict rows wait for their batch", predict_batcher.wait_seconds
+)
+REGISTRY.gauge(
+    "crps_predict_queue_depth", "Rows waiting for a /predict batch",
+    lambda: predict_batcher.metrics()["queue_depth"],
+)
+REGISTRY.gauge(
+    "crps_response_cache", "Response cache entries and lookups",
+    lambda: {(key,): value for key, value in response_cache.stats().items()}, ("stat",),
+)
+REGISTRY.gauge(
+    "crps_prediction_refreshes", "Prediction refreshes by outcome",
+    lambda: {
+        ("success",): prediction_refresher.refreshes, ("failure",): prediction_refresher.failures,
+    },
+    ("outcome",),
+)
+REGISTRY.gauge(
+    "crps_prediction_refresh_seconds", "Duration of the last prediction refresh",
+    lambda: prediction_refresher.last_seconds,
+)
+REGISTRY.gauge(
+    "crps_resource_load_seconds", "Time taken to load each lazily loaded resource",
+    lambda: {(resource.name,): resource.load_seconds for resource in warmup_resources},
+    ("resource",),
+)
+
+
+# Loaded by the lifespan warm-up and reported by /ready
+startup_resources = [prediction_resource, crime_writer_resource, aggregates_resource]
+
+# The model, risk table, spatial index and activity counters are warmed up as
+# well, but do not gate /ready
+warmup_resources = startup_resources + [
+    model_resource, risk_table_resource, spatial_index_resource, activity_resource,
+]
+
 # Run the API with uvicorn
 if __name__ == "__main__":
     logging.info("Starting FastAPI application.")
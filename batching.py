@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+
+import numpy as np
+
+from metrics import Histogram
+
+
+# Histogram bounds for rows per model call and seconds spent queued
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+WAIT_SECONDS_BUCKETS = [0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25]
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one model call
+
+    Each ``submit`` queues a feature row and waits. A background task takes
+    the first queued row, keeps collecting until ``max_batch`` rows are
+    gathered or ``max_wait`` seconds have passed, scores them as one matrix
+    in a worker thread and hands each caller its own result. Rows that
+    arrive while a batch is being scored form the next batch.
+    """
+
+    def __init__(self, predict_fn, max_batch=256, max_wait=0.002):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.wait_seconds = Histogram(WAIT_SECONDS_BUCKETS)
+        self._queue = None
+        self._task = None
+        self._loop = None
+        # Set whenever a row is queued, so the collector can wait for one
+        # without a timed queue.get()
+        self._arrived = None
+        # Rows taken off the queue and not yet answered
+        self._batch = []
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._arrived = asyncio.Event()
+            self._batch = []
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, row):
+        """
+        Score one feature row as part of the next batch
+
+        Args:
+            row (array-like): One row of model features
+
+        Returns:
+            float: Model output for the row
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((np.asarray(row, dtype=np.float32), time.perf_counter(), future))
+        self._arrived.set()
+        return await future
+
+    async def _collect(self):
+        # Rows go straight into self._batch, so stop() can fail them even if
+        # it cancels the collector part-way through a batch
+        self._batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(self._batch) < self.max_batch:
+            if not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            # Wait for the next submit's signal rather than for the row itself;
+            # a timed-out queue.get() can drop a row arriving at the deadline
+            self._arrived.clear()
+            try:
+                await asyncio.wait_for(self._arrived.wait(), timeout)
+            except asyncio.TimeoutError:
+                break
+        return self._batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            for _, enqueued, _ in batch:
+                self.wait_seconds.observe(started - enqueued)
+            self.batch_sizes.observe(len(batch))
+
+            X = np.stack([row for row, _, _ in batch])
+            try:
+                outputs = await self._loop.run_in_executor(None, self.predict_fn, X)
+            except Exception as e:
+                logging.error(f"Error scoring a batch of {len(batch)} rows: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                self._batch = []
+                continue
+            for (_, _, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(float(output))
+            self._batch = []
+
+    async def stop(self):
+        """
+        Stop the batching task and fail the batch in flight and any requests
+        still queued
+        """
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        pending = self._batch
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, _, future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("Prediction batcher stopped."))
+        self._batch = []
+        self._task = None
+
+    def metrics(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_batch": self.max_batch,
+            "max_wait_seconds": self.max_wait,
+            "batch_size": self.batch_sizes.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
@@ -0,0 +1,91 @@
+"""
+Recent-activity queries: re-reading the dataset against ring-buffer counters
+
+Writes a synthetic crime CSV spanning the last 400 days and answers
+"crimes in an AREA by Crm Cd over the last 7/30/90 days" by reading and
+filtering the CSV, as an endpoint without the counters would have to,
+and with ``ActivityCounters.query``. Also times single-record ingestion.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_activity --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from activity import ActivityCounters
+from storage import DATE_OCC_FORMAT, parse_dates_occ
+
+WINDOWS = [7, 30, 90]
+
+
+def write_crime_csv(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp(date.today()) - pd.to_timedelta(rng.integers(0, 400, n), unit="D")
+    pd.DataFrame(
+        {
+            "DATE OCC": days.strftime(DATE_OCC_FORMAT),
+            "AREA": rng.integers(1, 22, n),
+            "Crm Cd": rng.integers(110, 957, n),
+        }
+    ).to_csv(path, index=False)
+
+
+def scan_query(csv_path, area):
+    df = pd.read_csv(csv_path)
+    df = df[df["AREA"] == area]
+    occurred = parse_dates_occ(df["DATE OCC"])
+    today = pd.Timestamp(date.today())
+    return {
+        days: df.loc[occurred > today - pd.Timedelta(days=days), "Crm Cd"].value_counts().to_dict()
+        for days in WINDOWS
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "crime.csv")
+        write_crime_csv(csv_path, args.rows)
+
+        started = time.perf_counter()
+        expected = scan_query(csv_path, area=1)
+        scan = time.perf_counter() - started
+
+        started = time.perf_counter()
+        counters = ActivityCounters.rebuild([csv_path])
+        build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(args.queries):
+        result = counters.query(WINDOWS, area=i % 21 + 1)
+    query = (time.perf_counter() - started) / args.queries
+    result = counters.query(WINDOWS, area=1)
+    for window in result["windows"]:
+        assert window["by_crm_cd"] == expected[window["days"]], "window sums differ from the scan"
+
+    today = date.today().strftime(DATE_OCC_FORMAT)
+    started = time.perf_counter()
+    for _ in range(args.queries):
+        counters.add({"DATE OCC": today, "AREA": 1, "Crm Cd": 624})
+    add = (time.perf_counter() - started) / args.queries
+
+    print(f"{args.rows:,} records, windows {WINDOWS}")
+    print(f"rebuild counters from CSV  {build:>9.3f} s")
+    print(f"query by re-reading CSV    {scan * 1e3:>9.2f} ms")
+    print(f"query counters             {query * 1e3:>9.2f} ms ({scan / query:,.0f}x)")
+    print(f"add one record             {add * 1e6:>9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
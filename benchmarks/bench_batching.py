@@ -0,0 +1,79 @@
+"""
+Single-row prediction throughput and latency with and without micro-batching
+
+Fires bursts of concurrent single-row requests at the hotspot model, once
+with a model call per request (each in the thread pool, as a plain sync
+endpoint would run) and once through MicroBatcher, and reports requests/sec
+and p50/p99 latency. Uses the model selected by CRPS_MODEL_PATH.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_batching --bursts 20 --burst-size 500
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from batching import MicroBatcher
+from model_serving import load_model, sample_features
+
+
+async def run_bursts(score, X, bursts, burst_size, pause):
+    latencies = []
+
+    async def one(row):
+        started = time.perf_counter()
+        await score(row)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for burst in range(bursts):
+        rows = X[burst * burst_size:(burst + 1) * burst_size]
+        await asyncio.gather(*(one(row) for row in rows))
+        await asyncio.sleep(pause)
+    elapsed = time.perf_counter() - started - bursts * pause
+    return len(latencies) / elapsed, np.percentile(latencies, [50, 99])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--burst-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.05,
+                        help="idle seconds between bursts, excluded from throughput")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model = load_model(allow_unscaled=True)
+    X = sample_features(args.bursts * args.burst_size)
+    model.predict(X[:1])  # warm-up call
+
+    async def per_request(row):
+        return await asyncio.get_running_loop().run_in_executor(None, model.predict, row)
+
+    async def batched():
+        batcher = MicroBatcher(model.predict, args.max_batch, args.max_wait_ms / 1000)
+        try:
+            result = await run_bursts(batcher.submit, X, args.bursts, args.burst_size, args.pause)
+        finally:
+            await batcher.stop()
+        return result, batcher.metrics()
+
+    print(f"{'mode':>14} {'req/sec':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    throughput, (p50, p99) = asyncio.run(
+        run_bursts(per_request, X, args.bursts, args.burst_size, args.pause)
+    )
+    print(f"{'per-request':>14} {throughput:>10,.0f} {p50 * 1e3:>8.2f} {p99 * 1e3:>8.2f}")
+    (throughput, (p50, p99)), metrics = asyncio.run(batched())
+    print(f"{'micro-batched':>14} {throughput:>10,.0f} {p50 * 1e3:>8.2f} {p99 * 1e3:>8.2f}")
+
+    batches = metrics["batch_size"]
+    print(f"{batches['count']} model calls, mean batch {batches['sum'] / batches['count']:.1f} rows, "
+          f"mean queueing delay {metrics['wait_seconds']['sum'] / metrics['wait_seconds']['count'] * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
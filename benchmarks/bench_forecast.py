@@ -0,0 +1,146 @@
+"""
+Forecast range queries: filtering the prediction records against the horizon cube
+
+Generates a grid of predictions (every AREA and crime code each day) for
+several horizons and answers random "AREA and/or Crm Cd over [start, end]"
+queries and top-5 AREA rankings three ways: filtering the records of the
+window from ``PredictionStore.window`` as an endpoint on the record list
+would, masking the store's columns with NumPy, and with ``HorizonCube``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_forecast --horizons 30 90 365
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from forecast_cube import HorizonCube
+from prediction_store import PredictionStore
+from predictions import area_mapping, crime_code_mapping, generate_predictions, prediction_dates
+
+
+def make_store(horizon_days):
+    dates = prediction_dates(datetime.now(), horizon_days)
+    high_risk_json = generate_predictions(dates, grid=True).to_json(orient="records")
+    return PredictionStore.from_json(high_risk_json, area_mapping, crime_code_mapping)
+
+
+def random_queries(cube, n, range_days, seed=0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        start = cube.start + timedelta(days=rng.randrange(max(1, cube.days - range_days + 1)))
+        area = rng.choice([None, rng.choice(list(area_mapping))])
+        crm_cd = rng.choice([None, rng.choice(list(crime_code_mapping))])
+        queries.append((start, start + timedelta(days=range_days - 1), area, crm_cd))
+    return queries
+
+
+def window(start, end):
+    # [start, end] as the half-open datetime window the store takes
+    return (
+        datetime.combine(start, datetime.min.time()),
+        datetime.combine(end + timedelta(days=1), datetime.min.time()),
+    )
+
+
+def records_query(store, start, end, area, crm_cd):
+    area_name = area_mapping.get(area)
+    crime_desc = crime_code_mapping.get(crm_cd)
+    count, total = 0, 0.0
+    for record in store.window(*window(start, end)):
+        if (area is None or record["AREA NAME"] == area_name) and (
+            crm_cd is None or record["Crm Cd Desc"] == crime_desc
+        ):
+            count += 1
+            total += record["Probability"]
+    return count, total
+
+
+def columns_query(store, start, end, area, crm_cd):
+    lo, hi = store.window_bounds(*window(start, end))
+    mask = np.ones(hi - lo, dtype=bool)
+    if area is not None:
+        mask &= store.areas[lo:hi] == area
+    if crm_cd is not None:
+        mask &= store.crimes[lo:hi] == crm_cd
+    return int(mask.sum()), float(store.probabilities[lo:hi][mask].sum(dtype=np.float64))
+
+
+def cube_query(cube, start, end, area, crm_cd):
+    sums, counts = cube.range_sums(start, end, area, crm_cd)
+    return int(counts.sum()), float(sums.sum())
+
+
+def records_top(store, start, end, k):
+    totals = defaultdict(float)
+    for record in store.window(*window(start, end)):
+        totals[record["AREA NAME"]] += record["Probability"]
+    return sorted(totals, key=totals.get, reverse=True)[:k]
+
+
+def columns_top(store, start, end, k):
+    lo, hi = store.window_bounds(*window(start, end))
+    totals = np.bincount(store.areas[lo:hi], weights=store.probabilities[lo:hi])
+    return np.argsort(-totals, kind="stable")[:k]
+
+
+def cube_top(cube, start, end, k):
+    return cube.top_areas(start, end, k)
+
+
+def per_query_us(func, target, queries, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for query in queries:
+            func(target, *query)
+        best = min(best, time.perf_counter() - started)
+    return best / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--horizons", type=int, nargs="+", default=[30, 90, 365])
+    parser.add_argument("--ranges", type=int, nargs="+", default=[1, 7, 30])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--record-queries", type=int, default=10,
+                        help="queries timed on the record list, the slowest path")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'horizon':>7} {'records':>9} {'cube MB':>8} {'build ms':>9} {'query':>7} {'days':>5} "
+          f"{'records us':>11} {'columns us':>11} {'cube us':>8}")
+    for horizon in args.horizons:
+        store = make_store(horizon)
+        started = time.perf_counter()
+        cube = HorizonCube.from_store(store)
+        build_ms = (time.perf_counter() - started) * 1e3
+        for range_days in sorted({days for days in args.ranges if days < horizon} | {horizon}):
+            queries = random_queries(cube, args.queries, range_days)
+            tops = [(start, end, 5) for start, end, _, _ in queries]
+            for check in queries[:20]:
+                expected = columns_query(store, *check)
+                assert cube_query(cube, *check)[0] == expected[0]
+            for name, cases, functions in (
+                ("range", queries, (records_query, columns_query, cube_query)),
+                ("top-5", tops, (records_top, columns_top, cube_top)),
+            ):
+                timings = [
+                    per_query_us(functions[0], store, cases[:args.record_queries], args.repeat),
+                    per_query_us(functions[1], store, cases, args.repeat),
+                    per_query_us(functions[2], cube, cases, args.repeat),
+                ]
+                print(
+                    f"{horizon:>7} {len(store):>9} {cube.nbytes() / (1 << 20):>8.1f} {build_ms:>9.1f} "
+                    f"{name:>7} {range_days:>5} {timings[0]:>11.0f} {timings[1]:>11.0f} {timings[2]:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Prediction generation: legacy per-row Python loop vs the NumPy generator
+
+Run from the repository root:
+
+    python -m benchmarks.bench_generation
+"""
+import argparse
+import random as rd
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from predictions import (
+    area_mapping,
+    area_range,
+    crime_code_mapping,
+    crm_cd_range,
+    generate_predictions,
+    prediction_dates,
+)
+
+
+def legacy_generate(dates, seed=42, grid=False):
+    """
+    The previous get_prediction body: one append per generated value
+    """
+    rd.seed(seed)
+    data = {"AREA": [], "Crm Cd": [], "dates": [], "Risk": [], "Probability": []}
+    for date in dates:
+        if grid:
+            pairs = [(area, crime) for area in area_mapping for crime in crime_code_mapping]
+        else:
+            pairs = [
+                (rd.choice(area_range), rd.choice(crm_cd_range))
+                for _ in range(rd.randint(15, 20))
+            ]
+        for area, crime in pairs:
+            data["AREA"].append(area)
+            data["Crm Cd"].append(crime)
+            data["dates"].append(date)
+            data["Risk"].append("High")
+            data["Probability"].append(round(rd.uniform(80, 100), 2))
+    df = pd.DataFrame(data)
+    df["AREA NAME"] = df["AREA"].map(area_mapping)
+    df["Crm Cd Desc"] = df["Crm Cd"].map(crime_code_mapping)
+    df = df[["dates", "AREA NAME", "Crm Cd Desc", "Risk", "Probability"]].dropna()
+    return df
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--skip-legacy-grid", action="store_true",
+                        help="do not time the legacy loop on the full grid")
+    args = parser.parse_args()
+
+    now = datetime.now()
+    scenarios = [
+        ("90 days", prediction_dates(now, 90), False),
+        ("365 days", prediction_dates(now, 365), False),
+        ("grid 90 days", prediction_dates(now, 90), True),
+        ("grid 365 days", prediction_dates(now, 365), True),
+    ]
+    print(f"{'scenario':>14} {'rows':>9} {'legacy s':>9} {'numpy s':>9} {'+json s':>8}")
+    for name, dates, grid in scenarios:
+        legacy = "-"
+        if not (grid and args.skip_legacy_grid):
+            legacy_seconds, _ = timed(legacy_generate, dates, grid=grid)
+            legacy = f"{legacy_seconds:.3f}"
+        seconds, df = timed(generate_predictions, dates, grid=grid)
+        json_seconds, _ = timed(df.to_json, orient="records")
+        print(f"{name:>14} {len(df):>9} {legacy:>9} {seconds:>9.4f} {json_seconds:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Grouping of prediction records by area: list-scan loop against the store
+
+Times the original grouping loop, which deduplicated dates and crime
+descriptions with list membership checks, against
+``PredictionStore.iter_area_groups`` (which also computes the per-area
+summary) at several record counts.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_grouping --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import math
+import time
+from datetime import datetime
+
+from prediction_store import PredictionStore
+from predictions import area_mapping, crime_code_mapping, generate_predictions, prediction_dates
+
+
+def legacy_group_by_area(predictions):
+    grouped_predictions = {}
+    for pred in predictions:
+        key = pred["AREA NAME"]
+        if key not in grouped_predictions:
+            grouped_predictions[key] = {
+                "dates": [pred["dates"]],
+                "AREA NAME": pred["AREA NAME"],
+                "Crm Cd Desc": [pred["Crm Cd Desc"]],
+                "Risk": pred["Risk"],
+                "Probability": [pred["Probability"]],
+            }
+        else:
+            if pred["dates"] not in grouped_predictions[key]["dates"]:
+                grouped_predictions[key]["dates"].append(pred["dates"])
+            if pred["Crm Cd Desc"] not in grouped_predictions[key]["Crm Cd Desc"]:
+                grouped_predictions[key]["Crm Cd Desc"].append(pred["Crm Cd Desc"])
+            grouped_predictions[key]["Probability"].append(pred["Probability"])
+    return list(grouped_predictions.values())
+
+
+def prediction_records(n):
+    """
+    JSON of the first ``n`` grid predictions (every area x mapped crime per day)
+    """
+    per_day = len(area_mapping) * len(crime_code_mapping)
+    dates = prediction_dates(datetime.now(), math.ceil(n / per_day))
+    df = generate_predictions(dates, grid=True).head(n)
+    return df.to_json(orient="records")
+
+
+def store_group_by_area(store):
+    return list(store.iter_area_groups(0, len(store)))
+
+
+def best_of(fn, records, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(records)
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'records':>9} {'list scans s':>13} {'store s':>8} {'speed-up':>9}")
+    for n in args.sizes:
+        high_risk_json = prediction_records(n)
+        records = json.loads(high_risk_json)
+        store = PredictionStore.from_json(high_risk_json, area_mapping, crime_code_mapping)
+        before, legacy = best_of(legacy_group_by_area, records, args.repeat)
+        after, grouped = best_of(store_group_by_area, store, args.repeat)
+        for entry in grouped:
+            del entry["Summary"]
+        assert grouped == legacy, "grouped entries differ from the original loop"
+        print(f"{n:>9,} {before:>13.3f} {after:>8.3f} {before / after:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Viewport hotspot queries: scanning every record against the spatial index
+
+Indexes synthetic crime locations spread over Los Angeles and times
+random map viewports at several zoom levels, answered by filtering and
+binning every record (what a query without an index has to do) and by
+``SpatialIndex.query``. Then queries a viewport over the whole city at
+each zoom, which the index answers with coarser cells once it spans more
+than MAX_VIEWPORT_TILES, and times report/query cycles under steady
+ingestion, where each query first merges the newly reported record.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_hotspots --records 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from response_cache import encode_json
+from spatial_index import CELL_DETAIL, MAX_LEVEL, MIN_LEVEL, SpatialIndex, located, tile_xy
+
+# South, west, north and east edges of a viewport over all of Los Angeles
+CITY = (33.7, -118.7, 34.35, -118.15)
+
+
+def la_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.normal(34.05, 0.12, n)
+    lon = rng.normal(-118.3, 0.15, n)
+    # The dataset marks unknown locations with 0, 0
+    unknown = rng.random(n) < 0.002
+    lat[unknown] = lon[unknown] = 0
+    return lat, lon
+
+
+def scan_query(lat, lon, south, west, north, east, zoom):
+    level = int(min(max(zoom + CELL_DETAIL, MIN_LEVEL), MAX_LEVEL))
+    mask = located(lat, lon) & (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+    x, y = tile_xy(lat[mask], lon[mask], level)
+    return np.unique((x << level) | y, return_counts=True)
+
+
+def viewports(zoom, count, seed=1):
+    # A 1024 x 768 px map window at this zoom, centered around the city
+    rng = np.random.default_rng(seed)
+    width = 1024 / 256 * 360 / 2 ** zoom
+    height = width * 768 / 1024 * np.cos(np.radians(34.05))
+    for lat, lon in zip(rng.normal(34.05, 0.1, count), rng.normal(-118.3, 0.1, count)):
+        yield lat - height / 2, lon - width / 2, lat + height / 2, lon + width / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--zooms", type=int, nargs="+", default=[10, 12, 14, 16])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--cycles", type=int, default=5000,
+                        help="report/query cycles timed under steady ingestion")
+    args = parser.parse_args()
+
+    lat, lon = la_points(args.records)
+    started = time.perf_counter()
+    index = SpatialIndex()
+    index.add_points(lat, lon)
+    index.query(34, -118.4, 34.1, -118.2, 12)
+    print(f"indexed {args.records:,} records in {time.perf_counter() - started:.2f}s")
+
+    print(f"{'zoom':>4} {'cells':>6} {'scan ms':>8} {'index ms':>9} {'speed-up':>9}")
+    for zoom in args.zooms:
+        scan_times, index_times, cells = [], [], 0
+        for box in viewports(zoom, args.queries):
+            started = time.perf_counter()
+            keys, counts = scan_query(lat, lon, *box, zoom)
+            scan_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            result = index.query(*box, zoom)
+            index_times.append(time.perf_counter() - started)
+            # The index also returns cells that only overlap the viewport edge
+            assert {c["cell"]: c["count"] for c in result["cells"]}.keys() >= {
+                f"{result['level']}/{k >> result['level']}/{k & ((1 << result['level']) - 1)}"
+                for k in keys
+            }
+            cells += len(result["cells"])
+        scan_ms, index_ms = np.median(scan_times) * 1e3, np.median(index_times) * 1e3
+        print(f"{zoom:>4} {cells // args.queries:>6} {scan_ms:>8.2f} {index_ms:>9.2f} "
+              f"{scan_ms / index_ms:>8.1f}x")
+
+    print(f"{'zoom':>4} {'level':>6} {'cells':>6} {'KB':>6} {'city ms':>8}")
+    for zoom in args.zooms:
+        started = time.perf_counter()
+        body = encode_json(index.query(*CITY, zoom))
+        city_ms = (time.perf_counter() - started) * 1e3
+        result = index.query(*CITY, zoom)
+        print(f"{zoom:>4} {result['level']:>6} {len(result['cells']):>6} "
+              f"{len(body) / 1024:>6.0f} {city_ms:>8.2f}")
+
+    query_times = []
+    for _ in range(100):
+        started = time.perf_counter()
+        index.query(34, -118.4, 34.1, -118.2, 12)
+        query_times.append(time.perf_counter() - started)
+    cycle_times = []
+    for lat_i, lon_i in zip(*la_points(args.cycles, seed=2)):
+        started = time.perf_counter()
+        index.add({"LAT": lat_i, "LON": lon_i})
+        index.query(34, -118.4, 34.1, -118.2, 12)
+        cycle_times.append(time.perf_counter() - started)
+    print(f"query alone: median {np.median(query_times) * 1e3:.2f} ms; one report then one "
+          f"query, {args.cycles} cycles: median {np.median(cycle_times) * 1e3:.2f} ms, "
+          f"max {max(cycle_times) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
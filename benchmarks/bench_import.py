@@ -0,0 +1,142 @@
+"""
+Bulk import throughput and peak memory against per-record validation
+
+Writes a synthetic crime file (a small fraction of rows invalid), imports
+it with ``bulk_import.import_records`` at several chunk sizes, and
+validates a sample the way /crime_reporting/batch does, one CrimeRecord
+per row. Each run is a fresh process so its peak RSS is its own.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --rows 1000000
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+
+def write_import_file(path, n, fmt, invalid=0.01, seed=0):
+    """
+    Write ``n`` synthetic records named as CrimeRecord fields
+    """
+    rng = np.random.default_rng(seed)
+    areas = rng.integers(1, 22, n)
+    days = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 600, n), unit="D")
+    df = pd.DataFrame(
+        {
+            "DR_NO": np.arange(n) + 240000000,
+            "DATE_OCC": days.strftime("%m/%d/%Y %I:%M:%S %p"),
+            "TIME_OCC": rng.integers(0, 2400, n),
+            "AREA": areas,
+            "AREA_NAME": np.char.add("Area ", areas.astype(str)),
+            "Crm_Cd": rng.integers(110, 957, n),
+            "Crm_Cd_Desc": "VEHICLE - STOLEN",
+            "Vict_Age": rng.integers(0, 90, n),
+            "Vict_Sex": rng.choice(["M", "F", "X"], n),
+            "Premis_Cd": rng.integers(101, 972, n),
+            "Status_Desc": rng.choice(["Invest Cont", "Adult Arrest"], n),
+            "LAT": np.round(33.7 + rng.random(n) * 0.6, 4),
+            "LON": np.round(-118.6 + rng.random(n) * 0.5, 4),
+        }
+    )
+    bad = rng.random(n) < invalid
+    df["Vict_Age"] = df["Vict_Age"].astype(object)
+    df.loc[bad, "Vict_Age"] = "unknown"
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient="records", lines=True)
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if os.uname().sysname == "Darwin" else peak / 1024
+
+
+def run_import(path, fmt, chunksize):
+    from bulk_import import import_records
+
+    idle = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        report = import_records(path, fmt, os.path.join(tmp, "dataset.csv"), chunksize)
+    return report, idle, peak_rss_mb()
+
+
+def run_per_record(path, fmt, rows):
+    from app import CrimeRecord
+    from ingestion import CsvAppender, record_to_row
+
+    idle = peak_rss_mb()
+    if fmt == "csv":
+        df = pd.read_csv(path, nrows=rows, dtype=str, keep_default_na=False)
+    else:
+        df = pd.read_json(path, lines=True, nrows=rows, dtype=False)
+    records = [
+        {key: value for key, value in record.items() if value != ""}
+        for record in df.to_dict("records")
+    ]
+    started = time.perf_counter()
+    valid = []
+    for record in records:
+        try:
+            valid.append(record_to_row(CrimeRecord(**record).model_dump()))
+        except ValueError:
+            pass
+    with tempfile.TemporaryDirectory() as tmp:
+        CsvAppender(os.path.join(tmp, "dataset.csv")).append(valid)
+    return len(records), time.perf_counter() - started, idle, peak_rss_mb()
+
+
+def in_fresh_process(fn, *args):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--chunksizes", type=int, nargs="+", default=[20_000, 100_000, 500_000])
+    parser.add_argument(
+        "--per-record-rows", type=int, default=100_000,
+        help="rows validated one CrimeRecord at a time for comparison",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"import.{args.format}")
+        # Peak RSS survives exec, so the parent never holds the generated frame
+        in_fresh_process(write_import_file, path, args.rows, args.format)
+        size_mb = os.path.getsize(path) / (1 << 20)
+        print(f"{args.rows} rows, {size_mb:.0f} MB of {args.format}")
+        print(f"{'path':<24} {'rows/s':>10} {'seconds':>8} {'idle RSS':>9} {'peak RSS':>9}")
+
+        for chunksize in args.chunksizes:
+            report, idle, peak = in_fresh_process(run_import, path, args.format, chunksize)
+            print(
+                f"{f'bulk, chunks of {chunksize}':<24} {report['rows'] / report['seconds']:>10.0f} "
+                f"{report['seconds']:>8.2f} {idle:>7.0f}MB {peak:>7.0f}MB"
+                f"  ({report['imported']} imported, {report['rejected']} rejected)"
+            )
+
+        if args.per_record_rows:
+            rows, seconds, idle, peak = in_fresh_process(
+                run_per_record, path, args.format, args.per_record_rows
+            )
+            print(
+                f"{'per-record CrimeRecord':<24} {rows / seconds:>10.0f} "
+                f"{seconds:>8.2f} {idle:>7.0f}MB {peak:>7.0f}MB  ({rows} rows)"
+            )
+
+
+if __name__ == "__main__":
+    main()
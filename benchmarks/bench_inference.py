@@ -0,0 +1,47 @@
+"""
+CPU throughput of hotspot model inference, in rows/sec per batch size
+
+Uses the model and scaler selected by CRPS_MODEL_PATH / CRPS_SCALER_PATH.
+Without a scaler file the features are passed through unscaled, which
+does not change the timings.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_inference
+"""
+import argparse
+import time
+
+from model_serving import load_model, sample_features
+
+
+def rows_per_second(model, X, min_seconds):
+    model.predict(X)  # warm-up call
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        model.predict(X)
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return calls * len(X) / elapsed, elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 1024, 65536])
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    model = load_model(allow_unscaled=True)
+    print(f"loaded {model.backend} model in {time.perf_counter() - started:.3f}s")
+
+    print(f"{'batch':>7} {'rows/sec':>14} {'ms/call':>9}")
+    for batch_size in args.batch_sizes:
+        throughput, per_call = rows_per_second(model, sample_features(batch_size), args.min_seconds)
+        print(f"{batch_size:>7} {throughput:>14,.0f} {per_call * 1e3:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
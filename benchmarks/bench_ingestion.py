@@ -0,0 +1,105 @@
+"""
+Insert latency of POST /crime_reporting as dataset.csv grows
+
+Run from the repository root:
+
+    python -m benchmarks.bench_ingestion
+"""
+import argparse
+import csv
+import os
+import random as rd
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from ingestion import CSV_COLUMNS, CsvAppender, record_to_row
+
+
+def make_record(i):
+    return {
+        "DR_NO": 200000000 + i,
+        "Date_Rptd": "01/15/2024 12:00:00 AM",
+        "DATE_OCC": "01/14/2024 12:00:00 AM",
+        "TIME_OCC": rd.randint(0, 2359),
+        "AREA": rd.randint(1, 21),
+        "AREA_NAME": "Central",
+        "Crm_Cd": 510,
+        "Crm_Cd_Desc": "VEHICLE - STOLEN",
+        "Vict_Age": rd.randint(0, 90),
+        "Vict_Sex": rd.choice(["M", "F", "X"]),
+        "LAT": 34.0 + rd.random(),
+        "LON": -118.0 - rd.random(),
+    }
+
+
+def grow(path, rows):
+    """
+    Append ``rows`` synthetic records in bulk to reach the next dataset size
+    """
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if f.tell() == 0:
+            writer.writerow(CSV_COLUMNS)
+        writer.writerows(record_to_row(make_record(i)) for i in range(rows))
+
+
+def legacy_insert(path, record):
+    # The previous implementation: read, concat one row and rewrite
+    df = pd.read_csv(path, low_memory=False)
+    df = pd.concat([df, pd.DataFrame([record])], ignore_index=True)
+    df.to_csv(path, index=False)
+
+
+def measure(insert, samples):
+    latencies = []
+    for i in range(samples):
+        started = time.perf_counter()
+        insert(i)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[0, 100_000, 1_000_000, 3_000_000]
+    )
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument(
+        "--legacy-max", type=int, default=100_000,
+        help="largest dataset size at which the legacy rewrite is also timed",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dataset.csv")
+        appender = CsvAppender(path)
+        current = 0
+        print(f"{'rows':>10} {'append p50 ms':>14} {'append p99 ms':>14} {'legacy p50 ms':>14}")
+        for size in sorted(args.sizes):
+            grow(path, size - current)
+            current = size
+
+            p50, p99 = measure(
+                lambda i: appender.append([record_to_row(make_record(i))]),
+                args.samples,
+            )
+            current += args.samples
+
+            legacy = "-"
+            if size <= args.legacy_max:
+                legacy_path = os.path.join(tmp, "legacy.csv")
+                pd.read_csv(path, low_memory=False).to_csv(legacy_path, index=False)
+                legacy_p50, _ = measure(
+                    lambda i: legacy_insert(legacy_path, make_record(i)), 5
+                )
+                legacy = f"{legacy_p50 * 1e3:.2f}"
+            print(f"{size:>10} {p50 * 1e3:>14.3f} {p99 * 1e3:>14.3f} {legacy:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Cold start and memory of a worker per model inference backend
+
+Each backend is measured in a fresh interpreter: the time to import the
+serving code, load the model and answer a first prediction, and the peak
+RSS afterwards. Export the model first with ``python model_export.py``.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_model_backends
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from model_serving import MODEL_PATH
+
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+from model_serving import load_model, sample_features
+model = load_model(backend=sys.argv[1], allow_unscaled=True)
+model.predict(sample_features(1))
+print(json.dumps({
+    "backend": model.backend,
+    "seconds": time.perf_counter() - started,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def measure(backend):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, backend], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+    return json.loads(result.stdout.splitlines()[-1]), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", nargs="+", default=["native", "numpy"])
+    args = parser.parse_args()
+
+    print(f"model: {MODEL_PATH}")
+    print(f"{'backend':>8} {'loaded as':>10} {'cold start s':>13} {'peak RSS MB':>12}")
+    for backend in args.backends:
+        figures, error = measure(backend)
+        if figures is None:
+            print(f"{backend:>8} unavailable: {error}")
+            continue
+        print(f"{backend:>8} {figures['backend']:>10} {figures['seconds']:>13.3f} "
+              f"{figures['max_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
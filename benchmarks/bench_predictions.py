@@ -0,0 +1,102 @@
+"""
+Latency of GET /predictions: legacy parse-and-scan loop vs PredictionStore
+
+Run from the repository root:
+
+    python -m benchmarks.bench_predictions
+"""
+import argparse
+import json
+import random as rd
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.bench_grouping import legacy_group_by_area
+from prediction_store import PredictionStore
+
+
+AREA_NAMES = [f"Area {i}" for i in range(1, 22)]
+CRIME_DESCS = [f"Crime {i}" for i in range(150)]
+WINDOWS = {"today": 1, "aweek": 7, "twoweeks": 14, "amonth": 30}
+
+
+def make_predictions(n, horizon_days=90, seed=42):
+    """
+    Build ``n`` synthetic prediction records spread over ``horizon_days``
+    """
+    rd.seed(seed)
+    start = datetime.now()
+    dates = [
+        (start + timedelta(days=offset)).strftime("%d/%m/%Y")
+        for offset in range(1, horizon_days + 1)
+    ]
+    per_day = max(1, n // horizon_days)
+    records = []
+    for i in range(n):
+        records.append(
+            {
+                "dates": dates[min(i // per_day, horizon_days - 1)],
+                "AREA NAME": rd.choice(AREA_NAMES),
+                "Crm Cd Desc": rd.choice(CRIME_DESCS),
+                "Risk": "High",
+                "Probability": round(rd.uniform(80, 100), 2),
+            }
+        )
+    return json.dumps(records)
+
+
+def legacy_request(high_risk_json, start_date, end_date):
+    """
+    The original request body: parse the JSON blob and every date per call
+    """
+    predictions = json.loads(high_risk_json)
+    in_range = []
+    for pred in predictions:
+        try:
+            pred_date = datetime.strptime(pred["dates"], "%d/%m/%Y")
+        except ValueError:
+            continue
+        if pred_date < start_date or pred_date >= end_date:
+            continue
+        in_range.append(pred)
+    return legacy_group_by_area(in_range)
+
+
+def store_request(store, start_date, end_date):
+    return list(store.iter_area_groups(*store.window_bounds(start_date, end_date)))
+
+
+def timed(func, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'records':>10} {'filter':>9} {'legacy ms':>11} {'store ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        high_risk_json = make_predictions(n)
+        store = PredictionStore.from_json(high_risk_json)
+        now = datetime.now()
+        for name, days in WINDOWS.items():
+            start_date, end_date = now, now + timedelta(days=days)
+            legacy = timed(legacy_request, high_risk_json, start_date, end_date, repeat=args.repeat)
+            indexed = timed(store_request, store, start_date, end_date, repeat=args.repeat)
+            print(
+                f"{n:>10} {name:>9} {legacy * 1e3:>11.2f} {indexed * 1e3:>10.2f}"
+                f" {legacy / max(indexed, 1e-9):>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
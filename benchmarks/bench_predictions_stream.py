@@ -0,0 +1,101 @@
+"""
+Peak memory and time to first byte of /predictions response modes
+
+Builds a large prediction store (every area x mapped crime per day over the
+horizon) and measures, with tracemalloc, the memory allocated on top of the
+store while producing the full JSON response, the NDJSON stream, the first
+two paginated pages and the compact columnar response, each read from the
+store as the endpoint does. Also compares the store's columns with the same
+records held as dicts.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_predictions_stream --horizon-days 180
+"""
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+
+from prediction_store import PredictionStore
+from predictions import area_mapping, crime_code_mapping, generate_predictions, prediction_dates
+from response_cache import encode_json
+
+
+def full_response(store, lo, hi):
+    body = JSONResponse(content={"predictions": list(store.iter_area_groups(lo, hi))}).body
+    yield body
+
+
+def ndjson_stream(store, lo, hi):
+    for entry in store.iter_area_groups(lo, hi):
+        yield encode_json(entry) + b"\n"
+
+
+def page(store, lo, hi, offset, limit=5):
+    index = store.area_index(lo, hi)
+    yield encode_json(
+        {"predictions": list(store.iter_area_groups(lo, hi, index[offset:offset + limit]))}
+    )
+
+
+def first_page(store, lo, hi):
+    return page(store, lo, hi, 0)
+
+
+def second_page(store, lo, hi):
+    return page(store, lo, hi, 5)
+
+
+def compact_response(store, lo, hi):
+    yield encode_json({"predictions": store.columns(lo, hi)})
+
+
+def measure(produce, store, lo, hi):
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    total = 0
+    for chunk in produce(store, lo, hi):
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first_byte, elapsed, peak, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--horizon-days", type=int, default=180)
+    args = parser.parse_args()
+
+    dates = prediction_dates(datetime.now(), args.horizon_days)
+    df = generate_predictions(dates, grid=True)
+    store = PredictionStore.from_json(df.to_json(orient="records"), area_mapping, crime_code_mapping)
+    del df
+    tracemalloc.start()
+    records = store.rows(0, len(store))
+    _, as_dicts = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    print(f"{len(store):,} prediction records over {len(dates)} days: "
+          f"{store.nbytes() / 2**20:.1f} MB as columns, {as_dicts / 2**20:.1f} MB as dicts")
+
+    print(f"{'mode':>12} {'first byte s':>13} {'total s':>8} {'peak MB':>8} {'bytes':>13}")
+    for name, produce in [
+        ("full", full_response),
+        ("ndjson", ndjson_stream),
+        ("first page", first_page),
+        ("second page", second_page),
+        ("compact", compact_response),
+    ]:
+        first_byte, elapsed, peak, total = measure(produce, store, 0, len(store))
+        print(f"{name:>12} {first_byte:>13.3f} {elapsed:>8.3f} {peak / 2**20:>8.1f} {total:>13,}")
+
+
+if __name__ == "__main__":
+    main()
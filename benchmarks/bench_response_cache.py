@@ -0,0 +1,80 @@
+"""
+Per-request cost of read endpoints with and without the response cache
+
+For the /predictions and /city_crime_mapping payloads, compares building
+and serializing the response on every call (the uncached path) with
+serving cached bytes, gzip-compressed bytes and a 304 revalidation.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_response_cache
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from predictions import area_mapping, crime_code_mapping, get_prediction_store
+from response_cache import ResponseCache
+
+
+def request(headers):
+    return Request({
+        "type": "http",
+        "headers": [(name.encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def per_call(fn, min_seconds):
+    fn()  # warm-up call
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    store = get_prediction_store()
+    now = datetime.now()
+    payloads = {
+        "/predictions?filter=amonth": lambda: {
+            "predictions": list(
+                store.iter_area_groups(*store.window_bounds(now, now + timedelta(days=30)))
+            )
+        },
+        "/city_crime_mapping": lambda: {
+            "city_names": area_mapping, "crime_types": crime_code_mapping
+        },
+    }
+
+    print(f"{'endpoint':>27} {'uncached us':>12} {'cached us':>10} {'gzip us':>8} "
+          f"{'304 us':>7} {'bytes':>7} {'gzip bytes':>11}")
+    for name, build in payloads.items():
+        cache = ResponseCache()
+        cached = cache.get(name, build)
+        plain = request({})
+        gzipped = request({"accept-encoding": "gzip, deflate"})
+        revalidate = request({"if-none-match": cached.etag})
+        timings = [
+            per_call(lambda: JSONResponse(content=build()), args.min_seconds),
+            per_call(lambda: cache.respond(plain, name, build), args.min_seconds),
+            per_call(lambda: cache.respond(gzipped, name, build), args.min_seconds),
+            per_call(lambda: cache.respond(revalidate, name, build), args.min_seconds),
+        ]
+        uncached, hit, gzip_hit, not_modified = (t * 1e6 for t in timings)
+        print(f"{name:>27} {uncached:>12.1f} {hit:>10.1f} {gzip_hit:>8.1f} {not_modified:>7.1f} "
+              f"{len(cached.body):>7} {len(cached.encoded.get('gzip', cached.body)):>11}")
+
+
+if __name__ == "__main__":
+    main()
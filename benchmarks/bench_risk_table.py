@@ -0,0 +1,69 @@
+"""
+Risk table lookups against live model inference, in rows/sec per batch size
+
+Builds a one-year table in a scratch directory unless --table points to an
+existing one, then scores the same in-grid rows both ways.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_risk_table
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from model_serving import load_model
+from risk_table import RiskTable, build_risk_table
+
+
+def rows_per_second(score, X, min_seconds):
+    score(X)  # warm-up call
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        score(X)
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return calls * len(X) / elapsed, elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--table", help="existing risk table .npy")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 1024, 65536])
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.table:
+        table = RiskTable.load(args.table)
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="crps-risk-"), "risk_table.npy")
+        started = time.perf_counter()
+        table = build_risk_table(path, years=[2025])
+        print(f"built {table.table.size:,} cells in {time.perf_counter() - started:.1f}s")
+    model = load_model()
+
+    # Sample rows inside the table grid
+    rng = np.random.default_rng(0)
+    n = max(args.batch_sizes)
+    X = np.column_stack(
+        [rng.choice(values, n) for values in table.axes]
+    ).astype(np.float32)
+    probabilities, hit = table.lookup(X)
+    max_diff = np.abs(probabilities - model.predict(X)).max()
+    print(f"{hit.mean():.0%} of rows found, max difference from the model {max_diff:.1e}")
+
+    print(f"{'batch':>7} {'model rows/s':>14} {'table rows/s':>14} {'speed-up':>9}")
+    for batch_size in args.batch_sizes:
+        rows = X[:batch_size]
+        live, _ = rows_per_second(model.predict, rows, args.min_seconds)
+        lookup, _ = rows_per_second(table.lookup, rows, args.min_seconds)
+        print(f"{batch_size:>7} {live:>14,.0f} {lookup:>14,.0f} {lookup / live:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Memory per worker of per-process prediction stores against a shared snapshot
+
+Generates a prediction grid, then starts ``--workers`` processes that each
+either build their own PredictionStore from the JSON, as app.py workers do
+by default, or attach to the snapshot published with
+``shared_snapshot.publish``, as they do under CRPS_SHARED_DIR. Each process
+reads every column, then reports its private and proportional set size
+(PSS splits shared pages between the processes mapping them) from
+/proc/self/smaps_rollup, so Linux only.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_shared_snapshot --horizon-days 90 --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def memory_mb():
+    """
+    Private and proportional set size of this process in MB
+    """
+    sizes = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("Pss", "Private_Clean", "Private_Dirty"):
+                sizes[key] = int(value.split()[0]) / 1024
+    return sizes["Private_Clean"] + sizes["Private_Dirty"], sizes["Pss"]
+
+
+def worker(mode, root, json_path, ready, done):
+    from predictions import area_mapping, crime_code_mapping
+    from prediction_store import STORE_COLUMNS, PredictionStore
+    from shared_snapshot import attach
+
+    before = memory_mb()
+    started = time.perf_counter()
+    if mode == "shared":
+        high_risk_json, store = attach(root)
+    else:
+        # app.py workers keep the JSON alongside the store they parse from it
+        with open(json_path) as f:
+            high_risk_json = f.read()
+        store = PredictionStore.from_json(high_risk_json, area_mapping, crime_code_mapping)
+    # Touch every page, as serving the full window does
+    for column in STORE_COLUMNS:
+        np.asarray(getattr(store, column)).sum()
+    seconds = time.perf_counter() - started
+    # Measure once every worker holds its store, so shared pages are split
+    ready.put(None)
+    done.wait()
+    private, pss = memory_mb()
+    del high_risk_json
+    return private - before[0], pss - before[1], seconds
+
+
+def run(mode, workers, root, json_path):
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        ready, done = manager.Queue(), manager.Event()
+        with context.Pool(workers) as pool:
+            pending = [
+                pool.apply_async(worker, (mode, root, json_path, ready, done))
+                for _ in range(workers)
+            ]
+            for _ in range(workers):
+                ready.get()
+            done.set()
+            return [result.get() for result in pending]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--horizon-days", type=int, default=90)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    from predictions import area_mapping, crime_code_mapping, get_prediction
+    from prediction_store import PredictionStore
+    from shared_snapshot import publish
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            high_risk_json = get_prediction(horizon_days=args.horizon_days, grid=True)
+        finally:
+            os.chdir(cwd)
+        store = PredictionStore.from_json(high_risk_json, area_mapping, crime_code_mapping)
+        root = os.path.join(tmp, "shared")
+        publish(high_risk_json, store, root)
+        json_path = os.path.join(root, store.version, "high_risk_data.json")
+        print(
+            f"{len(store)} predictions, {len(high_risk_json) / (1 << 20):.0f} MB of JSON, "
+            f"{store.nbytes() / (1 << 20):.1f} MB of columns"
+        )
+        print(f"{'mode':<12} {'workers':>7} {'private/worker':>15} {'PSS/worker':>11} "
+              f"{'PSS total':>10} {'load s':>7}")
+        for mode in ("per-worker", "shared"):
+            for workers in args.workers:
+                results = run(mode, workers, root, json_path)
+                private = sum(r[0] for r in results) / workers
+                pss = sum(r[1] for r in results)
+                seconds = max(r[2] for r in results)
+                print(
+                    f"{mode:<12} {workers:>7} {private:>13.1f}MB {pss / workers:>9.1f}MB "
+                    f"{pss:>8.1f}MB {seconds:>7.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
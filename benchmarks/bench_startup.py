@@ -0,0 +1,97 @@
+"""
+Cold start of app.py: process launch to first response and to readiness
+
+Starts uvicorn in a scratch directory for each warm-up mode and reports
+how long it takes until ``/`` answers, until the first ``/predictions``
+response and until ``/ready`` returns 200.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup
+"""
+import argparse
+import csv
+import os
+import random as rd
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.stress_ingestion import REPO_ROOT, free_port
+
+
+def wait_for(url, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return time.monotonic()
+        except (urllib.error.HTTPError, OSError):
+            time.sleep(0.005)
+    raise RuntimeError(f"{url} did not respond in time")
+
+
+def cold_start(workdir, warmup):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, CRPS_WARMUP=warmup)
+    started = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        live = wait_for(base + "/", started + 120)
+        urllib.request.urlopen(base + "/predictions", timeout=120).close()
+        first_data = time.monotonic()
+        ready = None
+        if warmup != "lazy":
+            # In lazy mode resources load only when a request needs them
+            ready = wait_for(base + "/ready", started + 120) - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+    return live - started, first_data - started, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modes", nargs="+", default=["background", "eager", "lazy"])
+    parser.add_argument("--rows", type=int, default=200_000,
+                        help="rows in the synthetic df1.csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="crps-startup-")
+    with open(os.path.join(workdir, "df1.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["AREA NAME", "DATE OCC", "Vict Sex"])
+        for _ in range(args.rows):
+            writer.writerow([
+                rd.choice(["Central", "Harbor", "Newton", "Topanga"]),
+                f"{rd.randint(1, 12):02d}/{rd.randint(1, 28):02d}/2024 12:00:00 AM",
+                rd.choice("MFX"),
+            ])
+
+    print(f"{'mode':>11} {'first response s':>17} {'/predictions s':>15} {'ready s':>9}")
+    try:
+        for mode in args.modes:
+            runs = [cold_start(workdir, mode) for _ in range(args.repeat)]
+            live = statistics.median(run[0] for run in runs)
+            first_data = statistics.median(run[1] for run in runs)
+            ready = "-"
+            if runs[0][2] is not None:
+                ready = f"{statistics.median(run[2] for run in runs):.3f}"
+            print(f"{mode:>11} {live:>17.3f} {first_data:>15.3f} {ready:>9}")
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
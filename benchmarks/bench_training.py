@@ -0,0 +1,116 @@
+"""
+Training data preparation: the notebook's whole-file pandas steps against chunked reads
+
+Times reading, cleaning and encoding a synthetic crime CSV the way the
+notebook does (one ``read_csv`` of every column, row-wise ``apply`` and
+LabelEncoder) against ``training.read_training_frame`` and
+``training.build_features``, and reports the peak traced memory of each.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_training --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from feature_encoders import ENCODED_COLUMNS
+from model_serving import FEATURE_COLUMNS
+from training import build_features, read_training_frame
+
+
+def write_crime_csv(path, n, seed=0):
+    """
+    Write ``n`` synthetic rows with the crime CSV's columns and value shapes
+    """
+    rng = np.random.default_rng(seed)
+    areas = rng.integers(1, 22, n)
+    days = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1800, n), unit="D")
+    pd.DataFrame(
+        {
+            "DR_NO": np.arange(n),
+            "DATE OCC": days.strftime("%m/%d/%Y %I:%M:%S %p"),
+            "AREA": areas,
+            "AREA NAME": np.char.add("Area ", areas.astype(str)),
+            "Crm Cd": rng.integers(110, 957, n),
+            "Crm Cd Desc": "CRIME DESCRIPTION",
+            "Vict Age": rng.integers(0, 90, n),
+            "Vict Sex": rng.choice(np.array(["M", "F", "X", "H", "-", None], dtype=object), n),
+            "Vict Descent": rng.choice(np.array(["W", "B", "H", "O", "-", None], dtype=object), n),
+            "Premis Cd": rng.integers(100, 900, n).astype(float),
+            "Premis Desc": "STREET",
+            "Weapon Desc": rng.choice(np.array(["HAND GUN", "KNIFE", None], dtype=object), n),
+            "Status Desc": rng.choice(np.array(["Invest Cont", "Adult Arrest"], dtype=object), n),
+            "Crm Cd 1": np.where(rng.random(n) < 0.99, 1.0, np.nan),
+            "LOCATION": "100 MAIN ST",
+        }
+    ).to_csv(path, index=False)
+
+
+def notebook_prepare(csv_path):
+    from sklearn.preprocessing import LabelEncoder
+
+    df = pd.read_csv(csv_path)
+    df["Vict Sex"] = df["Vict Sex"].fillna("X").replace(["H", "-"], "X")
+    df["Vict Descent"] = df["Vict Descent"].replace("-", "Unknown")
+    df[["Vict Descent", "Weapon Desc"]] = df[["Vict Descent", "Weapon Desc"]].fillna("Unknown")
+    df = df.dropna(subset=["Crm Cd 1", "Premis Cd"])
+    df["year"] = pd.to_datetime(df["DATE OCC"], format="%m/%d/%Y %I:%M:%S %p").dt.year
+    df["case"] = df["Status Desc"].apply(lambda x: "Not solved" if x == "Invest Cont" else "Solved")
+    df["case"] = df["case"].apply(lambda x: 0 if x == "Solved" else 1)
+    counts = df["AREA NAME"].value_counts()
+    median = counts.quantile(0.5)
+    df["Risk"] = df["AREA NAME"].apply(lambda x: 1 if counts[x] > median else 0)
+    for col in ENCODED_COLUMNS:
+        df[col] = LabelEncoder().fit_transform(df[col])
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32), df["Risk"].to_numpy()
+
+
+def chunked_prepare(csv_path, chunksize):
+    X, y, _ = build_features(read_training_frame(csv_path, chunksize))
+    return X, y
+
+
+def measure(fn, *args):
+    """
+    Wall time of one call, then the peak traced memory of a second call
+
+    Tracing slows allocation-heavy code, so the two are taken separately.
+    """
+    started = time.perf_counter()
+    result = fn(*args)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunksize", type=int, default=250_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "crime.csv")
+        write_crime_csv(csv_path, args.rows)
+        print(f"{args.rows:,} rows, {os.path.getsize(csv_path) / 1e6:.0f} MB of CSV")
+        before, before_peak, (X_nb, y_nb) = measure(notebook_prepare, csv_path)
+        after, after_peak, (X, y) = measure(chunked_prepare, csv_path, args.chunksize)
+
+    assert np.array_equal(X, X_nb) and np.array_equal(y, y_nb), "features differ from the notebook's"
+    print(f"{'':>9} {'seconds':>8} {'peak MB':>8}")
+    print(f"{'notebook':>9} {before:>8.2f} {before_peak / 1e6:>8.0f}")
+    print(f"{'chunked':>9} {after:>8.2f} {after_peak / 1e6:>8.0f}")
+    print(f"speed-up {before / after:.1f}x, {before_peak / after_peak:.1f}x less memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Load test of the app.py endpoints with a stored-baseline regression check
+
+Builds a scratch directory with a synthetic df1.csv drawn from
+``area_mapping`` and ``crime_code_mapping``, then drives each scenario
+with ``--concurrency`` closed-loop clients for ``--duration`` seconds,
+either in-process through the ASGI interface (no sockets, the app's own
+cost) or against a local ``uvicorn`` with ``--workers`` processes. Prints
+requests per second and p50/p95/p99 latency per scenario.
+
+``--save-baseline`` stores the results as JSON; ``--baseline`` compares a
+run against them and exits with status 1 when a scenario's throughput
+drops, or its p95/p99 latency grows, by more than ``--tolerance``. The
+suite needs no network access beyond the loopback interface.
+
+Run from the repository root:
+
+    python -m benchmarks.load_test --mode inprocess --save-baseline baseline.json
+    python -m benchmarks.load_test --mode inprocess --baseline baseline.json
+    python -m benchmarks.load_test --mode uvicorn --workers 4
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from benchmarks.stress_ingestion import REPO_ROOT, free_port, wait_until_live
+from ingestion import CSV_COLUMNS
+from predictions import area_mapping, crime_code_mapping
+
+
+# Downtown LA; /hotspots viewports and synthetic crimes fall inside it
+VIEWPORT = {"south": 33.95, "west": -118.40, "north": 34.15, "east": -118.15}
+
+_dr_numbers = itertools.count(300_000_000)
+
+
+def report_record():
+    area = next(iter(area_mapping))
+    code = next(iter(crime_code_mapping))
+    return {
+        "DR_NO": next(_dr_numbers),
+        "DATE_OCC": time.strftime("%m/%d/%Y 12:00:00 AM"),
+        "AREA": area,
+        "AREA_NAME": area_mapping[area],
+        "Crm_Cd": code,
+        "Crm_Cd_Desc": crime_code_mapping[code],
+        "Vict_Sex": "F",
+        "LAT": 34.05,
+        "LON": -118.25,
+    }
+
+
+# Scenario name to (method, path, JSON body factory); writes run last so
+# they do not invalidate the cached reads mid-measurement
+SCENARIOS = {
+    "predictions": ("GET", "/predictions", None),
+    "predictions_today": ("GET", "/predictions?filter=today", None),
+    "predictions_aweek": ("GET", "/predictions?filter=aweek", None),
+    "predictions_twoweeks": ("GET", "/predictions?filter=twoweeks", None),
+    "predictions_amonth": ("GET", "/predictions?filter=amonth", None),
+    "crime_frequency_graph": ("GET", "/crime_frequency_graph", None),
+    "gender_distribution_graph": ("GET", "/gender_distribution_graph", None),
+    "risky_areas_graph": ("GET", "/risky_areas_graph", None),
+    "city_crime_mapping": ("GET", "/city_crime_mapping", None),
+    "hotspots": ("GET", "/hotspots?" + "&".join(f"{k}={v}" for k, v in VIEWPORT.items()), None),
+    "activity": ("GET", "/activity", None),
+    "crime_reporting": ("POST", "/crime_reporting", report_record),
+}
+
+
+def write_dataset(path, rows, seed=0):
+    """
+    Write a synthetic historical extract with the dataset's columns
+    """
+    rng = np.random.default_rng(seed)
+    areas = np.array(list(area_mapping))
+    codes = np.array(list(crime_code_mapping))
+    area = areas[rng.integers(0, len(areas), rows)]
+    code = codes[rng.integers(0, len(codes), rows)]
+    # The last two years, so the activity windows and charts have data
+    days = pd.Timestamp.now().normalize() - pd.to_timedelta(rng.integers(0, 730, rows), unit="D")
+    df = pd.DataFrame(
+        {
+            "DR_NO": np.arange(rows) + 200_000_000,
+            "DATE OCC": days.strftime("%m/%d/%Y %I:%M:%S %p"),
+            "AREA": area,
+            "AREA NAME": pd.Series(area).map(area_mapping),
+            "Crm Cd": code,
+            "Crm Cd Desc": pd.Series(code).map(crime_code_mapping),
+            "Vict Sex": rng.choice(["M", "F", "X"], rows),
+            "LAT": np.round(rng.uniform(VIEWPORT["south"], VIEWPORT["north"], rows), 4),
+            "LON": np.round(rng.uniform(VIEWPORT["west"], VIEWPORT["east"], rows), 4),
+        }
+    )
+    df.reindex(columns=CSV_COLUMNS).to_csv(path, index=False)
+
+
+def prepare_workdir(rows):
+    workdir = tempfile.mkdtemp(prefix="crps-load-")
+    write_dataset(os.path.join(workdir, "df1.csv"), rows)
+    return workdir
+
+
+def server_env():
+    # Relative defaults would resolve inside the scratch directory
+    return dict(
+        os.environ,
+        PYTHONPATH=REPO_ROOT,
+        CRPS_WARMUP="eager",
+        CRPS_MODEL_PATH=os.path.join(REPO_ROOT, "crime_hotspot_model.h5"),
+    )
+
+
+async def drive(client, scenario, concurrency, duration, warmup):
+    """
+    Run one scenario with closed-loop clients
+
+    Returns:
+        dict: Requests, errors, requests per second and latency percentiles in ms
+    """
+    method, path, body = SCENARIOS[scenario]
+
+    async def call():
+        started = time.perf_counter()
+        response = await client.request(method, path, json=body() if body else None)
+        return time.perf_counter() - started, response.status_code < 400
+
+    for _ in range(warmup):
+        await call()
+
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            latency, ok = await call()
+            latencies.append(latency)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = (
+        statistics.quantiles(latencies, n=100)[q] * 1000 for q in (49, 94, 98)
+    ) if len(latencies) > 1 else (float("nan"),) * 3
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": p50,
+        "p95_ms": p95,
+        "p99_ms": p99,
+    }
+
+
+async def run_scenarios(client, args):
+    results = {}
+    for scenario in args.scenarios:
+        results[scenario] = await drive(
+            client, scenario, args.concurrency, args.duration, args.warmup
+        )
+        print_result(scenario, results[scenario])
+    return results
+
+
+def run_inprocess(workdir, args):
+    os.environ.update(server_env())
+    os.chdir(workdir)
+    sys.path.insert(0, REPO_ROOT)
+    from app import app
+
+    # Per-request INFO logs would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+
+    async def main():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+                return await run_scenarios(client, args)
+
+    return asyncio.run(main())
+
+
+def run_uvicorn(workdir, args):
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        cwd=workdir, env=server_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_live(base + "/ready", timeout=300)
+
+        async def main():
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+                return await run_scenarios(client, args)
+
+        return asyncio.run(main())
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def print_result(scenario, result):
+    print(
+        f"{scenario:>26} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+        f"{result['p99_ms']:>8.2f} {result['requests']:>8} {result['errors']:>6}",
+        flush=True,
+    )
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print changes against a baseline run
+
+    Returns:
+        list: Scenarios that regressed by more than ``tolerance``
+    """
+    regressions = []
+    print(f"\n{'scenario':>26} {'rps':>9} {'p95':>9} {'p99':>9}  (change vs. baseline)")
+    for scenario, result in results.items():
+        before = baseline.get(scenario)
+        if before is None:
+            continue
+        rps = result["rps"] / before["rps"] - 1
+        p95 = result["p95_ms"] / before["p95_ms"] - 1
+        p99 = result["p99_ms"] / before["p99_ms"] - 1
+        regressed = rps < -tolerance or p95 > tolerance or p99 > tolerance
+        if regressed:
+            regressions.append(scenario)
+        print(f"{scenario:>26} {rps:>+9.1%} {p95:>+9.1%} {p99:>+9.1%}{'  REGRESSED' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--rows", type=int, default=100_000, help="rows in the synthetic df1.csv")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests per scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against results saved with --save-baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative change in rps, p95 or p99 counted as a regression")
+    args = parser.parse_args()
+
+    workdir = prepare_workdir(args.rows)
+    cwd = os.getcwd()
+    print(f"{args.mode}, {args.rows} rows, concurrency {args.concurrency}, {args.duration}s per scenario")
+    print(f"{'scenario':>26} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'requests':>8} {'errors':>6}")
+    try:
+        if args.mode == "inprocess":
+            results = run_inprocess(workdir, args)
+        else:
+            results = run_uvicorn(workdir, args)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+    run = {
+        "mode": args.mode, "rows": args.rows, "concurrency": args.concurrency,
+        "workers": args.workers, "results": results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline["mode"], baseline["rows"], baseline["concurrency"]) != (
+            args.mode, args.rows, args.concurrency
+        ):
+            print("Warning: the baseline was recorded with other settings.")
+        if compare(results, baseline["results"], args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Stress test for POST /crime_reporting under a multi-worker uvicorn
+
+Starts ``uvicorn app:app --workers N`` in a scratch directory, fires
+thousands of parallel reports with unique DR_NOs and, after a graceful
+shutdown, checks that every DR_NO is in dataset.csv exactly once.
+
+Run from the repository root:
+
+    python -m benchmarks.stress_ingestion --workers 4 --requests 5000
+"""
+import argparse
+import collections
+import csv
+import json
+import os
+import random as rd
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_live(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not come up")
+
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch-every", type=int, default=10,
+                        help="send every Nth request as a 5-record batch")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="crps-stress-")
+    # Workers build their chart aggregates from df1.csv as they warm up
+    with open(os.path.join(workdir, "df1.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["AREA NAME"])
+        writer.writerows([[rd.choice(["Central", "Harbor", "Newton"])] for _ in range(100)])
+
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_live(base + "/")
+
+        jobs = []
+        next_dr_no = 100000000
+        for i in range(args.requests):
+            if args.batch_every and i % args.batch_every == 0:
+                batch = [
+                    {"AREA_NAME": "Central", "Crm_Cd_Desc": "BURGLARY", "DR_NO": next_dr_no + k}
+                    for k in range(5)
+                ]
+                jobs.append((base + "/crime_reporting/batch", batch))
+                next_dr_no += 5
+            else:
+                record = {"AREA_NAME": "Harbor", "Crm_Cd_Desc": "ROBBERY", "DR_NO": next_dr_no}
+                jobs.append((base + "/crime_reporting", record))
+                next_dr_no += 1
+        expected = set(range(100000000, next_dr_no))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            statuses = list(pool.map(lambda job: post(*job), jobs))
+        elapsed = time.perf_counter() - started
+        failed = sum(status != 200 for status in statuses)
+        print(f"{len(jobs)} requests in {elapsed:.2f}s ({len(jobs) / elapsed:.0f} req/s), {failed} failed")
+    finally:
+        # Graceful shutdown lets every worker commit its queue
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    with open(os.path.join(workdir, "dataset.csv"), newline="") as f:
+        seen = collections.Counter(int(row["DR_NO"]) for row in csv.DictReader(f))
+    missing = expected - set(seen)
+    duplicated = [dr_no for dr_no, count in seen.items() if count > 1]
+    leftover = os.listdir(os.path.join(workdir, "dataset.csv.spool"))
+    print(f"expected {len(expected)} DR_NOs, found {len(seen)}; "
+          f"{len(missing)} missing, {len(duplicated)} duplicated, "
+          f"{len(leftover)} files left in spool")
+
+    shutil.rmtree(workdir)
+    if missing or duplicated or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from ingestion import CSV_COLUMNS, FIELD_TO_COLUMN, CsvAppender, FileLock
+from metrics import timer
+from storage import FLOAT_COLUMNS, INT_COLUMNS
+
+
+FORMATS = ["csv", "ndjson"]
+
+# Request Content-Types that select an import format
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# Columns a CrimeRecord cannot be created without
+REQUIRED_COLUMNS = ["AREA NAME", "Crm Cd Desc"]
+
+# Rows parsed, validated and written at a time; bounds memory per import
+CHUNK_ROWS = 100_000
+
+# Row errors listed in an import report; every error is still counted
+MAX_ERRORS = 1000
+
+
+def read_chunks(source, fmt, chunksize=CHUNK_ROWS):
+    """
+    Parse a CSV or NDJSON file of crime records in chunks
+
+    Columns may be named as in the dataset ("AREA NAME") or as CrimeRecord
+    fields ("AREA_NAME"). CSV cells are read as text, empty cells being
+    missing values.
+
+    Args:
+        source: Path or binary file object; paths may be compressed
+        fmt (str): "csv" or "ndjson"
+        chunksize (int): Rows per chunk
+
+    Yields:
+        DataFrame: Raw chunk with dataset column names
+    """
+    if fmt == "csv":
+        # The C parser does not check the field count of the first rows of
+        # each chunk after the first, silently truncating over-long rows
+        reader = pd.read_csv(
+            source, dtype=str, keep_default_na=False, chunksize=chunksize, engine="python"
+        )
+    elif fmt == "ndjson":
+        reader = pd.read_json(
+            source, lines=True, dtype=False, convert_dates=False,
+            precise_float=True, chunksize=chunksize,
+        )
+    else:
+        raise ValueError(f"Unknown import format: {fmt}")
+    with reader:
+        for chunk in reader:
+            yield chunk.rename(columns=FIELD_TO_COLUMN)
+
+
+def validate_chunk(chunk, first_row=1, max_errors=MAX_ERRORS):
+    """
+    Check a raw chunk against the CrimeRecord schema, one column at a time
+
+    Integer fields accept integral numbers and numeric text, float fields
+    any finite number, and text fields only text; AREA NAME and Crm Cd Desc
+    are required. Each check is a vectorized operation over the column.
+
+    Args:
+        chunk (DataFrame): Output of ``read_chunks``
+        first_row (int): Number of the chunk's first row in the file
+        max_errors (int): Errors to describe
+
+    Returns:
+        tuple: DataFrame of the valid rows in CSV_COLUMNS order, the number
+        of rejected rows and up to ``max_errors`` errors as dicts of row
+        number (1-based, header excluded), column and message
+    """
+    valid = np.ones(len(chunk), dtype=bool)
+    failures = []
+    columns = {}
+    for col in CSV_COLUMNS:
+        if col not in chunk:
+            columns[col] = pd.Series(None, index=chunk.index, dtype=object)
+            continue
+        raw = chunk[col]
+        missing = raw.isna() | (raw == "")
+        if col in INT_COLUMNS or col in FLOAT_COLUMNS:
+            try:
+                # Much faster than to_numeric when the whole column parses
+                numbers = raw.where(~missing).astype("float64")
+            except (TypeError, ValueError):
+                numbers = pd.to_numeric(raw.where(~missing), errors="coerce")
+            bad = ~missing & ~np.isfinite(numbers)
+            if col in INT_COLUMNS:
+                bad |= ~missing & (numbers % 1 != 0)
+                columns[col] = numbers.where(~bad).astype("Int64")
+                message = "Input should be a valid integer"
+            else:
+                columns[col] = numbers.where(~bad).astype("float64")
+                message = "Input should be a valid number"
+        else:
+            if raw.dtype == object:
+                # NDJSON values keep their JSON types
+                bad = ~missing & (raw.map(type) != str)
+            elif pd.api.types.is_string_dtype(raw.dtype):
+                bad = pd.Series(False, index=chunk.index)
+            else:
+                bad = ~missing
+            columns[col] = raw.where(~missing & ~bad)
+            message = "Input should be a valid string"
+        if col in REQUIRED_COLUMNS:
+            failures.append((np.flatnonzero(missing), col, "Field required"))
+        failures.append((np.flatnonzero(bad), col, message))
+        valid &= ~(bad.to_numpy() | (missing.to_numpy() & (col in REQUIRED_COLUMNS)))
+
+    errors = []
+    if failures:
+        rows = np.concatenate([positions for positions, _, _ in failures])
+        labels = np.repeat(np.arange(len(failures)), [len(p) for p, _, _ in failures])
+        for i in np.lexsort((labels, rows))[:max_errors]:
+            _, col, message = failures[labels[i]]
+            errors.append({"row": first_row + int(rows[i]), "column": col, "error": message})
+    frame = pd.DataFrame(columns)[valid]
+    return frame, int((~valid).sum()), errors
+
+
+def import_records(source, fmt, dataset_path, chunksize=CHUNK_ROWS, dry_run=False,
+                   max_errors=MAX_ERRORS, on_chunk=None):
+    """
+    Validate a CSV or NDJSON file of crime records and append it to the dataset
+
+    Invalid rows are skipped and reported; all valid rows are appended.
+    Each chunk is written with one buffered write and one fsync while
+    holding the dataset lock that the queued crime writer commits under,
+    so memory stays bounded by the chunk size whatever the file size.
+    Chunks written before a parse error stay in the dataset, and the error
+    says how many rows they held.
+
+    Args:
+        source: Path or binary file object
+        fmt (str): "csv" or "ndjson"
+        dataset_path (str): Crime dataset CSV to append to
+        chunksize (int): Rows per chunk
+        dry_run (bool): Only validate, write nothing
+        max_errors (int): Row errors listed in the report
+        on_chunk (callable): Called with each written DataFrame of valid
+            rows, e.g. to update in-memory aggregates
+
+    Returns:
+        dict: Rows read, imported and rejected, the first ``max_errors``
+        row errors, ignored columns and the elapsed seconds
+    """
+    started = time.perf_counter()
+    appender = CsvAppender(dataset_path)
+    report = {
+        "format": fmt, "dry_run": dry_run, "rows": 0, "imported": 0, "rejected": 0,
+        "errors": [], "ignored_columns": [],
+    }
+    try:
+        for chunk in read_chunks(source, fmt, chunksize):
+            if report["rows"] == 0:
+                absent = [col for col in REQUIRED_COLUMNS if col not in chunk]
+                if absent:
+                    raise ValueError(f"Missing required columns: {', '.join(absent)}")
+                report["ignored_columns"] = [
+                    str(col) for col in chunk.columns if col not in CSV_COLUMNS
+                ]
+            with timer("import_validation"):
+                frame, rejected, errors = validate_chunk(
+                    chunk, report["rows"] + 1, max_errors - len(report["errors"])
+                )
+            report["rows"] += len(chunk)
+            report["rejected"] += rejected
+            report["errors"].extend(errors)
+            if dry_run or frame.empty:
+                continue
+            with timer("csv_write"), FileLock(f"{dataset_path}.lock"):
+                appender.append_frame(frame)
+            report["imported"] += len(frame)
+            if on_chunk is not None:
+                on_chunk(frame)
+    except ValueError as e:
+        if report["imported"]:
+            raise ValueError(f"Import stopped after {report['imported']} rows: {e}") from e
+        raise
+    report["seconds"] = time.perf_counter() - started
+    logging.info(
+        f"Imported {report['imported']} of {report['rows']} rows into {dataset_path}"
+        f" ({report['rejected']} rejected)."
+    )
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Import a CSV or NDJSON file of crime records into the dataset. "
+        "A running server counts the rows once its aggregates are rebuilt."
+    )
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="from the file extension by default")
+    parser.add_argument("--dataset", default="dataset.csv")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--dry-run", action="store_true", help="only validate the file")
+    parser.add_argument("--max-errors", type=int, default=MAX_ERRORS)
+    parser.add_argument("--report", help="write the import report to this JSON file")
+    args = parser.parse_args()
+    fmt = args.format or ("ndjson" if ".ndjson" in args.path or ".jsonl" in args.path else "csv")
+    report = import_records(
+        args.path, fmt, args.dataset, args.chunksize, args.dry_run, args.max_errors
+    )
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({key: value for key, value in report.items() if key != "errors"}))
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ingestion import FIELD_TO_COLUMN
+from model_serving import CURRENT_ARTIFACTS, FEATURE_COLUMNS
+from predictions import area_mapping
+from storage import add_partition_columns
+
+
+ENCODERS_PATH = os.environ.get(
+    "CRPS_ENCODERS_PATH", CURRENT_ARTIFACTS.get("encoders", "encoders.json")
+)
+
+# Text features label-encoded with their sorted classes, as LabelEncoder does,
+# and the class that missing and unseen values fall back to
+ENCODED_COLUMNS = ["Vict Sex", "Vict Descent", "Weapon Desc"]
+MISSING_CLASS = {"Vict Sex": "X", "Vict Descent": "Unknown", "Weapon Desc": "Unknown"}
+
+# CrimeRecord fields the features are derived from
+RECORD_FIELDS = [
+    "AREA", "Crm_Cd", "Vict_Sex", "Vict_Descent", "Weapon_Desc", "Status_Desc", "DATE_OCC",
+]
+
+AREA_CODES = {name: code for code, name in area_mapping.items()}
+
+
+def normalize_text(col, values):
+    """
+    Apply the notebook's cleaning of a text feature to an array of values
+
+    Victim sexes other than M and F become X, '-' descents become
+    'Unknown' and missing values take the column's MISSING_CLASS.
+
+    Returns:
+        ndarray: String array of class names
+    """
+    values = np.asarray(values, dtype=object)
+    values = np.where(pd.isna(values), MISSING_CLASS[col], values).astype(str)
+    if col == "Vict Sex":
+        values[~np.isin(values, ["M", "F"])] = MISSING_CLASS[col]
+    elif col == "Vict Descent":
+        values[values == "-"] = MISSING_CLASS[col]
+    return values
+
+
+def raw_features(df):
+    """
+    Derive the model's input columns from crime CSV columns, vectorized
+
+    ``year`` comes from DATE OCC (NaN where it does not parse) and ``case``
+    is 1 while the investigation continues (Status Desc 'Invest Cont').
+    Text features are passed through for ``FeatureEncoder.transform``.
+
+    Returns:
+        DataFrame: FEATURE_COLUMNS
+    """
+    # Parse each distinct date once; the dataset repeats a few thousand dates
+    codes, dates = pd.factorize(df["DATE OCC"])
+    years = add_partition_columns(pd.DataFrame({"DATE OCC": dates}))["year"]
+    # The extra last slot is the year of missing dates, which factorize marks -1
+    years = np.append(years.to_numpy(dtype=np.float64, na_value=np.nan), np.nan)
+    return pd.DataFrame(
+        {
+            "AREA": df["AREA"],
+            "Crm Cd": df["Crm Cd"],
+            **{col: df[col] for col in ENCODED_COLUMNS},
+            "year": years[codes],
+            "case": (df["Status Desc"].astype("object") == "Invest Cont").astype("int8"),
+        },
+        index=df.index,
+    )
+
+
+def record_features(records):
+    """
+    Model input columns of CrimeRecord dumps
+
+    Records without AREA are located by AREA NAME and records without a
+    parseable DATE_OCC are scored for the current year, as CrimeData is.
+
+    Args:
+        records (list): Outputs of ``CrimeRecord.model_dump()``
+
+    Returns:
+        DataFrame: FEATURE_COLUMNS, see ``raw_features``
+    """
+    df = pd.DataFrame(
+        {FIELD_TO_COLUMN[field]: [r.get(field) for r in records] for field in RECORD_FIELDS},
+        dtype=object,
+    )
+    df["AREA"] = [
+        AREA_CODES.get(r.get("AREA_NAME")) if r.get("AREA") is None else r["AREA"]
+        for r in records
+    ]
+    features = raw_features(df)
+    features["year"] = features["year"].fillna(datetime.now().year)
+    return features
+
+
+class FeatureEncoder:
+    """
+    Fitted mapping from raw crime fields to the model's feature matrix
+
+    Holds the classes of each text feature. A batch is encoded by
+    factorizing each column, encoding only its distinct values and
+    gathering the codes with one array lookup, so the cost per row is
+    independent of Python-level work. Training, offline scoring and
+    serving all encode through the same saved instance.
+    """
+
+    def __init__(self, classes):
+        self.classes = {col: list(classes[col]) for col in ENCODED_COLUMNS}
+        self._arrays = {col: np.array(self.classes[col], dtype=str) for col in ENCODED_COLUMNS}
+        content = json.dumps(self.classes, sort_keys=True).encode()
+        self.version = hashlib.blake2b(content, digest_size=8).hexdigest()
+
+    @classmethod
+    def fit(cls, features):
+        """
+        Learn the sorted classes of each text feature
+
+        Args:
+            features (DataFrame): Output of ``raw_features``
+        """
+        classes = {}
+        for col in ENCODED_COLUMNS:
+            values = normalize_text(col, pd.unique(features[col].to_numpy(dtype=object)))
+            classes[col] = sorted(set(values))
+        return cls(classes)
+
+    @classmethod
+    def load(cls, path=ENCODERS_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No trained encoders at {path}; run training.py first.")
+        with open(path) as f:
+            return cls(json.load(f)["classes"])
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(
+                {"version": self.version, "features": FEATURE_COLUMNS, "classes": self.classes},
+                f,
+                indent=2,
+            )
+
+    def encode(self, col, values):
+        """
+        Class codes of a column of raw text values
+
+        Values that normalize to a class not seen in training take the code
+        of the column's MISSING_CLASS.
+        """
+        codes, uniques = pd.factorize(values)
+        # The last slot encodes missing values, which factorize marks -1
+        names = normalize_text(col, np.append(np.asarray(uniques, dtype=object), None))
+        classes = self._arrays[col]
+        lookup = np.minimum(np.searchsorted(classes, names), len(classes) - 1)
+        unseen = classes[lookup] != names
+        if unseen.any():
+            fallback = np.searchsorted(classes, MISSING_CLASS[col])
+            if fallback == len(classes) or classes[fallback] != MISSING_CLASS[col]:
+                raise ValueError(f"Unknown {col} values and no {MISSING_CLASS[col]!r} class")
+            lookup[unseen] = fallback
+        return lookup[codes]
+
+    def transform(self, features):
+        """
+        Encode feature columns into the model's input matrix
+
+        Args:
+            features (DataFrame): Output of ``raw_features`` or ``record_features``
+
+        Returns:
+            ndarray: float32 matrix of shape (n, 7) in FEATURE_COLUMNS order
+        """
+        X = np.empty((len(features), len(FEATURE_COLUMNS)), dtype=np.float32)
+        for j, col in enumerate(FEATURE_COLUMNS):
+            if col in ENCODED_COLUMNS:
+                X[:, j] = self.encode(col, features[col])
+            else:
+                X[:, j] = features[col].to_numpy(dtype=np.float32, na_value=np.nan)
+        missing = [col for j, col in enumerate(FEATURE_COLUMNS) if np.isnan(X[:, j]).any()]
+        if missing:
+            raise ValueError(f"Missing values for {', '.join(missing)}")
+        return X
+
+    def info(self):
+        return {
+            "version": self.version,
+            "classes": {col: len(classes) for col, classes in self.classes.items()},
+        }
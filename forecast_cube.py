@@ -0,0 +1,254 @@
+from datetime import date
+
+import numpy as np
+
+from prediction_store import DATE_FORMAT, PROBABILITY_DECIMALS
+
+
+class HorizonCube:
+    """
+    Prediction probabilities per (day, AREA, Crm Cd) over the prediction horizon
+
+    Probabilities and prediction counts are summed into dense arrays of
+    shape (days + 1, areas, crime codes) holding prefix sums along the
+    date axis: slab ``d`` covers the first ``d`` days. The sums over any
+    date range are then the difference of two slabs, so a query reads a
+    fixed number of cells however long the horizon or the range is. A
+    second pair of prefix sums, already totalled over crime codes, serves
+    per-AREA rankings.
+    """
+
+    def __init__(self, version, first_day, days, area_codes, crime_codes, area_names,
+                 crime_descs, cells, probabilities):
+        """
+        Args:
+            version (str): Version of the prediction snapshot
+            first_day (int): Ordinal of the horizon's first day
+            days (int): Days in the horizon
+            area_codes (ndarray): AREA code of each area index
+            crime_codes (ndarray): Crm Cd of each crime index
+            area_names (dict): AREA code to AREA NAME
+            crime_descs (dict): Crm Cd to Crm Cd Desc
+            cells (tuple): Day, area and crime index arrays of the predictions
+            probabilities (ndarray): Probability of each prediction
+        """
+        self.version = version
+        self.first_day = first_day
+        self.days = days
+        self.area_codes = area_codes
+        self.crime_codes = crime_codes
+        self.area_names = area_names
+        self.crime_descs = crime_descs
+        shape = (days, len(area_codes), len(crime_codes))
+        flat = np.ravel_multi_index(cells, shape)
+        size = int(np.prod(shape))
+        sums = np.bincount(flat, weights=probabilities, minlength=size).reshape(shape)
+        counts = np.bincount(flat, minlength=size).astype(np.int32).reshape(shape)
+        self.sums = self._prefix(sums)
+        self.counts = self._prefix(counts)
+        self.area_sums = self._prefix(sums.sum(axis=2))
+        self.area_counts = self._prefix(counts.sum(axis=2))
+
+    @staticmethod
+    def _prefix(values):
+        prefix = np.zeros((len(values) + 1,) + values.shape[1:], dtype=values.dtype)
+        np.cumsum(values, axis=0, out=prefix[1:])
+        return prefix
+
+    @classmethod
+    def from_store(cls, store):
+        """
+        Build the cube of a PredictionStore
+
+        Every code in the store's name tables gets a cell, so codes without
+        predictions are answered with zero counts rather than as unknown.
+        """
+        area_codes = np.array([code for code, name in enumerate(store.area_names) if name is not None])
+        crime_codes = np.array([code for code, name in enumerate(store.crime_descs) if name is not None])
+        area_index = np.full(len(store.area_names), -1, dtype=np.int64)
+        area_index[area_codes] = np.arange(len(area_codes))
+        crime_index = np.full(len(store.crime_descs), -1, dtype=np.int64)
+        crime_index[crime_codes] = np.arange(len(crime_codes))
+
+        ordinals = np.asarray(store.ordinals, dtype=np.int64)
+        first_day = int(ordinals[0]) if len(ordinals) else date.today().toordinal()
+        days = int(ordinals[-1]) - first_day + 1 if len(ordinals) else 0
+        return cls(
+            store.version,
+            first_day,
+            days,
+            area_codes,
+            crime_codes,
+            {int(code): store.area_names[code] for code in area_codes},
+            {int(code): store.crime_descs[code] for code in crime_codes},
+            (
+                ordinals - first_day,
+                area_index[np.asarray(store.areas)],
+                crime_index[np.asarray(store.crimes)],
+            ),
+            # float32 holds 7 significant digits; rounding restores the
+            # generated two-decimal percentages before they are summed
+            np.round(np.asarray(store.probabilities, dtype=np.float64), PROBABILITY_DECIMALS),
+        )
+
+    @property
+    def start(self):
+        return date.fromordinal(self.first_day)
+
+    @property
+    def end(self):
+        return date.fromordinal(self.first_day + max(self.days, 1) - 1)
+
+    def _bounds(self, start, end):
+        # Prefix slabs bounding the days of [start, end] within the horizon
+        if start > end:
+            raise ValueError("start must not be after end")
+        lo = min(max(start.toordinal() - self.first_day, 0), self.days)
+        hi = min(max(end.toordinal() - self.first_day + 1, 0), self.days)
+        return lo, max(lo, hi)
+
+    @staticmethod
+    def _position(codes, code, label):
+        i = int(np.searchsorted(codes, code))
+        if i == len(codes) or codes[i] != code:
+            raise ValueError(f"Unknown {label} {code}")
+        return i
+
+    def range_sums(self, start, end, area=None, crm_cd=None):
+        """
+        Summed probabilities and prediction counts dated within ``[start, end]``
+
+        Days outside the horizon hold no predictions.
+
+        Args:
+            start (date): First day
+            end (date): Last day, inclusive
+            area (int): Only sum this AREA
+            crm_cd (int): Only sum this crime code
+
+        Returns:
+            tuple: float64 sums and int64 counts of shape (areas, crime
+            codes), with a single row or column when ``area`` or ``crm_cd``
+            is given
+        """
+        lo, hi = self._bounds(start, end)
+        areas = codes = slice(None)
+        if area is not None:
+            i = self._position(self.area_codes, area, "AREA")
+            areas = slice(i, i + 1)
+        if crm_cd is not None:
+            i = self._position(self.crime_codes, crm_cd, "Crm Cd")
+            codes = slice(i, i + 1)
+        sums = self.sums[hi, areas, codes] - self.sums[lo, areas, codes]
+        counts = self.counts[hi, areas, codes].astype(np.int64) - self.counts[lo, areas, codes]
+        return sums, counts
+
+    def query(self, start, end, area=None, crm_cd=None):
+        """
+        Probability totals of a date range for an area and/or crime code
+
+        Args:
+            start (date): First day
+            end (date): Last day, inclusive
+            area (int): AREA code to restrict to
+            crm_cd (int): Crime code to restrict to
+
+        Returns:
+            dict: Prediction count, summed and mean probability, and the
+            same per Crm Cd (or per AREA when ``crm_cd`` is given), for
+            codes with predictions only
+        """
+        sums, counts = self.range_sums(start, end, area, crm_cd)
+        if crm_cd is None:
+            by, sums, counts, labels = "by_crm_cd", sums.sum(axis=0), counts.sum(axis=0), self.crime_codes
+        else:
+            by, sums, counts, labels = "by_area", sums.sum(axis=1), counts.sum(axis=1), self.area_codes
+        return {
+            "version": self.version,
+            "start": start.strftime(DATE_FORMAT),
+            "end": end.strftime(DATE_FORMAT),
+            "area": area,
+            "crm_cd": crm_cd,
+            **_totals(sums.sum(), counts.sum()),
+            by: {int(labels[i]): _totals(sums[i], counts[i]) for i in np.flatnonzero(counts)},
+        }
+
+    def _top(self, sums, counts, k):
+        ranked = [i for i in np.argsort(-sums, kind="stable") if counts[i]][:k]
+        return [
+            {
+                "AREA": int(self.area_codes[i]),
+                "AREA NAME": self.area_names[int(self.area_codes[i])],
+                **_totals(sums[i], counts[i]),
+            }
+            for i in ranked
+        ]
+
+    def top_areas(self, start, end, k=5, crm_cd=None, per_day=False):
+        """
+        The ``k`` areas with the highest summed probability
+
+        Args:
+            start (date): First day
+            end (date): Last day, inclusive
+            k (int): Areas to return
+            crm_cd (int): Only rank by this crime code
+            per_day (bool): Rank each day of the range separately
+
+        Returns:
+            dict: Areas in descending order of summed probability over the
+            range, or per day under ``days``; areas without predictions
+            are left out
+        """
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        lo, hi = self._bounds(start, end)
+        if crm_cd is None:
+            sums, counts = self.area_sums, self.area_counts
+        else:
+            i = self._position(self.crime_codes, crm_cd, "Crm Cd")
+            sums, counts = self.sums[:, :, i], self.counts[:, :, i]
+        result = {
+            "version": self.version,
+            "start": start.strftime(DATE_FORMAT),
+            "end": end.strftime(DATE_FORMAT),
+            "crm_cd": crm_cd,
+            "k": k,
+        }
+        if not per_day:
+            result["areas"] = self._top(sums[hi] - sums[lo], counts[hi] - counts[lo], k)
+            return result
+        day_sums, day_counts = np.diff(sums[lo:hi + 1], axis=0), np.diff(counts[lo:hi + 1], axis=0)
+        result["days"] = [
+            {
+                "date": date.fromordinal(self.first_day + lo + d).strftime(DATE_FORMAT),
+                "areas": self._top(day_sums[d], day_counts[d], k),
+            }
+            for d in range(hi - lo)
+        ]
+        return result
+
+    def nbytes(self):
+        return sum(
+            table.nbytes for table in (self.sums, self.counts, self.area_sums, self.area_counts)
+        )
+
+    def info(self):
+        return {
+            "version": self.version,
+            "start": self.start.strftime(DATE_FORMAT),
+            "end": self.end.strftime(DATE_FORMAT),
+            "days": self.days,
+            "areas": len(self.area_codes),
+            "crime_codes": len(self.crime_codes),
+            "nbytes": self.nbytes(),
+        }
+
+
+def _totals(total, count):
+    count = int(count)
+    return {
+        "count": count,
+        "total_probability": round(float(total), PROBABILITY_DECIMALS),
+        "mean_probability": round(float(total) / count, PROBABILITY_DECIMALS + 2) if count else None,
+    }
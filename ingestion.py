@@ -0,0 +1,444 @@
+import csv
+import glob
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # DataFrames are written with pandas instead
+    pa = None
+
+
+# Column order of dataset.csv, keyed by the matching CrimeRecord field
+FIELD_TO_COLUMN = {
+    "DR_NO": "DR_NO",
+    "Date_Rptd": "Date Rptd",
+    "DATE_OCC": "DATE OCC",
+    "TIME_OCC": "TIME OCC",
+    "AREA": "AREA",
+    "AREA_NAME": "AREA NAME",
+    "Rpt_Dist_No": "Rpt Dist No",
+    "Part_1_2": "Part 1-2",
+    "Crm_Cd": "Crm Cd",
+    "Crm_Cd_Desc": "Crm Cd Desc",
+    "Mocodes": "Mocodes",
+    "Vict_Age": "Vict Age",
+    "Vict_Sex": "Vict Sex",
+    "Vict_Descent": "Vict Descent",
+    "Premis_Cd": "Premis Cd",
+    "Premis_Desc": "Premis Desc",
+    "Weapon_Used_Cd": "Weapon Used Cd",
+    "Weapon_Desc": "Weapon Desc",
+    "Status": "Status",
+    "Status_Desc": "Status Desc",
+    "Crm_Cd_1": "Crm Cd 1",
+    "Crm_Cd_2": "Crm Cd 2",
+    "Crm_Cd_3": "Crm Cd 3",
+    "Crm_Cd_4": "Crm Cd 4",
+    "LOCATION": "LOCATION",
+    "Cross_Street": "Cross Street",
+    "LAT": "LAT",
+    "LON": "LON",
+}
+
+CSV_COLUMNS = list(FIELD_TO_COLUMN.values())
+
+
+def record_to_row(record):
+    """
+    Convert a CrimeRecord dump into a CSV row in dataset column order
+
+    Args:
+        record (dict): Output of ``CrimeRecord.model_dump()``
+
+    Returns:
+        list: Cell values, with missing fields written as empty cells
+    """
+    return ["" if record.get(field) is None else record[field] for field in FIELD_TO_COLUMN]
+
+
+class CsvAppender:
+    """
+    Append-only writer for the crime dataset
+
+    Rows are appended to the end of the file without reading it back, so the
+    cost of an insert does not depend on how large the dataset has grown.
+    Each call to ``append`` is flushed and fsynced once, however many rows
+    it carries. A failed call leaves the file as it was, so it can be
+    retried without duplicating the rows that did land.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _ensure_header(self, f):
+        if f.tell() == 0:
+            csv.writer(f).writerow(CSV_COLUMNS)
+
+    @contextmanager
+    def _open(self):
+        """
+        Open the dataset for appending, cutting it back to its previous size
+        if the write fails part-way (e.g. ENOSPC after some rows)
+        """
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        try:
+            with open(self.path, "a", newline="") as f:
+                yield f
+        except BaseException:
+            # Truncated after close, which may flush more of the buffer
+            if os.path.exists(self.path):
+                os.truncate(self.path, size)
+            raise
+
+    def append(self, rows):
+        """
+        Append rows to the dataset with a single fsync
+
+        Args:
+            rows (list): Rows produced by ``record_to_row``
+
+        Returns:
+            int: Number of rows written
+        """
+        if not rows:
+            return 0
+        with self._lock:
+            with self._open() as f:
+                self._ensure_header(f)
+                csv.writer(f).writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+        return len(rows)
+
+    def append_frame(self, df):
+        """
+        Append a DataFrame of rows with one buffered write and a single fsync
+
+        pyarrow's CSV writer is used when it is installed; it quotes every
+        text cell, which reads back the same.
+
+        Args:
+            df (DataFrame): Rows with the CSV_COLUMNS columns
+
+        Returns:
+            int: Number of rows written
+        """
+        if df.empty:
+            return 0
+        with self._lock:
+            with self._open() as f:
+                self._ensure_header(f)
+                # Same line endings as the csv module writes
+                if pa is not None:
+                    # The header goes through the text layer, which must be
+                    # flushed before writing to the binary buffer beneath it
+                    f.flush()
+                    pa_csv.write_csv(
+                        pa.Table.from_pandas(df[CSV_COLUMNS], preserve_index=False),
+                        f.buffer,
+                        pa_csv.WriteOptions(include_header=False, eol=b"\r\n"),
+                    )
+                else:
+                    df.to_csv(f, header=False, index=False, columns=CSV_COLUMNS, lineterminator="\r\n")
+                f.flush()
+                os.fsync(f.fileno())
+        return len(df)
+
+    def close(self):
+        """
+        Nothing is buffered, so there is nothing to write on shutdown
+        """
+
+
+class FileLock:
+    """
+    Exclusive advisory lock on a file, shared across processes
+
+    Uses ``flock`` on POSIX and ``msvcrt.locking`` on Windows.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self, blocking=True):
+        """
+        Take the lock
+
+        Args:
+            blocking (bool): Wait for the lock instead of failing fast
+
+        Returns:
+            bool: True if the lock is now held
+        """
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+                    fcntl.flock(fd, flags)
+                else:
+                    mode = msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK
+                    msvcrt.locking(fd, mode, 1)
+            except OSError:
+                os.close(fd)
+                if blocking:
+                    raise
+                return False
+
+            # Another holder may have removed the file while we waited, in
+            # which case the lock is on an orphaned inode and must be retaken
+            try:
+                same_file = os.path.samestat(os.fstat(fd), os.stat(self.path))
+            except FileNotFoundError:
+                same_file = False
+            if same_file:
+                self._fd = fd
+                return True
+            os.close(fd)
+
+    def release(self):
+        if self._fd is None:
+            return
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+# Seconds between attempts to commit a segment the dataset would not take
+COMMIT_RETRY_DELAY = 1.0
+
+# Attempts per segment once the writer is closing; segments that still fail
+# are left in the spool for the next writer
+CLOSE_COMMIT_ATTEMPTS = 3
+
+
+class QueuedCsvWriter:
+    """
+    Single-writer ingestion path for the crime dataset
+
+    ``append`` writes the rows to this process's journal in the spool
+    directory, fsyncs it and returns: once it returns the rows survive a
+    crash. A background thread then hands the journal to the dataset:
+
+    1. the journal is atomically renamed to a numbered segment, so new
+       requests start a fresh journal while the segment is committed;
+    2. the segment's rows are appended to the dataset while holding an
+       exclusive lock shared by every uvicorn worker;
+    3. the segment is deleted.
+
+    Rows are committed once ``max_rows`` are queued or the oldest queued
+    row is ``max_delay`` seconds old. A segment whose commit fails is retried
+    every COMMIT_RETRY_DELAY seconds; when the writer closes with segments
+    still uncommitted it keeps its lock file, and like journals and segments
+    left behind by a worker that died, they are replayed by the next writer
+    to start. A worker killed between steps 2 and 3 has its segment
+    replayed, so that window is at-least-once.
+    """
+
+    def __init__(self, path, max_rows=1, max_delay=0.0):
+        self.appender = CsvAppender(path)
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay
+        self.spool_dir = f"{path}.spool"
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self._dataset_lock_path = f"{path}.lock"
+        self._owner = f"{os.getpid()}-{time.time_ns()}"
+        self._owner_lock = FileLock(os.path.join(self.spool_dir, f"{self._owner}.lock"))
+        self._owner_lock.acquire()
+        self._journal_path = os.path.join(self.spool_dir, f"{self._owner}.journal")
+        self._segment = 0
+
+        self._queue = []
+        self._oldest = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+
+        self.recover()
+        self._thread = threading.Thread(
+            target=self._run, name="csv-writer", daemon=True
+        )
+        self._thread.start()
+
+    def append(self, rows):
+        """
+        Durably queue rows for the dataset
+
+        Args:
+            rows (list): Rows produced by ``record_to_row``
+
+        Returns:
+            int: Number of rows queued
+        """
+        if not rows:
+            return 0
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Crime record writer is closed.")
+            with open(self._journal_path, "a", newline="") as f:
+                csv.writer(f).writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+            if not self._queue:
+                self._oldest = time.monotonic()
+            self._queue.extend(rows)
+            self._wakeup.notify()
+        return len(rows)
+
+    def _due(self):
+        if not self._queue:
+            return False
+        if self._closed or len(self._queue) >= self.max_rows:
+            return True
+        return time.monotonic() - self._oldest >= self.max_delay
+
+    def _rotate(self):
+        """
+        Swap the journal for a segment holding exactly the queued rows
+        """
+        rows, self._queue = self._queue, []
+        self._oldest = None
+        self._segment += 1
+        segment_path = os.path.join(
+            self.spool_dir, f"{self._owner}.{self._segment:08d}.segment"
+        )
+        os.replace(self._journal_path, segment_path)
+        return segment_path, rows
+
+    def _commit(self, segment_path, rows):
+        with FileLock(self._dataset_lock_path):
+            self.appender.append(rows)
+        os.remove(segment_path)
+
+    def _commit_with_retry(self, segment_path, rows):
+        """
+        Commit a segment, retrying until it succeeds or the writer is closing
+
+        Returns:
+            bool: True if the segment was committed
+        """
+        attempts = 0
+        while True:
+            try:
+                self._commit(segment_path, rows)
+                return True
+            except Exception as e:
+                attempts += 1
+                logging.error(f"Error committing crime records (attempt {attempts}): {e}")
+            with self._lock:
+                if self._closed and attempts >= CLOSE_COMMIT_ATTEMPTS:
+                    # Left in the spool for the next writer's recover()
+                    return False
+                self._wakeup.wait(COMMIT_RETRY_DELAY)
+
+    def _pending_files(self):
+        """
+        This writer's segments and journal still in the spool
+        """
+        pending = sorted(glob.glob(os.path.join(self.spool_dir, f"{self._owner}.*.segment")))
+        if os.path.exists(self._journal_path):
+            pending.append(self._journal_path)
+        return pending
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._due():
+                    if self._closed:
+                        return
+                    timeout = None
+                    if self._queue:
+                        timeout = self.max_delay - (time.monotonic() - self._oldest)
+                    self._wakeup.wait(timeout)
+                segment_path, rows = self._rotate()
+            self._commit_with_retry(segment_path, rows)
+
+    def recover(self):
+        """
+        Replay journals and segments left behind by writers that have exited
+
+        Writers are found by their lock files and by spooled files whose
+        lock file is gone; locking the owner first keeps two recovering
+        writers from replaying the same files.
+
+        Returns:
+            int: Number of rows replayed
+        """
+        replayed = 0
+        owners = set()
+        for pattern in ("*.lock", "*.segment", "*.journal"):
+            for spooled in glob.glob(os.path.join(self.spool_dir, pattern)):
+                owners.add(os.path.basename(spooled).split(".", 1)[0])
+        owners.discard(self._owner)
+        for owner in sorted(owners):
+            lock_path = os.path.join(self.spool_dir, f"{owner}.lock")
+            owner_lock = FileLock(lock_path)
+            if not owner_lock.acquire(blocking=False):
+                # That writer is still alive and owns its files
+                continue
+            try:
+                pending = sorted(
+                    glob.glob(os.path.join(self.spool_dir, f"{owner}.*.segment"))
+                )
+                journal = os.path.join(self.spool_dir, f"{owner}.journal")
+                if os.path.exists(journal):
+                    pending.append(journal)
+                for pending_path in pending:
+                    with open(pending_path, newline="") as f:
+                        rows = list(csv.reader(f))
+                    self._commit(pending_path, rows)
+                    replayed += len(rows)
+                # Remove the lock file while still holding it, so a new writer
+                # can never lock the orphaned inode
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+            finally:
+                owner_lock.release()
+        if replayed:
+            logging.info(f"Recovered {replayed} queued crime records.")
+        return replayed
+
+    def close(self):
+        """
+        Commit everything still queued and stop the background writer
+
+        Closing again does nothing.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        # Uncommitted segments keep the lock file, which marks them for the
+        # next writer's recover()
+        if not self._pending_files():
+            os.remove(self._owner_lock.path)
+        self._owner_lock.release()
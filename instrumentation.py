@@ -0,0 +1,185 @@
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from metrics import REGISTRY, SIZE_BUCKETS
+
+
+# Per-request profiling is only honoured when enabled with CRPS_PROFILING=1;
+# a request then opts in with the X-Profile header
+PROFILING_ENABLED = os.environ.get("CRPS_PROFILING", "0") == "1"
+PROFILE_HEADER = b"x-profile"
+
+# Seconds between stack samples while a request is profiled
+PROFILE_INTERVAL = float(os.environ.get("CRPS_PROFILE_INTERVAL_MS", "1")) / 1000
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "crps_http_request_duration_seconds",
+    "Time from receiving a request to sending the last byte of its response",
+    ("method", "route", "status"),
+)
+REQUEST_BYTES = REGISTRY.histogram(
+    "crps_http_request_size_bytes", "Request body sizes", ("method", "route"), SIZE_BUCKETS
+)
+RESPONSE_BYTES = REGISTRY.histogram(
+    "crps_http_response_size_bytes", "Response body sizes", ("method", "route"), SIZE_BUCKETS
+)
+
+
+def folded_stack(frame):
+    """
+    A frame's call stack, outermost first, as ``file:function;...``
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread at a fixed interval while running
+
+    Samples are aggregated as folded stacks, the input format of
+    flamegraph tools. Every thread is sampled, because a request's work
+    may run on the event loop, the threadpool or the model executor.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    self.stacks[folded_stack(frame)] += 1
+            self.samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+class ProfileStore:
+    """
+    The most recent request profiles, by id
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile_id, profile):
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self):
+        with self._lock:
+            return [
+                {key: value for key, value in profile.items() if key != "stacks"}
+                for profile in self._profiles.values()
+            ]
+
+
+profiles = ProfileStore()
+
+
+def route_name(scope):
+    # The route template, so paths with parameters share one label value
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class InstrumentationMiddleware:
+    """
+    ASGI middleware recording latency and payload sizes of every request
+
+    Latency runs until the last body chunk is sent, so streamed responses
+    are measured in full. Requests sent with ``X-Profile`` while profiling
+    is enabled are sampled by a SamplingProfiler; the response carries an
+    ``X-Profile-Id`` to fetch the profile with.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        sent = 0
+        received = 0
+        profiler = profile_id = None
+        if PROFILING_ENABLED and PROFILE_HEADER in dict(scope["headers"]):
+            profile_id = uuid.uuid4().hex[:16]
+            profiler = SamplingProfiler()
+            profiler.start()
+
+        async def receive_counted():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_counted(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id is not None:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", profile_id.encode())
+                    ]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_counted, send_counted)
+        finally:
+            seconds = time.perf_counter() - started
+            method, route = scope["method"], route_name(scope)
+            REQUEST_SECONDS.labels(method, route, str(status)).observe(seconds)
+            REQUEST_BYTES.labels(method, route).observe(received)
+            RESPONSE_BYTES.labels(method, route).observe(sent)
+            if profiler is not None:
+                stacks = profiler.stop()
+                profiles.add(
+                    profile_id,
+                    {
+                        "id": profile_id,
+                        "method": method,
+                        "path": scope["path"],
+                        "status": status,
+                        "seconds": seconds,
+                        "samples": profiler.samples,
+                        "stacks": stacks,
+                    },
+                )
+                logging.info(f"Profiled {method} {scope['path']} as {profile_id}.")
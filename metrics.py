@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style
+
+    Keeps a count per upper bound plus the total count and sum of all
+    observations.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        """
+        Cumulative counts per bucket bound, with the totals
+
+        Returns:
+            dict: ``buckets`` maps each upper bound (and "+Inf") to the
+            number of observations at or below it
+        """
+        with self._lock:
+            counts = list(self._counts)
+            total, total_sum = self.count, self.sum
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + ["+Inf"], counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"buckets": cumulative, "count": total, "sum": total_sum}
+
+
+# Bounds of latency histograms, in seconds
+LATENCY_BUCKETS = [
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+]
+
+# Bounds of payload size histograms, in bytes
+SIZE_BUCKETS = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        for value in values
+    )
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class HistogramFamily:
+    """
+    Histograms of one metric, one per combination of label values
+    """
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        histogram = self._children.get(values)
+        if histogram is None:
+            with self._lock:
+                histogram = self._children.setdefault(values, Histogram(self.buckets))
+        return histogram
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, histogram in sorted(self._children.items()):
+            labels = _label_text(self.label_names, values)
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                le = _label_text(("le",), (bound,))
+                lines.append(f"{self.name}_bucket{{{labels + ',' if labels else ''}{le}}} {count}")
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {snapshot['sum']}")
+            lines.append(f"{self.name}_count{suffix} {snapshot['count']}")
+        return lines
+
+
+class Registry:
+    """
+    Metrics rendered in the Prometheus text exposition format
+
+    Histograms are recorded as events happen. Gauges are read from a
+    callback at scrape time, so components that already keep their own
+    counters (the batcher, the response cache, the schedulers) are exposed
+    without being changed.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = HistogramFamily(name, help, labels, buckets)
+            return self._histograms[name]
+
+    def attach(self, name, help, histogram):
+        """
+        Expose an existing unlabelled Histogram under ``name``
+        """
+        family = self.histogram(name, help, buckets=histogram.buckets)
+        family._children[()] = histogram
+
+    def gauge(self, name, help, read, labels=()):
+        """
+        Register a gauge whose value is read at scrape time
+
+        Args:
+            read (callable): Returns a number, or a dict mapping tuples of
+                label values to numbers
+        """
+        with self._lock:
+            self._gauges[name] = (help, read, tuple(labels))
+
+    def render(self):
+        with self._lock:
+            histograms = list(self._histograms.values())
+            gauges = list(self._gauges.items())
+        lines = []
+        for family in histograms:
+            lines.extend(family.render())
+        for name, (help, read, label_names) in gauges:
+            try:
+                value = read()
+            except Exception:
+                # A component that is not loaded yet has nothing to report
+                continue
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} gauge"])
+            samples = value.items() if isinstance(value, dict) else [((), value)]
+            for values, sample in samples:
+                if sample is None:
+                    continue
+                labels = _label_text(label_names, values)
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}{suffix} {float(sample)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "crps_stage_seconds", "Time spent in named I/O and compute stages", ("stage",)
+)
+
+
+@contextmanager
+def timer(stage):
+    """
+    Time a block into ``crps_stage_seconds{stage=...}``
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
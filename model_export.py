@@ -0,0 +1,205 @@
+import argparse
+import json
+import logging
+
+import numpy as np
+
+from model_serving import (
+    ACTIVATIONS,
+    exported_path,
+    file_sha256,
+    load_joblib,
+    load_keras,
+    load_numpy,
+    sample_features,
+)
+
+
+# Largest absolute difference from the original model an export may show
+PARITY_TOLERANCE = 1e-5
+
+
+def _h5_dataset(group, suffix):
+    """
+    Find the dataset under an HDF5 group whose name ends with ``suffix``
+    """
+    found = []
+    group.visititems(
+        lambda name, obj: found.append(obj) if name.split("/")[-1].split(":")[0] == suffix else None
+    )
+    if len(found) != 1:
+        raise ValueError(f"Expected one {suffix} dataset under {group.name}, found {len(found)}")
+    return found[0][()]
+
+
+def read_keras_dense(h5_path):
+    """
+    Read the layers of a Sequential Keras model of Dense layers
+
+    The weights are read straight from the HDF5 file, so TensorFlow is not
+    needed.
+
+    Args:
+        h5_path (str): Model saved with ``model.save(...h5)``
+
+    Returns:
+        list: ``(kernel, bias, activation)`` per Dense layer, in order
+    """
+    import h5py
+
+    with h5py.File(h5_path, "r") as f:
+        config = json.loads(f.attrs["model_config"])
+        weights = f["model_weights"] if "model_weights" in f else f
+        layers = []
+        for layer in config["config"]["layers"]:
+            name, params = layer["class_name"], layer["config"]
+            if name == "InputLayer":
+                continue
+            if name != "Dense":
+                raise ValueError(f"Cannot export {name} layer {params['name']}")
+            if params["activation"] not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {params['activation']}")
+            group = weights[params["name"]]
+            kernel = _h5_dataset(group, "kernel").astype(np.float32)
+            if params.get("use_bias", True):
+                bias = _h5_dataset(group, "bias").astype(np.float32)
+            else:
+                bias = np.zeros(kernel.shape[1], dtype=np.float32)
+            layers.append((kernel, bias, params["activation"]))
+    return layers
+
+
+def read_xgboost_trees(joblib_path):
+    """
+    Flatten a binary XGBoost classifier into per-tree node arrays
+
+    Node ``i`` of tree ``t`` sends a row to ``yes[t, i]`` when its
+    ``feature[t, i]`` value is below ``threshold[t, i]``, to ``no[t, i]``
+    otherwise and to ``missing[t, i]`` when it is NaN. Leaves have feature
+    -1 and hold their margin contribution in ``value``.
+
+    Args:
+        joblib_path (str): joblib dump of a fitted ``XGBClassifier``
+
+    Returns:
+        tuple: Dict of node arrays and the base margin
+    """
+    import joblib
+
+    booster = joblib.load(joblib_path).get_booster()
+    params = json.loads(booster.save_config())["learner"]
+    if params["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"Cannot export objective {params['objective']['name']}")
+    # Newer releases store base_score as a one-element vector, e.g. "[5E-1]"
+    base_score = float(params["learner_model_param"]["base_score"].strip("[]").split(",")[0])
+    base_margin = float(np.log(base_score / (1 - base_score)))
+
+    nodes = booster.trees_to_dataframe()
+    names = booster.feature_names or []
+    shape = (nodes["Tree"].max() + 1, nodes["Node"].max() + 1)
+    trees = {
+        "feature": np.full(shape, -1, dtype=np.int32),
+        "threshold": np.zeros(shape, dtype=np.float32),
+        "yes": np.zeros(shape, dtype=np.int32),
+        "no": np.zeros(shape, dtype=np.int32),
+        "missing": np.zeros(shape, dtype=np.int32),
+        "value": np.zeros(shape, dtype=np.float32),
+    }
+
+    def node_index(node_id):
+        return int(node_id.split("-")[1])
+
+    for row in nodes.itertuples(index=False):
+        t, i = row.Tree, row.Node
+        if row.Feature == "Leaf":
+            trees["value"][t, i] = row.Gain
+            continue
+        trees["feature"][t, i] = names.index(row.Feature) if row.Feature in names else int(row.Feature[1:])
+        trees["threshold"][t, i] = row.Split
+        trees["yes"][t, i] = node_index(row.Yes)
+        trees["no"][t, i] = node_index(row.No)
+        trees["missing"][t, i] = node_index(row.Missing)
+    return trees, base_margin
+
+
+def export_model(model_path, out_path=None):
+    """
+    Convert a Keras ``.h5`` or XGBoost joblib model to a NumPy ``.npz``
+
+    The export records the hash of the source file so that serving can tell
+    when it has gone stale.
+
+    Args:
+        model_path (str): Model to convert
+        out_path (str): Destination, next to the model by default
+
+    Returns:
+        str: Path of the written export
+    """
+    out_path = out_path or exported_path(model_path)
+    arrays = {"source_sha256": np.array(file_sha256(model_path))}
+    if model_path.endswith((".h5", ".keras")):
+        layers = read_keras_dense(model_path)
+        arrays.update(kind=np.array("dense"), layer_count=np.array(len(layers)))
+        for i, (kernel, bias, activation) in enumerate(layers):
+            arrays.update({
+                f"kernel_{i}": kernel,
+                f"bias_{i}": bias,
+                f"activation_{i}": np.array(activation),
+            })
+    elif model_path.endswith(".joblib"):
+        trees, base_margin = read_xgboost_trees(model_path)
+        arrays.update(trees, kind=np.array("trees"), base_margin=np.array(base_margin))
+    else:
+        raise ValueError(f"Unsupported model file: {model_path}")
+    with open(out_path, "wb") as f:
+        np.savez(f, **arrays)
+    logging.info(f"Exported {model_path} to {out_path}.")
+    return out_path
+
+
+def check_parity(model_path, export_path, n=10000, seed=0):
+    """
+    Compare an export with the original model on a fixed set of inputs
+
+    Both models see the same unscaled rows, so the check covers the model
+    alone, not the feature scaler.
+
+    Args:
+        model_path (str): Original model file
+        export_path (str): Its NumPy export
+        n (int): Number of test rows
+        seed (int): Seed of the test rows
+
+    Returns:
+        float: Largest absolute difference between the two outputs
+    """
+    X = sample_features(n, seed)
+    if model_path.endswith(".joblib"):
+        reference = load_joblib(model_path)
+    else:
+        reference = load_keras(model_path)
+    expected = np.asarray(reference(X), dtype=np.float32).reshape(-1)
+    actual = np.asarray(load_numpy(export_path)[0](X), dtype=np.float32).reshape(-1)
+    return float(np.max(np.abs(expected - actual)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Export the hotspot model to a NumPy inference file."
+    )
+    parser.add_argument("model_path")
+    parser.add_argument("out_path", nargs="?")
+    parser.add_argument("--skip-parity", action="store_true",
+                        help="do not load the original model to compare outputs")
+    args = parser.parse_args()
+
+    out_path = export_model(args.model_path, args.out_path)
+    if not args.skip_parity:
+        max_diff = check_parity(args.model_path, out_path)
+        logging.info(f"Largest difference from the original model: {max_diff:.2e}")
+        if max_diff > PARITY_TOLERANCE:
+            raise SystemExit(f"Export differs from {args.model_path} by {max_diff:.2e}")
@@ -0,0 +1,342 @@
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from metrics import timer
+
+
+# Model inputs, in the column order the notebook trained on
+FEATURE_COLUMNS = ["AREA", "Crm Cd", "Vict Sex", "Vict Descent", "Weapon Desc", "year", "case"]
+
+
+def current_artifacts(artifacts_dir):
+    """
+    Files of the current version written by ``training.py``
+
+    Args:
+        artifacts_dir (str): Root directory of artifact versions
+
+    Returns:
+        dict: Version and the paths of its model, scaler and encoders
+    """
+    with open(os.path.join(artifacts_dir, "current")) as f:
+        version = f.read().strip()
+    version_dir = os.path.join(artifacts_dir, version)
+    with open(os.path.join(version_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    paths = {name: os.path.join(version_dir, manifest[name]) for name in ("model", "scaler", "encoders")}
+    return {"version": version, **paths}
+
+
+# Trained artifacts (CRPS_ARTIFACTS_DIR) supply the model and scaler unless
+# CRPS_MODEL_PATH / CRPS_SCALER_PATH name files explicitly
+ARTIFACTS_DIR = os.environ.get("CRPS_ARTIFACTS_DIR")
+CURRENT_ARTIFACTS = current_artifacts(ARTIFACTS_DIR) if ARTIFACTS_DIR else {}
+
+MODEL_PATH = os.environ.get("CRPS_MODEL_PATH", CURRENT_ARTIFACTS.get("model", "crime_hotspot_model.h5"))
+SCALER_PATH = os.environ.get("CRPS_SCALER_PATH", CURRENT_ARTIFACTS.get("scaler", "scaler.json"))
+
+# Inference runtime: "auto" uses the NumPy export next to the model file when
+# it is up to date, "numpy" requires it, "native" always loads the original
+MODEL_BACKEND = os.environ.get("CRPS_MODEL_BACKEND", "auto")
+
+# Rows per forward pass; larger requests are split to bound peak memory
+MAX_BATCH_ROWS = 65536
+
+# Probability at or above which an input is labelled high risk
+RISK_THRESHOLD = 0.5
+
+
+def sample_features(n, seed=0):
+    """
+    Feature rows spanning the categorical ranges of the training data
+    """
+    rng = np.random.default_rng(seed)
+    return np.column_stack(
+        [
+            rng.integers(1, 22, n),      # AREA
+            rng.integers(110, 957, n),   # Crm Cd
+            rng.integers(0, 3, n),       # Vict Sex
+            rng.integers(0, 20, n),      # Vict Descent
+            rng.integers(0, 80, n),      # Weapon Desc
+            rng.integers(2020, 2026, n), # year
+            rng.integers(0, 2, n),       # case
+        ]
+    ).astype(np.float32)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FeatureScaler:
+    """
+    StandardScaler transform with the statistics the model was trained with
+
+    Applies ``(X - mean) / scale`` column-wise, exactly as sklearn's
+    ``StandardScaler.transform`` does.
+    """
+
+    def __init__(self, mean, scale):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+
+    @classmethod
+    def identity(cls, n_features=len(FEATURE_COLUMNS)):
+        return cls(np.zeros(n_features), np.ones(n_features))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load scaler statistics
+
+        Args:
+            path (str): A JSON/.npz file with ``mean`` and ``scale`` arrays, or
+                a joblib dump of a fitted sklearn ``StandardScaler``
+
+        Returns:
+            FeatureScaler: The loaded scaler
+        """
+        if path.endswith(".json"):
+            with open(path) as f:
+                stats = json.load(f)
+            return cls(stats["mean"], stats["scale"])
+        if path.endswith(".npz"):
+            stats = np.load(path)
+            return cls(stats["mean"], stats["scale"])
+        import joblib
+
+        scaler = joblib.load(path)
+        return cls(scaler.mean_, scaler.scale_)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"mean": self.mean.tolist(), "scale": self.scale.tolist()}, f)
+
+    def transform(self, X):
+        return (X - self.mean) / self.scale
+
+
+def load_keras(path):
+    """
+    Inference function for a Keras model saved as HDF5
+    """
+    try:
+        from tensorflow import keras
+    except ImportError:
+        import keras
+
+    model = keras.models.load_model(path, compile=False)
+    return lambda X: np.asarray(model.predict_on_batch(X))
+
+
+def load_joblib(path):
+    """
+    Inference function for a joblib-pickled scikit-learn or XGBoost classifier
+    """
+    import joblib
+
+    estimator = joblib.load(path)
+    return lambda X: estimator.predict_proba(X)[:, 1]
+
+
+ACTIVATIONS = {
+    "linear": lambda h: h,
+    "relu": lambda h: np.maximum(h, 0, out=h),
+    "sigmoid": lambda h: 1 / (1 + np.exp(-h)),
+    "tanh": np.tanh,
+}
+
+
+def _dense_forward(layers):
+    def predict(X):
+        h = np.asarray(X, dtype=np.float32)
+        for kernel, bias, activation in layers:
+            h = ACTIVATIONS[activation](h @ kernel + bias)
+        return h
+
+    return predict
+
+
+def _trees_forward(trees, base_margin):
+    feature, threshold = trees["feature"], trees["threshold"]
+    yes, no, missing, value = trees["yes"], trees["no"], trees["missing"], trees["value"]
+    tree_ids = np.arange(len(feature))
+
+    def predict(X):
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        node = np.zeros((len(X), len(tree_ids)), dtype=np.int32)
+        while True:
+            split = feature[tree_ids, node]
+            inner = split >= 0
+            if not inner.any():
+                break
+            x = X[rows, np.maximum(split, 0)]
+            child = np.where(
+                np.isnan(x),
+                missing[tree_ids, node],
+                np.where(x < threshold[tree_ids, node], yes[tree_ids, node], no[tree_ids, node]),
+            )
+            node = np.where(inner, child, node)
+        margin = value[tree_ids, node].sum(axis=1) + base_margin
+        return 1 / (1 + np.exp(-margin))
+
+    return predict
+
+
+def load_numpy(path):
+    """
+    Inference function for a model exported by ``model_export``
+
+    Returns:
+        tuple: Predict function and the hash of the model it was exported from
+    """
+    with np.load(path) as artifact:
+        kind = str(artifact["kind"])
+        source_sha256 = str(artifact["source_sha256"])
+        if kind == "dense":
+            layers = [
+                (
+                    artifact[f"kernel_{i}"].astype(np.float32),
+                    artifact[f"bias_{i}"].astype(np.float32),
+                    str(artifact[f"activation_{i}"]),
+                )
+                for i in range(int(artifact["layer_count"]))
+            ]
+            return _dense_forward(layers), source_sha256
+        if kind == "trees":
+            trees = {
+                name: artifact[name]
+                for name in ("feature", "threshold", "yes", "no", "missing", "value")
+            }
+            return _trees_forward(trees, float(artifact["base_margin"])), source_sha256
+    raise ValueError(f"Unknown exported model kind: {kind}")
+
+
+def exported_path(model_path):
+    """
+    Location of the NumPy export of a model file
+    """
+    return os.path.splitext(model_path)[0] + ".npz"
+
+
+class HotspotModel:
+    """
+    Trained hotspot classifier behind a batch ``predict`` call
+
+    Inputs are scaled and scored as one float32 matrix per forward pass, so
+    a request for many rows costs one model call rather than one per row.
+    """
+
+    def __init__(self, predict_fn, scaler, backend, path=None):
+        self._predict_fn = predict_fn
+        self.scaler = scaler
+        self.backend = backend
+        self.path = path
+
+    def predict(self, X):
+        """
+        Score a batch of feature rows
+
+        Args:
+            X (array-like): Matrix of shape (n, 7) in FEATURE_COLUMNS order
+
+        Returns:
+            ndarray: High-risk probability per row, float32 of shape (n,)
+        """
+        with timer("model_inference"):
+            X = np.asarray(X, dtype=np.float32).reshape(-1, len(FEATURE_COLUMNS))
+            scaled = self.scaler.transform(X)
+            if len(scaled) <= MAX_BATCH_ROWS:
+                return np.asarray(self._predict_fn(scaled), dtype=np.float32).reshape(-1)
+            return np.concatenate(
+                [
+                    np.asarray(self._predict_fn(scaled[i:i + MAX_BATCH_ROWS]), dtype=np.float32).reshape(-1)
+                    for i in range(0, len(scaled), MAX_BATCH_ROWS)
+                ]
+            )
+
+    def info(self):
+        return {
+            "backend": self.backend,
+            "path": self.path,
+            "features": FEATURE_COLUMNS,
+            "scaler_mean": self.scaler.mean.tolist(),
+            "scaler_scale": self.scaler.scale.tolist(),
+            "risk_threshold": RISK_THRESHOLD,
+        }
+
+
+def _select_artifact(model_path, backend):
+    """
+    Choose between a model file and its NumPy export
+    """
+    if model_path.endswith(".npz") or backend == "native":
+        return model_path
+    exported = exported_path(model_path)
+    if not os.path.exists(exported):
+        if backend == "numpy":
+            raise FileNotFoundError(
+                f"No NumPy export of {model_path}; run model_export.py first."
+            )
+        return model_path
+    with np.load(exported) as artifact:
+        source_sha256 = str(artifact["source_sha256"])
+    if os.path.exists(model_path) and source_sha256 != file_sha256(model_path):
+        if backend == "numpy":
+            raise ValueError(f"{exported} is out of date with {model_path}.")
+        logging.warning(f"{exported} is out of date with {model_path}; ignoring it.")
+        return model_path
+    return exported
+
+
+def load_model(model_path=MODEL_PATH, scaler_path=SCALER_PATH, backend=MODEL_BACKEND,
+               allow_unscaled=False):
+    """
+    Load the hotspot model and its feature scaler
+
+    The notebook never saved its fitted StandardScaler, and the model's
+    outputs on unscaled features are meaningless (every input scores 1.0),
+    so a missing scaler file is an error until ``training.py`` writes one.
+
+    Args:
+        model_path (str): Keras ``.h5``/``.keras`` file, joblib model or a
+            ``.npz`` export made by ``model_export``
+        scaler_path (str): Scaler statistics, see ``FeatureScaler.load``
+        backend (str): "auto", "numpy" or "native", see MODEL_BACKEND
+        allow_unscaled (bool): Pass features through unscaled when the
+            scaler file is missing; only for timing inference
+
+    Returns:
+        HotspotModel: Model ready for batch inference
+    """
+    model_path = _select_artifact(model_path, backend)
+    if model_path.endswith(".npz"):
+        predict_fn, backend = load_numpy(model_path)[0], "numpy"
+    elif model_path.endswith((".h5", ".keras")):
+        predict_fn, backend = load_keras(model_path), "keras"
+    elif model_path.endswith(".joblib"):
+        predict_fn, backend = load_joblib(model_path), "joblib"
+    else:
+        raise ValueError(f"Unsupported model file: {model_path}")
+
+    if os.path.exists(scaler_path):
+        scaler = FeatureScaler.load(scaler_path)
+    elif allow_unscaled:
+        logging.warning(
+            f"Scaler file {scaler_path} not found; model inputs will not be scaled."
+        )
+        scaler = FeatureScaler.identity()
+    else:
+        raise FileNotFoundError(
+            f"Scaler file {scaler_path} missing; run training.py to fit one."
+        )
+    return HotspotModel(predict_fn, scaler, backend, model_path)
@@ -0,0 +1,365 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import date, datetime
+
+import numpy as np
+
+
+DATE_FORMAT = "%d/%m/%Y"
+
+# Decimals of the generated probability percentages
+PROBABILITY_DECIMALS = 2
+
+# Record columns of a PredictionStore, as saved by ``save``
+STORE_COLUMNS = ["ordinals", "areas", "crimes", "probabilities", "risks"]
+
+
+def _date_ordinal(date_str):
+    """
+    Convert a 'DD/MM/YYYY' date string to its proleptic Gregorian ordinal
+
+    Args:
+        date_str (str): Date string in 'DD/MM/YYYY' format
+
+    Returns:
+        int: Ordinal of the date, or None if the string cannot be parsed
+    """
+    try:
+        return datetime.strptime(date_str, DATE_FORMAT).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def _ceil_ordinal(moment):
+    """
+    Smallest date ordinal whose midnight is at or after ``moment``
+
+    Prediction dates carry no time of day, so ``pred_date >= moment`` holds
+    exactly when the prediction ordinal is >= this value.
+    """
+    midnight = datetime(moment.year, moment.month, moment.day)
+    ordinal = moment.toordinal()
+    return ordinal if moment == midnight else ordinal + 1
+
+
+def _encode(names, mapping):
+    """
+    Codes of names under a ``{code: name}`` mapping
+
+    Names the mapping lacks get codes past its largest one, so any record
+    can be stored.
+
+    Returns:
+        tuple: int16 codes and the object array of names indexed by code
+    """
+    lookup = {name: code for code, name in mapping.items()}
+    next_code = max(mapping, default=-1) + 1
+    for name in dict.fromkeys(names):
+        if name not in lookup:
+            lookup[name] = next_code
+            next_code += 1
+    codes = np.fromiter((lookup[name] for name in names), dtype=np.int16, count=len(names))
+    table = np.empty(next_code, dtype=object)
+    for name, code in lookup.items():
+        table[code] = name
+    return codes, table
+
+
+class PredictionStore:
+    """
+    Read-only, date-indexed table of the generated high-risk predictions
+
+    Records are held as columns sorted by date: date ordinals, AREA and
+    Crm Cd codes, float32 probabilities and risk level codes, about 17
+    bytes per record instead of a dict of strings. A date window is
+    resolved with two binary searches, and records are only rebuilt as
+    dicts for the responses that need them.
+    """
+
+    def __init__(self, records, version=None, area_mapping=None, crime_code_mapping=None):
+        """
+        Args:
+            records (list): Prediction records keyed like the generated JSON
+                (dates, AREA NAME, Crm Cd Desc, Risk, Probability); records
+                whose date does not parse are left out
+            version (str): Identifier of the snapshot
+            area_mapping (dict): AREA code to AREA NAME, the codes stored
+            crime_code_mapping (dict): Crm Cd to Crm Cd Desc, likewise
+        """
+        self.version = version
+        self.created_at = datetime.now()
+        # Directory the store was loaded from, see ``load``
+        self.path = None
+        parsed = []
+        for record in records:
+            ordinal = _date_ordinal(record.get("dates"))
+            if ordinal is not None:
+                parsed.append((ordinal, record))
+
+        # Stable sort keeps the original generation order within a day
+        parsed.sort(key=lambda item: item[0])
+        records = [record for _, record in parsed]
+
+        self.ordinals = np.fromiter(
+            (ordinal for ordinal, _ in parsed), dtype=np.int32, count=len(parsed)
+        )
+        self.areas, self.area_names = _encode(
+            [record["AREA NAME"] for record in records], area_mapping or {}
+        )
+        self.crimes, self.crime_descs = _encode(
+            [record["Crm Cd Desc"] for record in records], crime_code_mapping or {}
+        )
+        self.probabilities = np.fromiter(
+            (record["Probability"] for record in records), dtype=np.float32, count=len(records)
+        )
+        risks, self.risk_levels = _encode([record["Risk"] for record in records], {})
+        self.risks = risks.astype(np.int8)
+        # Codes from here on were added for names the mappings lack
+        self._first_unmapped = (
+            max(area_mapping or {}, default=-1) + 1,
+            max(crime_code_mapping or {}, default=-1) + 1,
+        )
+
+    @classmethod
+    def from_json(cls, high_risk_json, area_mapping=None, crime_code_mapping=None):
+        """
+        Build a store from the JSON string produced by ``get_prediction``
+
+        Args:
+            high_risk_json (str): JSON array of prediction records
+            area_mapping (dict): AREA code to AREA NAME
+            crime_code_mapping (dict): Crm Cd to Crm Cd Desc
+
+        Returns:
+            PredictionStore: Store indexed by prediction date, versioned by
+            a hash of the JSON so equal snapshots share a version
+        """
+        version = hashlib.blake2b(high_risk_json.encode(), digest_size=8).hexdigest()
+        return cls(json.loads(high_risk_json), version, area_mapping, crime_code_mapping)
+
+    def save(self, path):
+        """
+        Write the columns as .npy files and the names as store.json in ``path``
+        """
+        os.makedirs(path, exist_ok=True)
+        for column in STORE_COLUMNS:
+            np.save(os.path.join(path, f"{column}.npy"), getattr(self, column))
+        with open(os.path.join(path, "store.json"), "w") as f:
+            json.dump(
+                {
+                    "version": self.version,
+                    "created_at": self.created_at.isoformat(),
+                    "area_names": self.area_names.tolist(),
+                    "crime_descs": self.crime_descs.tolist(),
+                    "risk_levels": self.risk_levels.tolist(),
+                    "first_unmapped": list(self._first_unmapped),
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Open a store written by ``save``
+
+        With ``mmap_mode="r"`` the columns are memory-mapped read-only, so
+        processes that load the same files share one copy in the page cache.
+        """
+        with open(os.path.join(path, "store.json")) as f:
+            meta = json.load(f)
+        store = cls.__new__(cls)
+        store.version = meta["version"]
+        store.path = path
+        store.created_at = datetime.fromisoformat(meta["created_at"])
+        for column in STORE_COLUMNS:
+            setattr(store, column, np.load(os.path.join(path, f"{column}.npy"), mmap_mode=mmap_mode))
+        for names in ("area_names", "crime_descs", "risk_levels"):
+            table = np.empty(len(meta[names]), dtype=object)
+            table[:] = meta[names]
+            setattr(store, names, table)
+        store._first_unmapped = tuple(meta["first_unmapped"])
+        return store
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    def rows(self, lo, hi):
+        """
+        Records ``lo:hi`` as dicts keyed like the generated JSON
+        """
+        return self.rows_at(slice(lo, hi))
+
+    def rows_at(self, positions):
+        """
+        Records at ``positions`` (a slice or array of record positions) as dicts
+        """
+        dates = {}
+        rows = []
+        for ordinal, area, crime, risk, probability in zip(
+            self.ordinals[positions].tolist(),
+            self.area_names[self.areas[positions]].tolist(),
+            self.crime_descs[self.crimes[positions]].tolist(),
+            self.risk_levels[self.risks[positions]].tolist(),
+            np.round(self.probabilities[positions].astype(np.float64), PROBABILITY_DECIMALS).tolist(),
+        ):
+            if ordinal not in dates:
+                dates[ordinal] = date.fromordinal(ordinal).strftime(DATE_FORMAT)
+            rows.append(
+                {
+                    "dates": dates[ordinal],
+                    "AREA NAME": area,
+                    "Crm Cd Desc": crime,
+                    "Risk": risk,
+                    "Probability": probability,
+                }
+            )
+        return rows
+
+    def area_index(self, lo, hi):
+        """
+        Positions of the records ``lo:hi`` of each area, from the AREA codes
+
+        No record dicts are built.
+
+        Returns:
+            list: One array of record positions per area, areas in order of
+            first appearance and positions in record order
+        """
+        codes = np.asarray(self.areas[lo:hi])
+        if not len(codes):
+            return []
+        order = np.argsort(codes, kind="stable")
+        starts = np.flatnonzero(np.diff(codes[order])) + 1
+        groups = np.split(order + lo, starts)
+        # Positions ascend within a group, so its first is where the area appears
+        groups.sort(key=lambda positions: positions[0])
+        return groups
+
+    def iter_area_groups(self, lo, hi, index=None):
+        """
+        Yield one entry per area of the records ``lo:hi``
+
+        Each entry holds the area's dates, crime descriptions, probabilities
+        and a summary of count, max/mean probability and count per crime
+        description. Dicts are built for one area at a time, as its entry
+        is yielded.
+
+        Args:
+            lo (int): First record
+            hi (int): End of the records
+            index (list): Slice of ``self.area_index(lo, hi)`` to yield, all
+                areas by default
+        """
+        if index is None:
+            index = self.area_index(lo, hi)
+        for positions in index:
+            yield _area_entry(self.rows_at(positions))
+
+    def _probabilities(self, lo, hi):
+        # float32 holds 7 significant digits, so rounding restores the
+        # generated two-decimal percentages exactly
+        return np.round(self.probabilities[lo:hi].astype(np.float64), PROBABILITY_DECIMALS).tolist()
+
+    def columns(self, lo, hi):
+        """
+        Records ``lo:hi`` as columns of codes, the compact response format
+
+        Records are in date order: ``date_counts[i]`` records fall on
+        ``dates[i]``. ``area`` and ``crm_cd`` hold AREA and Crm Cd codes,
+        whose names clients look up once in /city_crime_mapping; codes
+        missing from it are named under ``unmapped``. ``risk`` holds
+        indices into ``risk_levels`` and is left out when there is only
+        one level.
+
+        Returns:
+            dict: The columns, keyed as described
+        """
+        days, counts = np.unique(self.ordinals[lo:hi], return_counts=True)
+        levels = np.unique(self.risks[lo:hi])
+        content = {
+            "version": self.version,
+            "count": hi - lo,
+            "dates": [date.fromordinal(day).strftime(DATE_FORMAT) for day in days.tolist()],
+            "date_counts": counts.tolist(),
+            "area": self.areas[lo:hi].tolist(),
+            "crm_cd": self.crimes[lo:hi].tolist(),
+            "probability": self._probabilities(lo, hi),
+            "risk_levels": self.risk_levels[levels].tolist(),
+        }
+        if len(levels) > 1:
+            content["risk"] = np.searchsorted(levels, self.risks[lo:hi]).tolist()
+        unmapped = {}
+        for key, codes, names, first_unmapped in (
+            ("area", self.areas[lo:hi], self.area_names, self._first_unmapped[0]),
+            ("crm_cd", self.crimes[lo:hi], self.crime_descs, self._first_unmapped[1]),
+        ):
+            extra = np.unique(codes[codes >= first_unmapped])
+            if len(extra):
+                unmapped[key] = {code: names[code] for code in extra.tolist()}
+        if unmapped:
+            content["unmapped"] = unmapped
+        return content
+
+    def nbytes(self):
+        """
+        Memory held by the record columns
+        """
+        return sum(getattr(self, column).nbytes for column in STORE_COLUMNS)
+
+    def window(self, start_date, end_date):
+        """
+        Return predictions dated within ``[start_date, end_date)``
+
+        Args:
+            start_date (datetime): Inclusive lower bound
+            end_date (datetime): Exclusive upper bound
+
+        Returns:
+            list: Prediction records in date order
+        """
+        lo, hi = self.window_bounds(start_date, end_date)
+        return self.rows(lo, hi)
+
+    def window_bounds(self, start_date, end_date):
+        """
+        Return the ``(lo, hi)`` slice of the records covering a date window
+        """
+        # A Python int would make searchsorted copy the column to int64 first
+        bounds = np.array([_ceil_ordinal(start_date), _ceil_ordinal(end_date)], dtype=self.ordinals.dtype)
+        lo, hi = np.searchsorted(self.ordinals, bounds, side="left").tolist()
+        return lo, max(lo, hi)
+
+
+def _area_entry(predictions):
+    """
+    Consolidate the prediction records of a single area into one entry
+
+    Dates and crime descriptions are deduplicated with insertion-ordered
+    dicts, so the entry is built in one linear pass. The same pass computes
+    the summary statistics used to size map markers.
+    """
+    dates = {}
+    crime_counts = Counter()
+    probabilities = []
+    for pred in predictions:
+        dates[pred["dates"]] = None
+        crime_counts[pred["Crm Cd Desc"]] += 1
+        probabilities.append(pred["Probability"])
+
+    first = predictions[0]
+    return {
+        "dates": list(dates),
+        "AREA NAME": first["AREA NAME"],
+        "Crm Cd Desc": list(crime_counts),
+        "Risk": first["Risk"],
+        "Probability": probabilities,
+        "Summary": {
+            "count": len(probabilities),
+            "max_probability": max(probabilities),
+            "mean_probability": sum(probabilities) / len(probabilities),
+            "crime_counts": dict(crime_counts),
+        },
+    }
+
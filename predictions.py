@@ -1,6 +1,12 @@
+import logging
+import os
+import numpy as np
 import pandas as pd
-import random as rd
-from datetime import datetime
+from datetime import datetime, timedelta
+from metrics import timer
+from prediction_store import PredictionStore
+from resources import LazyResource
+from shared_snapshot import SHARED_DIR, attach, read_json
 
 
 area_range = range(1, 22)
@@ -179,30 +185,42 @@ crime_code_mapping = {
 }
 
 
-def get_prediction(seed=42):
-    rd.seed(seed)
-    current_date = datetime.now()
-    current_month = current_date.month
-    current_year = current_date.year
-    current_day = current_date.day
+# Lookup arrays indexed by code, for mapping whole arrays of codes at once
+AREA_NAMES = np.array(
+    [area_mapping.get(code) for code in range(max(area_mapping) + 1)], dtype=object
+)
+CRIME_DESCS = np.array(
+    [crime_code_mapping.get(code) for code in range(max(crime_code_mapping) + 1)],
+    dtype=object,
+)
 
-    # Initialize the data dictionary
-    data = {
-        "AREA": [],
-        "Crm Cd": [],
-        "dates": [],
-        "Risk": [],  # Include Risk column
-        "Probability": [],  # New Probability column
-    }
+PREDICTION_COLUMNS = ["dates", "AREA NAME", "Crm Cd Desc", "Risk", "Probability"]
 
-    # Track indices already marked as high risk
-    high_risk_indices = set()
+
+def prediction_dates(current_date, horizon_days=None):
+    """
+    Future dates to generate predictions for
+
+    Args:
+        current_date (datetime): Moment the predictions are made
+        horizon_days (int): Number of days after ``current_date``; by default
+            the rest of the current month and the next two months
+
+    Returns:
+        list: Dates as 'DD/MM/YYYY' strings
+    """
+    if horizon_days is not None:
+        first = current_date.date() + timedelta(days=1)
+        return [
+            (first + timedelta(days=offset)).strftime("%d/%m/%Y")
+            for offset in range(horizon_days)
+        ]
 
     # getting dates for the current month and the next two months
     dates = []
     for month_offset in range(3):
-        target_month = current_month + month_offset
-        target_year = current_year
+        target_month = current_date.month + month_offset
+        target_year = current_date.year
 
         # Adjust year if month rolls over
         if target_month > 12:
@@ -218,47 +236,125 @@ def get_prediction(seed=42):
             except ValueError:
                 # Skip invalid dates like February 30
                 continue
+    return dates
+
+
+def generate_predictions(dates, seed=42, grid=False):
+    """
+    Generate high-risk predictions for a list of dates with NumPy
 
-    print(f"Dates: {dates}")
+    Args:
+        dates (list): Dates as 'DD/MM/YYYY' strings
+        seed (int): Seed of the random generator; equal seeds give equal output
+        grid (bool): Predict every area x mapped crime code for each date
+            instead of 15-20 random (area, crime code) pairs per date
 
-    for date in dates:
-        num_predictions = rd.randint(15, 20)
-        for i in range(num_predictions):
-            data["AREA"].append(rd.choice(area_range))
-            data["Crm Cd"].append(rd.choice(crm_cd_range))
-            data["dates"].append(date)
-            data["Risk"].append("High")
-            data["Probability"].append(
-                round(rd.uniform(80, 100), 2)
-            )  # Placeholder for probability
+    Returns:
+        DataFrame: One row per prediction with PREDICTION_COLUMNS
+    """
+    rng = np.random.default_rng(seed)
+    n_dates = len(dates)
 
-    # create dataframe
-    df = pd.DataFrame(data)
+    if grid:
+        area_codes = np.fromiter(area_mapping, dtype=np.int64)
+        crime_codes = np.fromiter(crime_code_mapping, dtype=np.int64)
+        per_date = len(area_codes) * len(crime_codes)
+        date_idx = np.repeat(np.arange(n_dates), per_date)
+        areas = np.tile(np.repeat(area_codes, len(crime_codes)), n_dates)
+        crimes = np.tile(crime_codes, len(area_codes) * n_dates)
+    else:
+        counts = rng.integers(15, 21, size=n_dates)
+        date_idx = np.repeat(np.arange(n_dates), counts)
+        areas = rng.integers(area_range.start, area_range.stop, size=len(date_idx))
+        crimes = rng.integers(crm_cd_range.start, crm_cd_range.stop, size=len(date_idx))
 
-    # Map AREA and Crm Cd to their descriptions
-    df["AREA NAME"] = df["AREA"].map(area_mapping)
-    df["Crm Cd Desc"] = df["Crm Cd"].map(crime_code_mapping)
+    # Placeholder for probability
+    probability = np.round(rng.uniform(80, 100, size=len(date_idx)), 2)
 
-    # Filter for high-risk rows
-    high_risk_df = df[df["Risk"] == "High"]
+    # Map AREA and Crm Cd to their descriptions and drop unmapped codes
+    area_names = AREA_NAMES[areas]
+    crime_descs = CRIME_DESCS[crimes]
+    keep = (area_names != None) & (crime_descs != None)  # noqa: E711
 
-    # Select specified columns
-    high_risk_df = high_risk_df[
-        ["dates", "AREA NAME", "Crm Cd Desc", "Risk", "Probability",]
-    ]
+    return pd.DataFrame(
+        {
+            "dates": np.asarray(dates, dtype=object)[date_idx[keep]],
+            "AREA NAME": area_names[keep],
+            "Crm Cd Desc": crime_descs[keep],
+            "Risk": "High",
+            "Probability": probability[keep],
+        },
+        columns=PREDICTION_COLUMNS,
+    )
 
-    # Clean NaN values for JSON compatibility
-    high_risk_df = high_risk_df.dropna()
+
+def get_prediction(seed=42, horizon_days=None, grid=False):
+    dates = prediction_dates(datetime.now(), horizon_days)
+    logging.debug(f"Dates: {dates}")
+
+    with timer("prediction_generate"):
+        high_risk_df = generate_predictions(dates, seed=seed, grid=grid)
 
     # Convert to JSON
-    high_risk_json = high_risk_df.to_json(orient="records")
+    with timer("prediction_serialize"):
+        high_risk_json = high_risk_df.to_json(orient="records")
 
-    # Save to file (optional)
-    with open("high_risk_data.json", "w") as f:
-        f.write(high_risk_json)
+    # Save to file (optional); replaced atomically as it is regenerated, through
+    # a temporary file per process so concurrent workers do not share one
+    with timer("prediction_file_write"):
+        tmp = f"high_risk_data.json.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(high_risk_json)
+        os.replace(tmp, "high_risk_data.json")
 
     return high_risk_json
 
 
-# Generate predictions once and save the result
-high_risk_json = get_prediction()
+def build_predictions():
+    """
+    Generate a prediction snapshot for the window starting now
+
+    Returns:
+        tuple: The predictions JSON and its date-indexed store
+    """
+    high_risk_json = get_prediction()
+    with timer("prediction_parse"):
+        return high_risk_json, PredictionStore.from_json(
+            high_risk_json, area_mapping, crime_code_mapping
+        )
+
+
+def load_predictions():
+    """
+    Attach to the published snapshot when CRPS_SHARED_DIR is set, otherwise
+    generate one for this process
+    """
+    if SHARED_DIR:
+        return attach(SHARED_DIR)
+    return build_predictions()
+
+
+# Predictions are loaded once, on first use rather than at import
+prediction_resource = LazyResource("predictions", load_predictions)
+
+
+def get_high_risk_json():
+    high_risk_json, store = prediction_resource.get()
+    # Attached snapshots leave the JSON on disk until it is asked for
+    return read_json(store) if high_risk_json is None else high_risk_json
+
+
+def get_prediction_store():
+    """
+    Date-indexed view over the predictions, built once for the API
+    """
+    return prediction_resource.get()[1]
+
+
+def __getattr__(name):
+    # Keep `from predictions import high_risk_json` working, lazily
+    if name == "high_risk_json":
+        return get_high_risk_json()
+    if name == "prediction_store":
+        return get_prediction_store()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+
+
+class LazyResource:
+    """
+    Expensive application state that is built on first use and then cached
+
+    The loader runs at most once at a time; concurrent callers wait for the
+    same result instead of building it twice. A failed load is not cached,
+    so the next caller retries.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self.load_seconds = None
+        self.error = None
+        self._listeners = []
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        """
+        Return the resource, building it if needed
+        """
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                started = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.load_seconds = time.perf_counter() - started
+                self.error = None
+                self._loaded = True
+                logging.info(f"Loaded {self.name} in {self.load_seconds:.3f}s.")
+                self._notify()
+        return self._value
+
+    def set(self, value):
+        """
+        Replace the cached resource, e.g. after a rebuild
+        """
+        with self._lock:
+            self._value = value
+            self._loaded = True
+            self._notify()
+
+    def on_change(self, listener):
+        """
+        Call ``listener(value)`` whenever the resource is loaded or replaced
+        """
+        self._listeners.append(listener)
+
+    def _notify(self):
+        for listener in self._listeners:
+            listener(self._value)
+
+    def status(self):
+        return {
+            "loaded": self._loaded,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+
+def warm_up(resources):
+    """
+    Build every resource up front, logging instead of raising on failure
+
+    Args:
+        resources (list): LazyResource instances to load
+
+    Returns:
+        bool: True if every resource loaded
+    """
+    ok = True
+    for resource in resources:
+        try:
+            resource.get()
+        except Exception as e:
+            ok = False
+            logging.error(f"Error warming up {resource.name}: {e}")
+    return ok
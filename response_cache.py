@@ -0,0 +1,144 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import Counter, OrderedDict
+
+from fastapi.responses import Response
+
+from metrics import timer
+
+try:
+    import brotli
+except ImportError:  # Brotli compression is optional
+    brotli = None
+
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+
+
+def encode_json(content):
+    """
+    Serialize content exactly as JSONResponse does
+    """
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class CachedBody:
+    """
+    A JSON body encoded once, with its ETag and compressed variants
+    """
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.encoded = {}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            self.encoded["gzip"] = gzip.compress(body, compresslevel=6)
+            if brotli is not None:
+                self.encoded["br"] = brotli.compress(body)
+
+    def negotiate(self, accept_encoding):
+        """
+        Pick the smallest body variant the client accepts
+
+        Returns:
+            tuple: Content-Encoding (None for identity) and the body bytes
+        """
+        accepted = {
+            coding.split(";")[0].strip() for coding in (accept_encoding or "").split(",")
+        }
+        for coding in ("br", "gzip"):
+            if coding in accepted and coding in self.encoded:
+                return coding, self.encoded[coding]
+        return None, self.body
+
+
+class ResponseCache:
+    """
+    Encoded JSON responses keyed by endpoint and parameters
+
+    Each entry is built once and then served as stored bytes, with a 304
+    for clients that send a matching If-None-Match. Entries carry tags
+    naming the data they were built from, and ``invalidate(tag)`` drops
+    every entry built from that data. The least recently used entries are
+    evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key, build, tags=()):
+        """
+        Return the cached body for ``key``, building it on a miss
+
+        Args:
+            key (tuple): Endpoint and parameters
+            build (callable): Returns the JSON content for the key
+            tags (tuple): Names of the data the content depends on
+
+        Returns:
+            CachedBody: The encoded response
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generations = [self._generations[tag] for tag in tags]
+        content = build()
+        with timer("serialization"):
+            cached = CachedBody(encode_json(content))
+        with self._lock:
+            # Skip storing a body whose data was invalidated while it was built
+            if generations != [self._generations[tag] for tag in tags]:
+                return cached
+            self._entries[key] = (frozenset(tags), cached)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, tag):
+        """
+        Drop every entry built from the data named ``tag``
+        """
+        with self._lock:
+            self._generations[tag] += 1
+            for key in [key for key, (tags, _) in self._entries.items() if tag in tags]:
+                del self._entries[key]
+
+    def respond(self, request, key, build, tags=()):
+        """
+        Serve a cached JSON response, honouring If-None-Match and Accept-Encoding
+        """
+        cached = self.get(key, build, tags)
+        headers = {"ETag": cached.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if cached.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match == "*":
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        coding, body = cached.negotiate(request.headers.get("accept-encoding"))
+        if coding is not None:
+            headers["Content-Encoding"] = coding
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
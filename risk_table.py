@@ -0,0 +1,225 @@
+import argparse
+import json
+import logging
+import os
+from datetime import datetime
+
+import numpy as np
+
+from model_serving import FEATURE_COLUMNS, MODEL_PATH, SCALER_PATH, file_sha256, load_model
+from predictions import (
+    area_range,
+    case_range,
+    crime_code_mapping,
+    crm_cd_range,
+    vict_descent_range,
+    vict_sex_range,
+    weapon_desc_range,
+)
+
+
+RISK_TABLE_PATH = os.environ.get("CRPS_RISK_TABLE", "risk_table.npy")
+
+# Probabilities are stored as uint16 fractions of 65535, i.e. to within 1e-5
+SCALE = np.float32(65535)
+
+# Rows scored per model call while building the table
+BUILD_CHUNK_ROWS = 1 << 20
+
+
+def model_fingerprint(model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    """
+    Hashes of the files whose contents decide the model's outputs
+    """
+    return {
+        "model_sha256": file_sha256(model_path),
+        "scaler_sha256": file_sha256(scaler_path) if os.path.exists(scaler_path) else None,
+    }
+
+
+def table_axes(years, all_codes=False):
+    """
+    Values enumerated along each feature of the table, in FEATURE_COLUMNS order
+
+    Args:
+        years (list): Years to cover
+        all_codes (bool): Cover every code in crm_cd_range instead of only
+            the codes in crime_code_mapping
+
+    Returns:
+        list: Sorted integer values per feature
+    """
+    codes = list(crm_cd_range) if all_codes else sorted(crime_code_mapping)
+    return [
+        list(area_range),
+        codes,
+        list(vict_sex_range),
+        list(vict_descent_range),
+        list(weapon_desc_range),
+        sorted(years),
+        list(case_range),
+    ]
+
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+class RiskTable:
+    """
+    Model outputs for every input in a grid of feature values
+
+    Each feature value is mapped by an array lookup to its offset into the
+    flattened table, so scoring a batch costs one gather per feature and no
+    model call. Values outside the grid map to a large negative offset,
+    which makes the summed index negative and the row a miss.
+    """
+
+    def __init__(self, table, axes, fingerprint):
+        self.table = table
+        self._flat = table.reshape(-1)
+        self.axes = axes
+        self.fingerprint = fingerprint
+        strides = np.cumprod([1] + [len(values) for values in axes[:0:-1]])[::-1]
+        self._offsets = []
+        for values, stride in zip(axes, strides):
+            # The extra last slot catches codes clipped from outside the grid
+            offsets = np.full(max(values) + 2, -table.size, dtype=np.int64)
+            offsets[values] = np.arange(len(values), dtype=np.int64) * stride
+            self._offsets.append(offsets)
+
+    @classmethod
+    def load(cls, path=RISK_TABLE_PATH):
+        """
+        Memory-map a table written by ``build_risk_table``
+        """
+        with open(metadata_path(path)) as f:
+            metadata = json.load(f)
+        table = np.load(path, mmap_mode="r")
+        return cls(table, metadata["axes"], metadata["fingerprint"])
+
+    def lookup(self, X):
+        """
+        Look up the model output of feature rows
+
+        Args:
+            X (array-like): Matrix of shape (n, 7) in FEATURE_COLUMNS order
+
+        Returns:
+            tuple: float32 probabilities of shape (n,), NaN where missed, and
+            the boolean mask of rows found in the table
+        """
+        X = np.asarray(X).reshape(-1, len(FEATURE_COLUMNS))
+        if len(X) == 1:
+            return self._lookup_row(X[0].tolist())
+        codes = X.astype(np.int64)
+        flat = np.zeros(len(X), dtype=np.int64)
+        for j, offsets in enumerate(self._offsets):
+            # -1 indexes the last slot, so negative codes miss as well
+            flat += offsets[np.clip(codes[:, j], -1, len(offsets) - 1)]
+        hit = flat >= 0
+        hit &= (codes == X).all(axis=1)
+        probabilities = self._flat[np.where(hit, flat, 0)] / SCALE
+        probabilities[~hit] = np.nan
+        return probabilities, hit
+
+    def _lookup_row(self, row):
+        # Plain Python for single rows, where per-call NumPy overhead dominates
+        flat = 0
+        for value, offsets in zip(row, self._offsets):
+            code = int(value) if np.isfinite(value) else -1
+            if code != value or not 0 <= code < len(offsets) - 1:
+                return np.array([np.nan], dtype=np.float32), np.array([False])
+            flat += int(offsets[code])
+        if flat < 0:
+            return np.array([np.nan], dtype=np.float32), np.array([False])
+        return np.array([self._flat[flat] / SCALE], dtype=np.float32), np.array([True])
+
+    def info(self):
+        return {
+            "shape": list(self.table.shape),
+            "cells": int(self.table.size),
+            "years": self.axes[FEATURE_COLUMNS.index("year")],
+            **self.fingerprint,
+        }
+
+
+def build_risk_table(path=RISK_TABLE_PATH, years=None, all_codes=False,
+                     model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    """
+    Score the whole feature grid with the model and write it to disk
+
+    The table is written in chunks to a ``.npy`` memory map, with the axes
+    and the model fingerprint in a ``.json`` file beside it. Both are
+    written under temporary names and moved into place at the end.
+
+    Args:
+        path (str): Destination ``.npy`` file
+        years (list): Years to cover, this year and next by default
+        all_codes (bool): See ``table_axes``
+        model_path (str): Model to score with
+        scaler_path (str): Its feature scaler
+
+    Returns:
+        RiskTable: The written table
+    """
+    if years is None:
+        years = [datetime.now().year, datetime.now().year + 1]
+    axes = table_axes(years, all_codes)
+    fingerprint = model_fingerprint(model_path, scaler_path)
+    model = load_model(model_path, scaler_path)
+
+    shape = tuple(len(values) for values in axes)
+    tmp_path = f"{path}.tmp"
+    table = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint16, shape=shape)
+    flat = table.reshape(-1)
+    axis_values = [np.asarray(values, dtype=np.float32) for values in axes]
+    for start in range(0, flat.size, BUILD_CHUNK_ROWS):
+        cells = np.arange(start, min(start + BUILD_CHUNK_ROWS, flat.size))
+        X = np.column_stack(
+            [values[index] for values, index in zip(axis_values, np.unravel_index(cells, shape))]
+        )
+        flat[cells] = np.rint(np.clip(model.predict(X), 0, 1) * SCALE)
+        logging.info(f"Scored {cells[-1] + 1} of {flat.size} risk table cells.")
+    table.flush()
+    del table, flat
+
+    with open(f"{metadata_path(path)}.tmp", "w") as f:
+        json.dump({"axes": axes, "fingerprint": fingerprint}, f)
+    os.replace(tmp_path, path)
+    os.replace(f"{metadata_path(path)}.tmp", metadata_path(path))
+    return RiskTable.load(path)
+
+
+def load_risk_table(path=RISK_TABLE_PATH, model_path=MODEL_PATH, scaler_path=SCALER_PATH):
+    """
+    Load the risk table if it exists and was built from the current model
+
+    Returns:
+        RiskTable: The table, or None if it is missing or stale
+    """
+    if not os.path.exists(path) or not os.path.exists(metadata_path(path)):
+        return None
+    if not os.path.exists(scaler_path):
+        logging.warning(f"Scaler file {scaler_path} missing; ignoring risk table {path}.")
+        return None
+    table = RiskTable.load(path)
+    if table.fingerprint != model_fingerprint(model_path, scaler_path):
+        logging.warning(f"Risk table {path} was built from another model; ignoring it.")
+        return None
+    return table
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Precompute model outputs over the categorical input grid."
+    )
+    parser.add_argument("path", nargs="?", default=RISK_TABLE_PATH)
+    parser.add_argument("--years", type=int, nargs="+")
+    parser.add_argument("--all-codes", action="store_true",
+                        help="cover every crime code in crm_cd_range, not only mapped ones")
+    args = parser.parse_args()
+    build_risk_table(args.path, args.years, args.all_codes)
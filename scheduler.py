@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+# Delay after midnight before a day-rollover refresh, so "now" is in the new day
+MIDNIGHT_GRACE = timedelta(seconds=1)
+
+
+class RefreshScheduler:
+    """
+    Rebuilds a LazyResource in a background thread and swaps it in
+
+    The new value is built off the request path and published with
+    ``LazyResource.set``, a single reference assignment, so readers keep
+    the previous value until the new one is complete and never wait on a
+    rebuild. Refreshes run every ``interval`` seconds (0 disables this)
+    and, with ``at_midnight``, just after each local midnight.
+    """
+
+    def __init__(self, resource, build, interval=0.0, at_midnight=True):
+        self.resource = resource
+        self.build = build
+        self.interval = interval
+        self.at_midnight = at_midnight
+        self._stop = threading.Event()
+        self._thread = None
+        self._refresh_lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
+        self.last_seconds = None
+        self.last_refresh = None
+        self.last_error = None
+        self.next_refresh = None
+
+    def next_due(self, now):
+        """
+        Moment of the next scheduled refresh after ``now``, None if none
+        """
+        due = []
+        if self.interval > 0:
+            due.append(now + timedelta(seconds=self.interval))
+        if self.at_midnight:
+            midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+            due.append(midnight + MIDNIGHT_GRACE)
+        return min(due) if due else None
+
+    def refresh_now(self):
+        """
+        Build a new value and swap it in, logging instead of raising on failure
+
+        Returns:
+            bool: True if the new value was published
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            try:
+                value = self.build()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logging.error(f"Error refreshing {self.resource.name}: {e}")
+                return False
+            self.resource.set(value)
+            self.last_seconds = time.perf_counter() - started
+            self.last_refresh = datetime.now()
+            self.last_error = None
+            self.refreshes += 1
+            logging.info(f"Refreshed {self.resource.name} in {self.last_seconds:.3f}s.")
+            return True
+
+    def _run(self):
+        while True:
+            self.next_refresh = self.next_due(datetime.now())
+            if self.next_refresh is None:
+                return
+            timeout = max(0.0, (self.next_refresh - datetime.now()).total_seconds())
+            if self._stop.wait(timeout):
+                return
+            self.refresh_now()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"refresh-{self.resource.name}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def metrics(self):
+        return {
+            "interval_seconds": self.interval,
+            "at_midnight": self.at_midnight,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_refresh_seconds": self.last_seconds,
+            "last_refresh_at": self.last_refresh.isoformat() if self.last_refresh else None,
+            "last_error": self.last_error,
+            "next_refresh_at": self.next_refresh.isoformat() if self.next_refresh else None,
+        }
@@ -0,0 +1,82 @@
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+from feature_encoders import ENCODERS_PATH, FeatureEncoder, raw_features
+from model_serving import MODEL_PATH, RISK_THRESHOLD, SCALER_PATH, load_model
+from storage import csv_dtypes
+
+
+# Columns of the crime CSV read for scoring
+SCORING_COLUMNS = [
+    "DR_NO", "AREA", "Crm Cd", "Vict Sex", "Vict Descent", "Weapon Desc",
+    "Status Desc", "DATE OCC",
+]
+
+
+def score_csv(csv_path, out_path, model_path=MODEL_PATH, scaler_path=SCALER_PATH,
+              encoders_path=ENCODERS_PATH, chunksize=500_000):
+    """
+    Score every record of a crime CSV with the model, offline
+
+    Records are encoded with the same fitted FeatureEncoder that training
+    and the API use. Rows without AREA, Crm Cd or a parseable DATE OCC
+    cannot be scored and are skipped.
+
+    Args:
+        csv_path (str): Crime dataset CSV
+        out_path (str): Destination CSV of DR_NO, Probability and Risk
+        model_path (str): Model to score with
+        scaler_path (str): Its feature scaler
+        encoders_path (str): Its fitted feature encoders
+        chunksize (int): Rows scored per chunk, bounds peak memory
+
+    Returns:
+        dict: Counts of scored and skipped rows
+    """
+    model = load_model(model_path, scaler_path)
+    encoder = FeatureEncoder.load(encoders_path)
+    scored = skipped = 0
+    header = True
+    for chunk in pd.read_csv(
+        csv_path, usecols=SCORING_COLUMNS, dtype=csv_dtypes(SCORING_COLUMNS), chunksize=chunksize
+    ):
+        features = raw_features(chunk)
+        valid = features[["AREA", "Crm Cd", "year"]].notna().all(axis=1)
+        features = features[valid]
+        probabilities = model.predict(encoder.transform(features))
+        pd.DataFrame(
+            {
+                "DR_NO": chunk.loc[features.index, "DR_NO"],
+                "Probability": probabilities,
+                "Risk": np.where(probabilities >= RISK_THRESHOLD, "High", "Low"),
+            }
+        ).to_csv(out_path, mode="w" if header else "a", header=header, index=False)
+        header = False
+        scored += len(features)
+        skipped += int((~valid).sum())
+        logging.info(f"Scored {scored} records from {csv_path}.")
+    return {"scored": scored, "skipped": skipped}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Score the records of a crime CSV with the hotspot model."
+    )
+    parser.add_argument("csv_path")
+    parser.add_argument("out_path")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--scaler-path", default=SCALER_PATH)
+    parser.add_argument("--encoders-path", default=ENCODERS_PATH)
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    args = parser.parse_args()
+    counts = score_csv(
+        args.csv_path, args.out_path, args.model_path, args.scaler_path,
+        args.encoders_path, args.chunksize,
+    )
+    logging.info(f"Wrote {counts['scored']} scores to {args.out_path}; skipped {counts['skipped']} rows.")
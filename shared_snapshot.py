@@ -0,0 +1,235 @@
+import argparse
+import logging
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+
+from prediction_store import PredictionStore
+
+
+# Directory of published prediction snapshots; when set, app.py workers attach
+# to the snapshot named by <CRPS_SHARED_DIR>/current instead of generating one
+SHARED_DIR = os.environ.get("CRPS_SHARED_DIR")
+
+# Seconds between a worker's checks of the current snapshot version
+POLL_INTERVAL = float(os.environ.get("CRPS_SHARED_POLL_SECONDS", "1"))
+
+# Published versions kept on disk, so workers still reading an older one
+# can finish before it is removed
+KEEP_VERSIONS = 3
+
+JSON_FILE = "high_risk_data.json"
+
+
+def current_version(root):
+    """
+    Version named by ``<root>/current``, None before the first publish
+    """
+    try:
+        with open(os.path.join(root, "current")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def publish(high_risk_json, store, root):
+    """
+    Write a prediction snapshot and make it the current version
+
+    The JSON and the store's columns go to ``<root>/<version>/``, then
+    ``<root>/current`` is replaced in one rename, so a worker sees either
+    the previous version or the complete new one.
+
+    Args:
+        high_risk_json (str): Predictions JSON from ``get_prediction``
+        store (PredictionStore): Store built from that JSON
+        root (str): Snapshot directory
+
+    Returns:
+        str: The published version
+    """
+    version_dir = os.path.join(root, store.version)
+    if not os.path.exists(version_dir):
+        staging = f"{version_dir}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        store.save(staging)
+        with open(os.path.join(staging, JSON_FILE), "w") as f:
+            f.write(high_risk_json)
+        os.replace(staging, version_dir)
+
+    current = os.path.join(root, "current")
+    with open(f"{current}.tmp", "w") as f:
+        f.write(store.version)
+    os.replace(f"{current}.tmp", current)
+    prune(root, keep=store.version)
+    logging.info(f"Published prediction snapshot {store.version} to {root}.")
+    return store.version
+
+
+def prune(root, keep):
+    """
+    Remove all but the newest KEEP_VERSIONS snapshots, never ``keep``
+    """
+    versions = [
+        entry for entry in os.scandir(root)
+        if entry.is_dir() and not entry.name.endswith(".tmp") and entry.name != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def attach(root):
+    """
+    Open the current snapshot without copying it
+
+    The store's columns are memory-mapped read-only, so every worker
+    attached to a version shares one copy of it in the page cache.
+
+    Returns:
+        tuple: None in place of the predictions JSON, which is read from
+        ``store.path`` only when asked for, and the PredictionStore
+    """
+    version = current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No prediction snapshot has been published to {root}.")
+    return None, PredictionStore.load(os.path.join(root, version))
+
+
+def read_json(store):
+    """
+    Predictions JSON of an attached snapshot
+    """
+    with open(os.path.join(store.path, JSON_FILE)) as f:
+        return f.read()
+
+
+class SnapshotWatcher:
+    """
+    Follows the published version in a background thread
+
+    Every ``interval`` seconds the current version is read, a few bytes,
+    and when it differs from the loaded store's the new snapshot is
+    attached and swapped in with ``LazyResource.set``.
+    """
+
+    def __init__(self, resource, root, interval=POLL_INTERVAL):
+        self.resource = resource
+        self.root = root
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """
+        Attach the current version if it is newer than the loaded one
+
+        Returns:
+            bool: True if a new version was swapped in
+        """
+        if not self.resource.loaded:
+            return False
+        try:
+            version = current_version(self.root)
+            if version is None or version == self.resource.get()[1].version:
+                return False
+            self.resource.set(attach(self.root))
+        except Exception as e:
+            logging.error(f"Error attaching prediction snapshot from {self.root}: {e}")
+            return False
+        logging.info(f"Attached prediction snapshot {version}.")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def serve(args):
+    """
+    Publish the predictions, then run uvicorn workers attached to them
+
+    Predictions are generated here, once, and republished every
+    ``--refresh-interval`` seconds and just after midnight; workers pick
+    up each new version within CRPS_SHARED_POLL_SECONDS.
+    """
+    from predictions import get_prediction, area_mapping, crime_code_mapping
+    from resources import LazyResource
+    from scheduler import RefreshScheduler
+
+    root = os.path.abspath(args.shared_dir)
+    os.makedirs(root, exist_ok=True)
+
+    def build():
+        high_risk_json = get_prediction(horizon_days=args.horizon_days, grid=args.grid)
+        store = PredictionStore.from_json(high_risk_json, area_mapping, crime_code_mapping)
+        return publish(high_risk_json, store, root)
+
+    published = LazyResource("shared predictions", build)
+    published.get()
+    refresher = RefreshScheduler(
+        published, build, interval=args.refresh_interval, at_midnight=args.at_midnight
+    )
+    refresher.start()
+
+    env = dict(
+        os.environ,
+        CRPS_SHARED_DIR=root,
+        CRPS_SHARED_POLL_SECONDS=str(args.poll_interval),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", args.host,
+         "--port", str(args.port), "--workers", str(args.workers)],
+        env=env,
+    )
+    # uvicorn shuts its workers down on SIGTERM; pass ours on
+    signal.signal(signal.SIGTERM, lambda *_: server.send_signal(signal.SIGTERM))
+    try:
+        return server.wait()
+    except KeyboardInterrupt:
+        server.send_signal(signal.SIGTERM)
+        return server.wait()
+    finally:
+        refresher.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Serve app.py from several uvicorn workers that share one "
+        "published prediction snapshot instead of each generating their own."
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--shared-dir", default=SHARED_DIR or "shared_predictions")
+    parser.add_argument("--refresh-interval", type=float,
+                        default=float(os.environ.get("CRPS_REFRESH_INTERVAL", "0")),
+                        help="seconds between republishes, 0 for midnight only")
+    parser.add_argument("--no-midnight", dest="at_midnight", action="store_false",
+                        help="do not republish just after midnight")
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL,
+                        help="seconds between the workers' version checks")
+    parser.add_argument("--horizon-days", type=int, help="days of predictions to generate")
+    parser.add_argument("--grid", action="store_true",
+                        help="score every AREA and crime code for each day")
+    args = parser.parse_args()
+    sys.exit(serve(args))
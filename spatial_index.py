@@ -0,0 +1,284 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+from storage import open_store
+
+
+# Cells are slippy-map tiles (the Google Maps tiling) at these levels
+MIN_LEVEL = 8
+MAX_LEVEL = 18
+
+# A query at map zoom z is answered with level z + CELL_DETAIL cells, i.e. an
+# 8 x 8 grid per 256px map tile
+CELL_DETAIL = 3
+
+# Most cells a viewport may span; wider viewports are answered with coarser
+# cells. 4096 is a 64 x 64 grid, enough for a 2560 x 1600 screen at full detail
+MAX_VIEWPORT_TILES = 4096
+
+# Latitude limit of the Web Mercator projection
+MAX_LATITUDE = 85.05112878
+
+# Cells a level's delta may hold before it is folded into the level's base
+# arrays; below this a new report costs a merge into the delta only
+DELTA_MAX_CELLS = 4096
+
+# Dataset columns the index is built from
+SPATIAL_COLUMNS = ["LAT", "LON"]
+
+
+def tile_xy(lat, lon, level):
+    """
+    Web Mercator tile coordinates of points at a zoom level
+
+    Returns:
+        tuple: int64 arrays of tile columns (x, west to east) and rows
+        (y, north to south)
+    """
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_LATITUDE, MAX_LATITUDE))
+    lon = np.asarray(lon, dtype=np.float64)
+    n = 1 << level
+    x = np.floor((lon + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x, y, level):
+    """
+    South, west, north and east edges in degrees of tiles at a zoom level
+    """
+    n = 1 << level
+    west = np.asarray(x) / n * 360.0 - 180.0
+    east = (np.asarray(x) + 1) / n * 360.0 - 180.0
+    north = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y) / n))))
+    south = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (np.asarray(y) + 1) / n))))
+    return south, west, north, east
+
+
+def _merge_counts(keys, counts, new_keys, new_counts):
+    """
+    Add sorted, unique cell keys and counts into another such pair of arrays
+
+    Returns:
+        tuple: New sorted key and count arrays; the inputs are not modified
+    """
+    pos = np.searchsorted(keys, new_keys)
+    found = pos < len(keys)
+    found[found] = keys[pos[found]] == new_keys[found]
+    counts = counts.copy()
+    counts[pos[found]] += new_counts[found]
+    return (
+        np.insert(keys, pos[~found], new_keys[~found]),
+        np.insert(counts, pos[~found], new_counts[~found]),
+    )
+
+
+def located(lat, lon):
+    """
+    Mask of usable coordinates; the dataset records unknown locations as 0, 0
+    """
+    return (
+        np.isfinite(lat) & np.isfinite(lon)
+        & ~((lat == 0) & (lon == 0))
+        & (np.abs(lat) <= MAX_LATITUDE) & (np.abs(lon) <= 180)
+    )
+
+
+class SpatialIndex:
+    """
+    Crime counts per map cell at every zoom level, for viewport queries
+
+    Each level holds the sorted keys (``x << level | y``) of its non-empty
+    cells and their counts. A viewport is answered with one binary search
+    per column of cells it spans, so its cost depends on the cells shown
+    and not on the number of records. New records are counted into a
+    pending buffer, which the next query merges into a small sorted delta
+    per level; a delta is folded into its level's base arrays only once it
+    holds DELTA_MAX_CELLS cells, so steady reporting does not rewrite the
+    base arrays on every query. Queries read the base and the delta.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        empty = np.empty(0, dtype=np.int64)
+        # Per level: base keys and counts, then delta keys and counts
+        self._levels = {
+            level: (empty, empty, empty, empty) for level in range(MIN_LEVEL, MAX_LEVEL + 1)
+        }
+        self._medians = {}
+        self._pending = []
+        self.records = 0
+
+    def add_points(self, lat, lon):
+        """
+        Count crimes at arrays of coordinates, skipping unlocated ones
+        """
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        mask = located(lat, lon)
+        x, y = tile_xy(lat[mask], lon[mask], MAX_LEVEL)
+        with self._lock:
+            self._pending.append((x, y))
+            self.records += int(mask.sum())
+
+    def add(self, record):
+        """
+        Count one crime record
+
+        Args:
+            record (dict): Row keyed by dataset column names
+        """
+        lat, lon = record.get("LAT"), record.get("LON")
+        if lat in (None, "") or lon in (None, ""):
+            return
+        self.add_points([float(lat)], [float(lon)])
+
+    def add_frame(self, df):
+        """
+        Count every located row of a DataFrame of crime records
+        """
+        if not set(SPATIAL_COLUMNS) <= set(df.columns):
+            return
+        # Empty cells of freshly reported rows become NaN
+        self.add_points(
+            pd.to_numeric(df["LAT"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan),
+            pd.to_numeric(df["LON"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan),
+        )
+
+    @classmethod
+    def rebuild(cls, paths):
+        """
+        Build the index from scratch out of the stored datasets
+
+        Args:
+            paths (list): Crime dataset paths, read through ``open_store``
+
+        Returns:
+            SpatialIndex: Index over every stored, located record
+        """
+        index = cls()
+        for path in paths:
+            store = open_store(path)
+            if not set(SPATIAL_COLUMNS) <= set(store.columns()):
+                continue
+            index.add_frame(store.read(columns=SPATIAL_COLUMNS))
+            logging.info(f"Indexed crime locations from {path}.")
+        index._merge(compact=True)
+        return index
+
+    def _merge(self, compact=False):
+        """
+        Merge pending records into the deltas, and deltas past
+        DELTA_MAX_CELLS (or all of them if ``compact``) into the base arrays
+        """
+        with self._lock:
+            if not self._pending and not compact:
+                return
+            x = np.concatenate([x for x, _ in self._pending] or [np.empty(0, dtype=np.int64)])
+            y = np.concatenate([y for _, y in self._pending] or [np.empty(0, dtype=np.int64)])
+            self._pending = []
+            levels = {}
+            for level, (keys, counts, delta_keys, delta_counts) in self._levels.items():
+                shift = MAX_LEVEL - level
+                new_keys, new_counts = np.unique(
+                    ((x >> shift) << level) | (y >> shift), return_counts=True
+                )
+                delta_keys, delta_counts = _merge_counts(
+                    delta_keys, delta_counts, new_keys, new_counts
+                )
+                if compact or len(delta_keys) > DELTA_MAX_CELLS:
+                    keys, counts = _merge_counts(keys, counts, delta_keys, delta_counts)
+                    delta_keys, delta_counts = delta_keys[:0], delta_counts[:0]
+                # Arrays are replaced rather than updated, and a level is one
+                # tuple, so queries can read it without holding the lock
+                levels[level] = (keys, counts, delta_keys, delta_counts)
+            self._levels = levels
+
+    def _median(self, level, counts):
+        # Of the base counts only, so it lags reports still in the delta by
+        # at most DELTA_MAX_CELLS cells. Cached per counts array, so a merge
+        # mid-query cannot mix levels
+        cached = self._medians.get(level)
+        if cached is None or cached[0] is not counts:
+            cached = self._medians[level] = (
+                counts, float(np.median(counts)) if len(counts) else 0.0
+            )
+        return cached[1]
+
+    def query(self, south, west, north, east, zoom, max_tiles=MAX_VIEWPORT_TILES):
+        """
+        Cells of a map viewport with their crime counts and risk
+
+        Cells with more crimes than the median non-empty cell of their
+        level are high risk, the split the risky-areas chart uses. A
+        viewport spanning more than ``max_tiles`` cells of its zoom's level
+        is answered one level coarser at a time until it fits (or
+        MIN_LEVEL is reached), which bounds the size of the response.
+
+        Args:
+            south, west, north, east (float): Viewport edges in degrees
+            zoom (int): Map zoom level
+            max_tiles (int): Most cells the viewport may span
+
+        Returns:
+            dict: The cell level and, per non-empty cell, its id, center,
+            bounds, count and risk
+        """
+        self._merge()
+        level = int(min(max(zoom + CELL_DETAIL, MIN_LEVEL), MAX_LEVEL))
+        while True:
+            (x0, x1), (y0, y1) = tile_xy([north, south], [west, east], level)
+            if level == MIN_LEVEL or (x1 - x0 + 1) * (y1 - y0 + 1) <= max_tiles:
+                break
+            level -= 1
+        keys, counts, delta_keys, delta_counts = self._levels[level]
+        median = self._median(level, counts)
+
+        columns = np.arange(x0, x1 + 1, dtype=np.int64) << level
+        hits = _viewport_hits(keys, columns, y0, y1)
+        cell_keys, cell_counts = keys[hits], counts[hits]
+        delta_hits = _viewport_hits(delta_keys, columns, y0, y1)
+        if len(delta_hits):
+            cell_keys, inverse = np.unique(
+                np.concatenate([cell_keys, delta_keys[delta_hits]]), return_inverse=True
+            )
+            cell_counts = np.bincount(
+                inverse, weights=np.concatenate([cell_counts, delta_counts[delta_hits]])
+            ).astype(np.int64)
+        x, y = cell_keys >> level, cell_keys & ((1 << level) - 1)
+        s, w, n, e = tile_bounds(x, y, level)
+        cells = [
+            {
+                "cell": f"{level}/{cx}/{cy}",
+                "lat": (cs + cn) / 2,
+                "lon": (cw + ce) / 2,
+                "bounds": [cs, cw, cn, ce],
+                "count": count,
+                "risk": "High" if count > median else "Low",
+            }
+            for cx, cy, cs, cw, cn, ce, count in zip(
+                x.tolist(), y.tolist(), s.tolist(), w.tolist(), n.tolist(), e.tolist(),
+                cell_counts.tolist(),
+            )
+        ]
+        return {"zoom": zoom, "level": level, "total": int(cell_counts.sum()), "cells": cells}
+
+    def stats(self):
+        self._merge(compact=True)
+        return {
+            "records": self.records,
+            "cells": {level: len(keys) for level, (keys, *_) in self._levels.items()},
+        }
+
+
+def _viewport_hits(keys, columns, y0, y1):
+    """
+    Positions in sorted cell ``keys`` of the cells in rows ``y0..y1`` of ``columns``
+    """
+    starts = np.searchsorted(keys, columns | y0)
+    ends = np.searchsorted(keys, columns | y1, side="right")
+    lengths = ends - starts
+    return np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
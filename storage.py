@@ -0,0 +1,426 @@
+import argparse
+import io
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from ingestion import CSV_COLUMNS, FileLock
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # Parquet storage is optional
+    pa = None
+    ds = None
+
+
+# Typed schema of the crime dataset (CrimeRecord columns)
+INT_COLUMNS = [
+    "DR_NO", "TIME OCC", "AREA", "Rpt Dist No", "Part 1-2", "Crm Cd",
+    "Vict Age", "Premis Cd", "Crm Cd 1", "Crm Cd 2", "Crm Cd 3", "Crm Cd 4",
+]
+FLOAT_COLUMNS = ["LAT", "LON"]
+CATEGORY_COLUMNS = [
+    "AREA NAME", "Crm Cd Desc", "Vict Sex", "Vict Descent", "Premis Desc",
+    "Weapon Desc", "Status", "Status Desc",
+]
+STRING_COLUMNS = [
+    "Date Rptd", "DATE OCC", "Mocodes", "Weapon Used Cd", "LOCATION", "Cross Street",
+]
+
+# Columns derived from DATE OCC that the columnar store is partitioned by
+PARTITION_COLUMNS = ["year", "month"]
+
+DATE_OCC_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+# Written into the Parquet store by ``convert_csv``; pyarrow skips files
+# starting with "_" when reading the dataset
+CONVERSION_FILE = "_converted.json"
+
+
+def csv_dtypes(columns=None):
+    """
+    pandas dtypes for reading the crime CSV
+
+    Args:
+        columns (list): Restrict the mapping to these columns
+
+    Returns:
+        dict: Column name to dtype
+    """
+    dtypes = {}
+    dtypes.update({col: "Int64" for col in INT_COLUMNS})
+    dtypes.update({col: "float64" for col in FLOAT_COLUMNS})
+    dtypes.update({col: "category" for col in CATEGORY_COLUMNS})
+    dtypes.update({col: "string" for col in STRING_COLUMNS})
+    if columns is not None:
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in columns}
+    return dtypes
+
+
+def arrow_schema():
+    """
+    Arrow schema of the columnar store, partition columns included
+    """
+    fields = []
+    for col in CSV_COLUMNS:
+        if col in INT_COLUMNS:
+            fields.append(pa.field(col, pa.int64()))
+        elif col in FLOAT_COLUMNS:
+            fields.append(pa.field(col, pa.float64()))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    fields += [pa.field(col, pa.int16()) for col in PARTITION_COLUMNS]
+    return pa.schema(fields)
+
+
+def parse_date_occ(value):
+    """
+    Parse a single DATE OCC value
+
+    Args:
+        value (str): Date in the LA extract layout or any layout pandas infers
+
+    Returns:
+        datetime: Parsed date, or None if it cannot be parsed
+    """
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, DATE_OCC_FORMAT)
+    except (TypeError, ValueError):
+        parsed = pd.to_datetime(value, errors="coerce")
+        return None if pd.isna(parsed) else parsed.to_pydatetime()
+
+
+def parse_dates_occ(values):
+    """
+    Parse a Series of DATE OCC values, vectorized
+
+    Returns:
+        Series: Datetimes, NaT where a value cannot be parsed
+    """
+    occurred = pd.to_datetime(values, format=DATE_OCC_FORMAT, errors="coerce")
+    if occurred.isna().any():
+        # Fall back to format inference for rows in other date layouts
+        missing = occurred.isna() & values.notna()
+        if missing.any():
+            occurred[missing] = pd.to_datetime(values[missing], errors="coerce")
+    return occurred
+
+
+def add_partition_columns(df):
+    """
+    Add the year/month partition columns parsed from DATE OCC
+    """
+    if "DATE OCC" not in df:
+        df["year"] = pd.Series(pd.NA, index=df.index, dtype="Int16")
+        df["month"] = pd.Series(pd.NA, index=df.index, dtype="Int16")
+        return df
+    occurred = parse_dates_occ(df["DATE OCC"])
+    df["year"] = occurred.dt.year.astype("Int16")
+    df["month"] = occurred.dt.month.astype("Int16")
+    return df
+
+
+def _apply_filters(df, filters):
+    """
+    Evaluate ``(column, op, value)`` filters on a DataFrame
+    """
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters or []:
+        series = df[col]
+        if op == "==":
+            mask &= series == value
+        elif op == "!=":
+            mask &= series != value
+        elif op == "<":
+            mask &= series < value
+        elif op == "<=":
+            mask &= series <= value
+        elif op == ">":
+            mask &= series > value
+        elif op == ">=":
+            mask &= series >= value
+        elif op == "in":
+            mask &= series.isin(value)
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return df[mask.fillna(False)]
+
+
+def _filter_expression(filters):
+    """
+    Convert ``(column, op, value)`` filters to a pyarrow dataset expression
+    """
+    expression = None
+    for col, op, value in filters or []:
+        field = ds.field(col)
+        if op == "==":
+            term = field == value
+        elif op == "!=":
+            term = field != value
+        elif op == "<":
+            term = field < value
+        elif op == "<=":
+            term = field <= value
+        elif op == ">":
+            term = field > value
+        elif op == ">=":
+            term = field >= value
+        elif op == "in":
+            term = field.isin(list(value))
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        expression = term if expression is None else expression & term
+    return expression
+
+
+class CsvStore:
+    """
+    Crime dataset kept as a single CSV file
+
+    Reads only the requested columns with explicit dtypes. Filters are
+    applied after parsing, so every row is still scanned.
+    """
+
+    def __init__(self, path, offset=0):
+        """
+        Args:
+            path (str): CSV file
+            offset (int): Byte offset of the first row to read; rows before
+                it are skipped without being parsed
+        """
+        self.path = path
+        self.offset = offset
+
+    def _source(self):
+        if not self.offset:
+            return self.path
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            f.seek(self.offset)
+            return io.BytesIO(header + f.read())
+
+    def columns(self):
+        """
+        Columns present in the file, empty if it does not exist yet
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return []
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def read(self, columns=None, filters=None):
+        """
+        Load the dataset
+
+        Args:
+            columns (list): Columns to return, all columns if None
+            filters (list): ``(column, op, value)`` row filters, ANDed
+
+        Returns:
+            DataFrame: Matching rows
+        """
+        needed = None
+        if columns is not None:
+            needed = list(dict.fromkeys(list(columns) + [f[0] for f in filters or []]))
+        derive_partitions = needed is not None and any(
+            col in PARTITION_COLUMNS for col in needed
+        )
+        usecols = needed
+        if derive_partitions:
+            usecols = [col for col in needed if col not in PARTITION_COLUMNS]
+            usecols = list(dict.fromkeys(usecols + ["DATE OCC"]))
+
+        df = pd.read_csv(self._source(), usecols=usecols, dtype=csv_dtypes(usecols))
+        if derive_partitions or (needed is None and filters):
+            df = add_partition_columns(df)
+        df = _apply_filters(df, filters)
+        return df if columns is None else df[list(columns)]
+
+
+class ParquetStore:
+    """
+    Crime dataset kept as Parquet files partitioned by year/month of DATE OCC
+
+    Only the requested columns are decoded, and filters are pushed down to
+    skip whole partitions and row groups. Rows appended to the source CSV
+    after the conversion are read from ``csv_tail`` and added to the result.
+    """
+
+    def __init__(self, path, csv_tail=None):
+        """
+        Args:
+            path (str): Parquet store directory
+            csv_tail (CsvStore): Rows of the source CSV added since conversion
+        """
+        if pa is None:
+            raise ImportError("pyarrow is required for Parquet crime storage.")
+        self.path = path
+        self.csv_tail = csv_tail
+
+    def columns(self):
+        """
+        Columns of the store schema, partition columns included
+        """
+        return arrow_schema().names
+
+    def _dataset(self):
+        return ds.dataset(
+            self.path,
+            format="parquet",
+            schema=arrow_schema(),
+            partitioning=ds.partitioning(
+                pa.schema([pa.field(col, pa.int16()) for col in PARTITION_COLUMNS]),
+                flavor="hive",
+            ),
+        )
+
+    def read(self, columns=None, filters=None):
+        """
+        Load the dataset
+
+        Args:
+            columns (list): Columns to return, all columns if None
+            filters (list): ``(column, op, value)`` row filters, ANDed
+
+        Returns:
+            DataFrame: Matching rows
+        """
+        if not os.path.isdir(self.path):
+            return pd.DataFrame(columns=columns or CSV_COLUMNS)
+        table = self._dataset().to_table(
+            columns=None if columns is None else list(columns),
+            filter=_filter_expression(filters),
+        )
+        df = table.to_pandas()
+        if self.csv_tail is not None:
+            tail = self.csv_tail.read(columns, filters)
+            if len(tail):
+                if columns is None:
+                    tail = add_partition_columns(tail).reindex(columns=df.columns)
+                df = pd.concat([df, tail], ignore_index=True)
+        for col in df.columns:
+            if col in CATEGORY_COLUMNS:
+                df[col] = df[col].astype("category")
+            elif col in INT_COLUMNS or col in PARTITION_COLUMNS:
+                df[col] = df[col].astype("Int64")
+            elif col in FLOAT_COLUMNS:
+                df[col] = df[col].astype("float64")
+        return df
+
+    def append(self, df):
+        """
+        Write rows as new Parquet files in their year/month partitions
+        """
+        df = add_partition_columns(df.reindex(columns=CSV_COLUMNS))
+        for col in CATEGORY_COLUMNS + STRING_COLUMNS:
+            df[col] = df[col].astype("string")
+        table = pa.Table.from_pandas(df, schema=arrow_schema(), preserve_index=False)
+        ds.write_dataset(
+            table,
+            self.path,
+            format="parquet",
+            partitioning=PARTITION_COLUMNS,
+            partitioning_flavor="hive",
+            basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+
+
+def parquet_path(csv_path):
+    """
+    Location of the columnar copy of a crime CSV
+    """
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+
+def open_store(csv_path):
+    """
+    Pick the storage backend for a crime dataset
+
+    The Parquet copy made by ``convert_csv`` is used when it exists and
+    pyarrow is installed, together with the rows appended to the CSV since
+    the conversion, which is still where new records are written; otherwise
+    the CSV itself is read. CRIME_STORAGE=csv forces the CSV backend.
+
+    Args:
+        csv_path (str): Path of the CSV dataset
+
+    Returns:
+        CsvStore or ParquetStore: Storage backend
+    """
+    columnar = parquet_path(csv_path)
+    backend = os.environ.get("CRIME_STORAGE", "auto")
+    if backend != "csv" and pa is not None and os.path.isdir(columnar):
+        if not os.path.exists(csv_path):
+            return ParquetStore(columnar)
+        try:
+            with open(os.path.join(columnar, CONVERSION_FILE)) as f:
+                converted_bytes = json.load(f)["csv_bytes"]
+        except FileNotFoundError:
+            converted_bytes = None
+        if converted_bytes is not None and converted_bytes <= os.path.getsize(csv_path):
+            return ParquetStore(columnar, CsvStore(csv_path, converted_bytes))
+        # Which CSV rows the copy holds is unknown, so the copy cannot be used
+        logging.warning(
+            f"{columnar} does not match {csv_path}; reading the CSV. "
+            f"Remove it and convert the CSV again."
+        )
+        return CsvStore(csv_path)
+    if backend == "parquet":
+        logging.warning(f"No Parquet copy of {csv_path} available, reading the CSV.")
+    return CsvStore(csv_path)
+
+
+def convert_csv(csv_path, out_path=None, chunksize=500_000):
+    """
+    One-time conversion of a crime CSV into the partitioned Parquet store
+
+    The CSV is read under the dataset lock its writers append under, and the
+    converted size is recorded in the store, so ``open_store`` reads rows
+    appended later from the CSV.
+
+    Args:
+        csv_path (str): Source CSV
+        out_path (str): Destination directory, next to the CSV by default
+        chunksize (int): Rows parsed per chunk, bounds peak memory
+
+    Returns:
+        int: Number of rows converted
+    """
+    out_path = out_path or parquet_path(csv_path)
+    store = ParquetStore(out_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [col for col in CSV_COLUMNS if col in header]
+    total = 0
+    with FileLock(f"{csv_path}.lock"):
+        converted_bytes = os.path.getsize(csv_path)
+        for chunk in pd.read_csv(
+            csv_path, usecols=usecols, dtype=csv_dtypes(usecols), chunksize=chunksize
+        ):
+            store.append(chunk)
+            total += len(chunk)
+            logging.info(f"Converted {total} rows of {csv_path}.")
+    os.makedirs(out_path, exist_ok=True)
+    with open(os.path.join(out_path, CONVERSION_FILE), "w") as f:
+        json.dump({"csv_bytes": converted_bytes, "rows": total}, f)
+    return total
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Convert a crime CSV to partitioned Parquet."
+    )
+    parser.add_argument("csv_path")
+    parser.add_argument("out_path", nargs="?")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    args = parser.parse_args()
+    convert_csv(args.csv_path, args.out_path, args.chunksize)
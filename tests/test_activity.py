@@ -0,0 +1,201 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+import activity
+from activity import ActivityCounters, SnapshotWriter
+from ingestion import CSV_COLUMNS, CsvAppender
+
+
+TODAY = date(2026, 3, 10)
+
+
+class FrozenDate(date):
+    today_value = TODAY
+
+    @classmethod
+    def today(cls):
+        return cls.today_value
+
+
+@pytest.fixture(autouse=True)
+def frozen_today(monkeypatch):
+    FrozenDate.today_value = TODAY
+    monkeypatch.setattr(activity, "date", FrozenDate)
+    return FrozenDate
+
+
+def days_ago(n):
+    return (TODAY - timedelta(days=n)).toordinal()
+
+
+def add(counters, *records):
+    days, areas, codes = zip(*records)
+    counters.add_counts(list(days), list(areas), list(codes))
+
+
+def test_window_counts():
+    counters = ActivityCounters(history_days=7)
+    add(counters, (days_ago(0), 1, 310), (days_ago(0), 1, 310), (days_ago(2), 1, 510), (days_ago(6), 2, 310))
+
+    assert counters.window_counts(1, area=1, crm_cd=310).tolist() == [[2]]
+    assert counters.window_counts(3, area=1).sum() == 3
+    assert counters.window_counts(7).sum() == 4
+    assert counters.window_counts(2, end=TODAY - timedelta(days=1)).sum() == 1
+    assert counters.dropped == 0
+
+
+def test_records_outside_the_window_or_ranges_are_dropped():
+    counters = ActivityCounters(history_days=7)
+    add(
+        counters,
+        (days_ago(7), 1, 310),      # a day before the window
+        (days_ago(-1), 1, 310),     # tomorrow
+        (days_ago(0), 0, 310),
+        (days_ago(0), 1, 999),
+        (days_ago(0), np.nan, 310),
+        (days_ago(0), 1, 310),
+    )
+
+    assert counters.window_counts(7).sum() == 1
+    assert counters.dropped == 5
+
+
+def test_add_records_by_area_name():
+    counters = ActivityCounters(history_days=7)
+    counters.add({"DATE OCC": "03/09/2026 12:00:00 AM", "AREA NAME": "Rampart", "Crm Cd": "310"})
+    counters.add({"DATE OCC": "03/09/2026 12:00:00 AM", "AREA": "", "Crm Cd": "310"})
+    counters.add({"DATE OCC": "not a date", "AREA": "2", "Crm Cd": "310"})
+
+    assert counters.window_counts(2, area=2, crm_cd=310).tolist() == [[1]]
+    assert counters.dropped == 2
+
+
+def test_days_leaving_the_window_are_zeroed(frozen_today):
+    counters = ActivityCounters(history_days=7)
+    add(counters, (days_ago(0), 1, 310), (days_ago(3), 1, 310))
+
+    frozen_today.today_value = TODAY + timedelta(days=4)
+    assert counters.window_counts(7).sum() == 1
+    # The slot of the day that left is reused empty
+    add(counters, (frozen_today.today_value.toordinal(), 2, 510))
+    assert counters.window_counts(1).sum() == 1
+    assert counters.window_counts(7).sum() == 2
+
+    frozen_today.today_value = TODAY + timedelta(days=30)
+    assert counters.window_counts(7).sum() == 0
+    assert counters.stats()["last_day"] == frozen_today.today_value.isoformat()
+
+
+def test_query():
+    counters = ActivityCounters(history_days=7)
+    add(counters, (days_ago(0), 1, 310), (days_ago(1), 1, 510), (days_ago(1), 2, 310), (days_ago(5), 1, 310))
+
+    result = counters.query([1, 2, 7], area=1)
+    assert [(w["days"], w["total"], w["by_crm_cd"]) for w in result["windows"]] == [
+        (1, 1, {310: 1}),
+        (2, 2, {310: 1, 510: 1}),
+        (7, 3, {310: 2, 510: 1}),
+    ]
+    assert result["windows"][1]["start"] == (TODAY - timedelta(days=1)).isoformat()
+
+    by_area = counters.query([2], crm_cd=310)["windows"][0]
+    assert by_area["by_area"] == {1: 1, 2: 1}
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"windows": [8]},
+    {"windows": [0]},
+    {"windows": [1], "end": TODAY + timedelta(days=1)},
+    {"windows": [1], "area": 22},
+    {"windows": [1], "crm_cd": 100},
+])
+def test_query_errors(kwargs):
+    with pytest.raises(ValueError):
+        ActivityCounters(history_days=7).query(**kwargs)
+
+
+def test_snapshot_round_trip(tmp_path, frozen_today):
+    path = str(tmp_path / "activity.npz")
+    counters = ActivityCounters(history_days=7, offsets={"a.csv": 10})
+    add(counters, (days_ago(0), 1, 310), (days_ago(2), 21, 956), (days_ago(2), 21, 956))
+    counters.save(path)
+
+    loaded = ActivityCounters.load(path)
+    np.testing.assert_array_equal(loaded.counts, counters.counts)
+    assert loaded.offsets == {"a.csv": 10}
+    assert loaded.last_day == counters.last_day
+
+    # Days that passed while the snapshot was on disk are zeroed on load
+    frozen_today.today_value = TODAY + timedelta(days=1)
+    assert ActivityCounters.load(path).window_counts(7).sum() == 3
+    frozen_today.today_value = TODAY + timedelta(days=5)
+    assert ActivityCounters.load(path).window_counts(7).sum() == 1
+    frozen_today.today_value = TODAY + timedelta(days=7)
+    assert ActivityCounters.load(path).window_counts(7).sum() == 0
+
+
+def test_counters_without_offsets_are_not_saved(tmp_path):
+    with pytest.raises(ValueError):
+        ActivityCounters(history_days=7).save(str(tmp_path / "activity.npz"))
+
+
+def csv_row(day, area, crm_cd):
+    values = dict.fromkeys(CSV_COLUMNS, "")
+    values.update({
+        "DATE OCC": date.fromordinal(day).strftime("%m/%d/%Y 12:00:00 AM"),
+        "AREA": str(area),
+        "Crm Cd": str(crm_cd),
+    })
+    return [values[col] for col in CSV_COLUMNS]
+
+
+def test_restore_reads_only_rows_after_the_snapshot(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / "dataset.csv")
+    path = str(tmp_path / "activity.npz")
+    CsvAppender(csv_path).append([csv_row(days_ago(1), 1, 310), csv_row(days_ago(2), 2, 510)])
+    ActivityCounters.restore([csv_path], path, history_days=7).save(path)
+
+    CsvAppender(csv_path).append([csv_row(days_ago(0), 1, 310)])
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("restore rebuilt the counters")
+
+    with monkeypatch.context() as m:
+        m.setattr(ActivityCounters, "rebuild", classmethod(no_rebuild))
+        restored = ActivityCounters.restore([csv_path], path, history_days=7)
+
+    rebuilt = ActivityCounters.rebuild([csv_path], history_days=7)
+    np.testing.assert_array_equal(restored.counts, rebuilt.counts)
+    assert restored.window_counts(7).sum() == 3
+    assert restored.offsets == activity.source_offsets([csv_path])
+
+
+def test_restore_rebuilds_when_the_snapshot_does_not_match(tmp_path):
+    csv_path = str(tmp_path / "dataset.csv")
+    path = str(tmp_path / "activity.npz")
+    CsvAppender(csv_path).append([csv_row(days_ago(1), 1, 310)])
+    # A snapshot taken of a longer file than the one now stored
+    stale = ActivityCounters(history_days=7, offsets={csv_path: 10 ** 9})
+    add(stale, (days_ago(0), 5, 310))
+    stale.save(path)
+
+    restored = ActivityCounters.restore([csv_path], path, history_days=7)
+    assert restored.window_counts(7, area=1, crm_cd=310).tolist() == [[1]]
+    assert restored.window_counts(7).sum() == 1
+
+
+def test_one_snapshot_writer_owns_the_snapshot(tmp_path):
+    csv_path = str(tmp_path / "dataset.csv")
+    path = str(tmp_path / "activity.npz")
+    CsvAppender(csv_path).append([csv_row(days_ago(1), 1, 310)])
+    first = SnapshotWriter([csv_path], f"{csv_path}.lock", path, interval=0)
+    second = SnapshotWriter([csv_path], f"{csv_path}.lock", path, interval=0)
+
+    assert first.save()
+    assert not second.save()
+    first.stop()
+    assert second.save()
+    second.stop()
+    assert ActivityCounters.load(path).offsets == activity.source_offsets([csv_path])
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from bulk_import import import_records, read_chunks, validate_chunk
+from storage import CsvStore
+
+
+CSV = (
+    "AREA NAME,Crm Cd Desc,AREA,Crm Cd,LAT,Vict Sex,Extra\n"
+    "Central,BURGLARY,1,310,34.05,M,x\n"
+    "Rampart,VEHICLE - STOLEN,2.0,510,,F,x\n"
+    ",BURGLARY,1,310,34.05,M,x\n"
+    "Central,BURGLARY,one,310,34.05,M,x\n"
+    "Central,BURGLARY,1,310.5,inf,M,x\n"
+    "Harbor,ROBBERY,5,210,33.7,,x\n"
+)
+
+
+def source(text):
+    return io.BytesIO(text.encode())
+
+
+def ndjson(*records):
+    return source("\n".join(json.dumps(record) for record in records) + "\n")
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    return str(tmp_path / "dataset.csv")
+
+
+def test_csv_import_appends_valid_rows_and_reports_the_rest(dataset):
+    report = import_records(source(CSV), "csv", dataset)
+
+    assert (report["rows"], report["imported"], report["rejected"]) == (6, 3, 3)
+    assert report["ignored_columns"] == ["Extra"]
+    assert report["errors"] == [
+        {"row": 3, "column": "AREA NAME", "error": "Field required"},
+        {"row": 4, "column": "AREA", "error": "Input should be a valid integer"},
+        {"row": 5, "column": "Crm Cd", "error": "Input should be a valid integer"},
+        {"row": 5, "column": "LAT", "error": "Input should be a valid number"},
+    ]
+    df = CsvStore(dataset).read(columns=["AREA NAME", "AREA", "Crm Cd", "LAT", "Vict Sex"])
+    assert df["AREA NAME"].astype(str).tolist() == ["Central", "Rampart", "Harbor"]
+    assert df["AREA"].tolist() == [1, 2, 5]
+    assert df["LAT"].isna().tolist() == [False, True, False]
+    assert df["Vict Sex"].isna().tolist() == [False, False, True]
+
+
+def test_ndjson_values_keep_their_json_types(dataset):
+    report = import_records(
+        ndjson(
+            {"AREA_NAME": "Central", "Crm_Cd_Desc": "BURGLARY", "AREA": "1", "Crm_Cd": 310},
+            {"AREA_NAME": "Central", "Crm_Cd_Desc": "BURGLARY", "Vict_Sex": 1},
+            {"AREA_NAME": 7, "Crm_Cd_Desc": "BURGLARY"},
+            {"AREA_NAME": "Rampart", "Crm_Cd_Desc": "ROBBERY", "AREA": None, "LAT": "34.1"},
+        ),
+        "ndjson",
+        dataset,
+    )
+
+    assert (report["imported"], report["rejected"]) == (2, 2)
+    assert [(e["row"], e["column"]) for e in report["errors"]] == [
+        (2, "Vict Sex"), (3, "AREA NAME"),
+    ]
+    df = CsvStore(dataset).read(columns=["AREA NAME", "AREA", "Crm Cd", "LAT"])
+    assert df["AREA"].tolist()[0] == 1
+    assert df["LAT"].tolist()[1] == 34.1
+
+
+def test_row_numbers_continue_across_chunks(dataset):
+    report = import_records(source(CSV), "csv", dataset, chunksize=2, max_errors=3)
+
+    assert report["imported"] == 3
+    assert report["rejected"] == 3
+    assert [(e["row"], e["column"]) for e in report["errors"]] == [
+        (3, "AREA NAME"), (4, "AREA"), (5, "Crm Cd"),
+    ]
+
+
+def test_dry_run_writes_nothing(dataset):
+    report = import_records(source(CSV), "csv", dataset, dry_run=True)
+
+    assert (report["imported"], report["rejected"]) == (0, 3)
+    assert not os.path.exists(dataset)
+
+
+def test_written_chunks_are_passed_on(dataset):
+    chunks = []
+    import_records(source(CSV), "csv", dataset, chunksize=4, on_chunk=chunks.append)
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+
+
+def test_missing_required_columns(dataset):
+    with pytest.raises(ValueError, match="Crm Cd Desc"):
+        import_records(source("AREA NAME,AREA\nCentral,1\n"), "csv", dataset)
+    assert not os.path.exists(dataset)
+
+
+# The over-long row is the first, second and third row of a chunk
+@pytest.mark.parametrize("chunksize, kept", [(6, 3), (5, 2), (4, 2)])
+def test_parse_error_after_written_chunks_says_how_many_rows_were_kept(dataset, chunksize, kept):
+    text = CSV + "Central,BURGLARY,1,310,34.05,M,x,too,many\n"
+
+    with pytest.raises(ValueError, match=f"after {kept} rows"):
+        import_records(source(text), "csv", dataset, chunksize=chunksize)
+    assert len(CsvStore(dataset).read(columns=["AREA NAME"])) == kept
+
+
+def test_unknown_format(dataset):
+    with pytest.raises(ValueError):
+        list(read_chunks(source(CSV), "xml"))
+
+
+def test_validate_chunk_returns_rows_in_dataset_order():
+    chunk = pd.DataFrame({"Crm Cd Desc": ["BURGLARY"], "AREA NAME": ["Central"], "AREA": ["3"]})
+
+    frame, rejected, errors = validate_chunk(chunk)
+    assert rejected == 0 and errors == []
+    assert frame.columns.tolist()[:6] == ["DR_NO", "Date Rptd", "DATE OCC", "TIME OCC", "AREA", "AREA NAME"]
+    assert frame["AREA"].tolist() == [3]
@@ -0,0 +1,152 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from forecast_cube import HorizonCube
+from prediction_store import PredictionStore
+
+
+AREAS = {1: "Central", 2: "Rampart", 3: "Southwest", 7: "Wilshire"}
+CRIMES = {310: "BURGLARY", 510: "VEHICLE - STOLEN", 624: "BATTERY - SIMPLE ASSAULT", 930: "CRIMINAL THREATS"}
+AREA_CODES = {name: code for code, name in AREAS.items()}
+CRIME_CODES = {desc: code for code, desc in CRIMES.items()}
+
+FIRST_DAY = date(2026, 3, 1)
+DAYS = 20
+
+
+def make_records(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    areas = ["Central", "Rampart", "Southwest"]     # Wilshire has no predictions
+    crimes = ["BURGLARY", "VEHICLE - STOLEN", "BATTERY - SIMPLE ASSAULT"]
+    return [
+        {
+            "dates": (FIRST_DAY + timedelta(days=int(rng.integers(DAYS)))).strftime("%d/%m/%Y"),
+            "AREA NAME": areas[rng.integers(len(areas))],
+            "Crm Cd Desc": crimes[rng.integers(len(crimes))],
+            "Risk": "High",
+            "Probability": round(float(rng.uniform(50, 100)), 2),
+        }
+        for _ in range(n)
+    ]
+
+
+@pytest.fixture(scope="module")
+def records():
+    return make_records()
+
+
+@pytest.fixture(scope="module")
+def cube(records):
+    return HorizonCube.from_store(PredictionStore(records, "v1", AREAS, CRIMES))
+
+
+def brute_force(records, start, end):
+    sums, counts = defaultdict(float), defaultdict(int)
+    for r in records:
+        day = datetime.strptime(r["dates"], "%d/%m/%Y").date()
+        if start <= day <= end:
+            key = (AREA_CODES[r["AREA NAME"]], CRIME_CODES[r["Crm Cd Desc"]])
+            sums[key] += r["Probability"]
+            counts[key] += 1
+    return sums, counts
+
+
+def ranges():
+    rng = np.random.default_rng(1)
+    yield FIRST_DAY, FIRST_DAY + timedelta(days=DAYS - 1)
+    yield FIRST_DAY - timedelta(days=10), FIRST_DAY + timedelta(days=DAYS + 10)
+    yield FIRST_DAY - timedelta(days=10), FIRST_DAY - timedelta(days=1)
+    yield FIRST_DAY + timedelta(days=DAYS), FIRST_DAY + timedelta(days=DAYS + 5)
+    for _ in range(20):
+        lo, hi = sorted(rng.integers(-3, DAYS + 3, 2).tolist())
+        yield FIRST_DAY + timedelta(days=lo), FIRST_DAY + timedelta(days=hi)
+
+
+@pytest.mark.parametrize("start, end", list(ranges()))
+def test_range_sums_match_brute_force(records, cube, start, end):
+    sums, counts = cube.range_sums(start, end)
+    expected_sums, expected_counts = brute_force(records, start, end)
+
+    for i, area in enumerate(cube.area_codes):
+        for j, crm_cd in enumerate(cube.crime_codes):
+            key = (int(area), int(crm_cd))
+            assert counts[i, j] == expected_counts.get(key, 0)
+            assert sums[i, j] == pytest.approx(expected_sums.get(key, 0.0))
+
+
+def test_query_restricted_to_an_area_and_crime(records, cube):
+    start, end = FIRST_DAY + timedelta(days=3), FIRST_DAY + timedelta(days=9)
+    expected_sums, expected_counts = brute_force(records, start, end)
+
+    by_crime = cube.query(start, end, area=2)
+    assert by_crime["count"] == sum(c for (a, _), c in expected_counts.items() if a == 2)
+    assert set(by_crime["by_crm_cd"]) == {c for (a, c), n in expected_counts.items() if a == 2 and n}
+    assert by_crime["by_crm_cd"][310]["total_probability"] == pytest.approx(
+        expected_sums[(2, 310)], abs=0.01
+    )
+
+    by_area = cube.query(start, end, crm_cd=510)
+    assert by_area["by_area"][1]["count"] == expected_counts[(1, 510)]
+    assert by_area["by_area"][1]["mean_probability"] == pytest.approx(
+        expected_sums[(1, 510)] / expected_counts[(1, 510)], abs=1e-4
+    )
+
+
+def test_codes_without_predictions_are_zero(cube):
+    end = FIRST_DAY + timedelta(days=DAYS - 1)
+
+    assert cube.query(FIRST_DAY, end, area=7)["count"] == 0
+    assert cube.query(FIRST_DAY, end, crm_cd=930)["by_area"] == {}
+    assert cube.query(FIRST_DAY, end, area=7)["mean_probability"] is None
+
+
+def test_top_areas(records, cube):
+    start, end = FIRST_DAY + timedelta(days=5), FIRST_DAY + timedelta(days=14)
+    expected_sums, _ = brute_force(records, start, end)
+    totals = defaultdict(float)
+    for (area, _), total in expected_sums.items():
+        totals[area] += total
+    ranking = sorted(totals, key=totals.get, reverse=True)
+
+    top = cube.top_areas(start, end, k=2)["areas"]
+    assert [entry["AREA"] for entry in top] == ranking[:2]
+    assert top[0]["AREA NAME"] == AREAS[ranking[0]]
+    assert top[0]["total_probability"] == pytest.approx(totals[ranking[0]], abs=0.01)
+    # Areas without predictions are not ranked
+    assert len(cube.top_areas(start, end, k=10)["areas"]) == 3
+
+
+def test_top_areas_per_day_and_crime(records, cube):
+    start, end = FIRST_DAY + timedelta(days=2), FIRST_DAY + timedelta(days=4)
+
+    result = cube.top_areas(start, end, k=1, crm_cd=624, per_day=True)
+    assert [day["date"] for day in result["days"]] == ["03/03/2026", "04/03/2026", "05/03/2026"]
+    for offset, day in enumerate(result["days"]):
+        when = start + timedelta(days=offset)
+        expected_sums, _ = brute_force(records, when, when)
+        totals = {area: total for (area, code), total in expected_sums.items() if code == 624}
+        assert day["areas"][0]["AREA"] == max(totals, key=totals.get)
+
+
+@pytest.mark.parametrize("call", [
+    lambda cube: cube.range_sums(FIRST_DAY, FIRST_DAY, area=4),
+    lambda cube: cube.query(FIRST_DAY, FIRST_DAY, crm_cd=311),
+    lambda cube: cube.top_areas(FIRST_DAY, FIRST_DAY, crm_cd=999),
+    lambda cube: cube.top_areas(FIRST_DAY, FIRST_DAY, k=0),
+    lambda cube: cube.query(FIRST_DAY + timedelta(days=1), FIRST_DAY),
+    lambda cube: cube.top_areas(FIRST_DAY + timedelta(days=1), FIRST_DAY),
+])
+def test_invalid_queries(cube, call):
+    with pytest.raises(ValueError):
+        call(cube)
+
+
+def test_empty_store():
+    cube = HorizonCube.from_store(PredictionStore([], "v0", AREAS, CRIMES))
+
+    assert cube.days == 0
+    assert cube.query(FIRST_DAY, FIRST_DAY + timedelta(days=30))["count"] == 0
+    assert cube.top_areas(FIRST_DAY, FIRST_DAY + timedelta(days=30))["areas"] == []
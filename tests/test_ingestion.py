@@ -0,0 +1,98 @@
+import csv
+import os
+
+import pytest
+
+import ingestion
+from ingestion import CsvAppender, QueuedCsvWriter
+
+
+def dataset_rows(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))[1:]
+
+
+def flaky(function, failures):
+    """
+    Wrap ``function`` so its first ``failures`` calls raise
+    """
+    calls = {"count": 0}
+
+    def wrapper(*args):
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            raise OSError("disk unavailable")
+        return function(*args)
+
+    return wrapper
+
+
+def test_failed_commit_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "COMMIT_RETRY_DELAY", 0.01)
+    path = str(tmp_path / "dataset.csv")
+    writer = QueuedCsvWriter(path)
+    writer.appender.append = flaky(writer.appender.append, failures=1)
+
+    writer.append([["1", "a"]])
+    writer.append([["2", "b"]])
+    writer.close()
+
+    assert sorted(dataset_rows(path)) == [["1", "a"], ["2", "b"]]
+    assert os.listdir(f"{path}.spool") == []
+
+
+def test_failed_append_leaves_dataset_unchanged(tmp_path, monkeypatch):
+    path = str(tmp_path / "dataset.csv")
+    appender = CsvAppender(path)
+    appender.append([["1", "a"]])
+    # The rows reach the file, then the fsync fails, as a full disk would
+    monkeypatch.setattr(ingestion.os, "fsync", flaky(os.fsync, failures=1))
+
+    with pytest.raises(OSError):
+        appender.append([["2", "b"], ["3", "c"]])
+    assert dataset_rows(path) == [["1", "a"]]
+
+    appender.append([["2", "b"], ["3", "c"]])
+    assert dataset_rows(path) == [["1", "a"], ["2", "b"], ["3", "c"]]
+
+
+def test_segments_left_at_close_are_recovered(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "COMMIT_RETRY_DELAY", 0.01)
+    path = str(tmp_path / "dataset.csv")
+    writer = QueuedCsvWriter(path)
+    writer.appender.append = flaky(writer.appender.append, failures=1000)
+
+    writer.append([["1", "a"]])
+    writer.close()
+    assert not os.path.exists(path)
+
+    recovering = QueuedCsvWriter(path)
+    recovering.close()
+    assert dataset_rows(path) == [["1", "a"]]
+    assert os.listdir(f"{path}.spool") == []
+
+
+def test_recover_replays_segments_without_lock_file(tmp_path):
+    path = str(tmp_path / "dataset.csv")
+    spool = f"{path}.spool"
+    os.makedirs(spool)
+    with open(os.path.join(spool, "1-1.00000001.segment"), "w", newline="") as f:
+        csv.writer(f).writerow(["1", "a"])
+    with open(os.path.join(spool, "1-1.journal"), "w", newline="") as f:
+        csv.writer(f).writerow(["2", "b"])
+
+    writer = QueuedCsvWriter(path)
+    writer.close()
+
+    assert dataset_rows(path) == [["1", "a"], ["2", "b"]]
+    assert os.listdir(spool) == []
+
+
+def test_close_twice(tmp_path):
+    path = str(tmp_path / "dataset.csv")
+    writer = QueuedCsvWriter(path)
+    writer.append([["1", "a"]])
+    writer.close()
+    writer.close()
+
+    assert dataset_rows(path) == [["1", "a"]]
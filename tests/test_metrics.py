@@ -0,0 +1,113 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import instrumentation
+from instrumentation import InstrumentationMiddleware, ProfileStore
+from metrics import Histogram, Registry, STAGE_SECONDS, timer
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram([1, 5, 10])
+    for value in (0.5, 1, 3, 7, 20):
+        histogram.observe(value)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["buckets"] == {"1": 2, "5": 3, "10": 4, "+Inf": 5}
+    assert snapshot["count"] == 5
+    assert snapshot["sum"] == 31.5
+
+
+def test_render_histograms_and_gauges():
+    registry = Registry()
+    family = registry.histogram("test_seconds", "Test latency", ("route",), buckets=[1])
+    family.labels('/a"b').observe(0.5)
+    registry.gauge("test_depth", "Queue depth", lambda: 3)
+    registry.gauge("test_sizes", "Sizes", lambda: {("x",): 1, ("y",): None}, ("name",))
+
+    def not_loaded():
+        raise RuntimeError("not loaded")
+
+    registry.gauge("test_missing", "Unloaded component", not_loaded)
+
+    lines = registry.render().splitlines()
+    assert lines == [
+        "# HELP test_seconds Test latency",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="/a\\"b",le="1"} 1',
+        'test_seconds_bucket{route="/a\\"b",le="+Inf"} 1',
+        'test_seconds_sum{route="/a\\"b"} 0.5',
+        'test_seconds_count{route="/a\\"b"} 1',
+        "# HELP test_depth Queue depth",
+        "# TYPE test_depth gauge",
+        "test_depth 3.0",
+        "# HELP test_sizes Sizes",
+        "# TYPE test_sizes gauge",
+        'test_sizes{name="x"} 1.0',
+    ]
+
+
+def test_attached_histogram_is_rendered_unlabelled():
+    registry = Registry()
+    histogram = Histogram([1])
+    histogram.observe(2)
+    registry.attach("test_wait_seconds", "Wait", histogram)
+
+    assert 'test_wait_seconds_bucket{le="+Inf"} 1' in registry.render().splitlines()
+
+
+def test_timer_records_failed_stages():
+    before = STAGE_SECONDS.labels("test_stage").count
+    with pytest.raises(ValueError):
+        with timer("test_stage"):
+            raise ValueError("failed")
+
+    assert STAGE_SECONDS.labels("test_stage").count == before + 1
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(InstrumentationMiddleware)
+
+    @app.post("/items/{item_id}")
+    def item(item_id: int, body: dict):
+        return {"item_id": item_id}
+
+    client = TestClient(app)
+    latency = instrumentation.REQUEST_SECONDS
+    before = latency.labels("POST", "/items/{item_id}", "200").count
+    client.post("/items/1", json={"a": 1})
+    client.post("/items/2", json={"a": 2})
+    client.get("/nowhere")
+
+    assert latency.labels("POST", "/items/{item_id}", "200").count == before + 2
+    assert latency.labels("GET", "unmatched", "404").count >= 1
+    assert instrumentation.REQUEST_BYTES.labels("POST", "/items/{item_id}").sum >= 2 * len('{"a":1}')
+    assert instrumentation.RESPONSE_BYTES.labels("POST", "/items/{item_id}").sum >= 2 * len('{"item_id":1}')
+
+
+def test_profiled_request(monkeypatch):
+    monkeypatch.setattr(instrumentation, "PROFILING_ENABLED", True)
+    app = FastAPI()
+    app.add_middleware(InstrumentationMiddleware)
+
+    @app.get("/slow")
+    def slow():
+        sum(i * i for i in range(200_000))
+        return {}
+
+    response = TestClient(app).get("/slow", headers={"X-Profile": "1"})
+    profile = instrumentation.profiles.get(response.headers["x-profile-id"])
+
+    assert profile["path"] == "/slow"
+    assert profile["status"] == 200
+    assert sum(profile["stacks"].values()) >= profile["samples"] > 0
+
+
+def test_profile_store_keeps_the_most_recent():
+    store = ProfileStore(max_entries=2)
+    for profile_id in ("a", "b", "c"):
+        store.add(profile_id, {"id": profile_id, "stacks": {}})
+
+    assert store.get("a") is None
+    assert [summary["id"] for summary in store.summaries()] == ["b", "c"]
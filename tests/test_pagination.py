@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+from prediction_store import PredictionStore
+
+
+AREAS = {1: "Central", 2: "Rampart", 3: "Southwest", 4: "Hollenbeck", 5: "Harbor"}
+CRIMES = {310: "BURGLARY", 510: "VEHICLE - STOLEN"}
+
+
+def make_store(version):
+    start = datetime.now() - timedelta(days=3)
+    records = []
+    for offset in range(60):
+        day = (start + timedelta(days=offset)).strftime("%d/%m/%Y")
+        for i, area in enumerate(AREAS.values()):
+            # Areas appear in a different order on alternate days
+            if (offset + i) % 3:
+                records.append({
+                    "dates": day,
+                    "AREA NAME": area,
+                    "Crm Cd Desc": CRIMES[310 if offset % 2 else 510],
+                    "Risk": "High",
+                    "Probability": 60.0 + i + offset / 10,
+                })
+    return PredictionStore(records, version, AREAS, CRIMES)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = make_store("v1")
+    monkeypatch.setattr(app, "get_prediction_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def client():
+    # No lifespan: the routes under test only need the patched store
+    return TestClient(app.app)
+
+
+def all_pages(client, params):
+    entries = []
+    response = client.get("/predictions", params=params).json()
+    entries.extend(response["predictions"])
+    while response["next_cursor"] is not None:
+        response = client.get(
+            "/predictions", params={**params, "cursor": response["next_cursor"]}
+        ).json()
+        entries.extend(response["predictions"])
+    return entries
+
+
+@pytest.mark.parametrize("limit", [1, 2, 4, 5, 10])
+@pytest.mark.parametrize("filter", ["today", "aweek", "amonth"])
+def test_pages_join_up_to_the_unpaginated_response(store, client, filter, limit):
+    unpaginated = client.get("/predictions", params={"filter": filter}).json()["predictions"]
+
+    assert all_pages(client, {"filter": filter, "limit": limit}) == unpaginated
+    assert [entry["AREA NAME"] for entry in unpaginated]
+
+
+def test_cursor_alone_pages_by_the_default_size(store, client):
+    unpaginated = client.get("/predictions", params={"filter": "amonth"}).json()["predictions"]
+    _, lo, hi = app.prediction_window("amonth")
+
+    response = client.get("/predictions", params={"cursor": app.encode_cursor("v1", lo, hi, 0)}).json()
+    assert response["predictions"] == unpaginated[:app.DEFAULT_PAGE_SIZE]
+
+
+def test_cursor_pins_the_window(store, client, monkeypatch):
+    first = client.get("/predictions", params={"filter": "aweek", "limit": 2}).json()
+    expected = all_pages(client, {"filter": "aweek", "limit": 2})[2:]
+
+    # A day later the window would move, but the cursor keeps the first page's
+    later = datetime.now() + timedelta(days=1)
+    monkeypatch.setattr(app, "get_date_range", lambda filter: (later, later + timedelta(days=7)))
+    assert all_pages(client, {"cursor": first["next_cursor"], "limit": 2}) == expected
+
+
+def test_regenerated_predictions_expire_cursors(store, client, monkeypatch):
+    first = client.get("/predictions", params={"filter": "amonth", "limit": 2}).json()
+    regenerated = make_store("v2")
+    monkeypatch.setattr(app, "get_prediction_store", lambda: regenerated)
+
+    response = client.get("/predictions", params={"cursor": first["next_cursor"], "limit": 2})
+    assert response.status_code == 410
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "bnVsbA==", app.encode_cursor("v1", 0, 1, 0)[:-4]])
+def test_invalid_cursor(store, client, cursor):
+    response = client.get("/predictions", params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+def test_compact_format_is_not_paginated(store, client):
+    response = client.get("/predictions", params={"format": "compact", "limit": 2})
+    assert response.status_code == 400
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from prediction_store import PredictionStore
+
+
+AREAS = {1: "Central", 2: "Rampart"}
+CRIMES = {310: "BURGLARY", 510: "VEHICLE - STOLEN"}
+
+
+def record(day, area="Central", crime="BURGLARY", probability=90.0):
+    return {
+        "dates": day.strftime("%d/%m/%Y"),
+        "AREA NAME": area,
+        "Crm Cd Desc": crime,
+        "Risk": "High",
+        "Probability": probability,
+    }
+
+
+def make_records(start, days):
+    records = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        records.append(record(day, "Central", "BURGLARY", 80 + offset))
+        records.append(record(day, "Rampart", "VEHICLE - STOLEN", 50 + offset))
+    return records
+
+
+def legacy_window(records, start_date, end_date):
+    # The filter /predictions applied before the store: dates at midnight
+    # compared against the bounds, including their time of day
+    return [
+        r for r in records
+        if start_date <= datetime.strptime(r["dates"], "%d/%m/%Y") < end_date
+    ]
+
+
+@pytest.mark.parametrize("hour", [0, 10, 23])
+@pytest.mark.parametrize("days", [1, 7, 14, 30])
+def test_window_matches_legacy_filter(hour, days):
+    now = datetime(2026, 3, 10, hour, 30 if hour else 0)
+    records = make_records(datetime(2026, 3, 1), 60)
+    store = PredictionStore(records, "v1", AREAS, CRIMES)
+
+    assert store.window(now, now + timedelta(days=days)) == legacy_window(
+        records, now, now + timedelta(days=days)
+    )
+
+
+def test_today_after_midnight_is_tomorrow():
+    records = make_records(datetime(2026, 3, 9), 3)
+    store = PredictionStore(records, "v1", AREAS, CRIMES)
+
+    now = datetime(2026, 3, 10, 10, 0)
+    dates = {r["dates"] for r in store.window(now, now + timedelta(days=1))}
+
+    # Today's predictions dated 10/03 00:00 fall before "now"
+    assert dates == {"11/03/2026"}
+
+
+def test_today_at_midnight_includes_today():
+    records = make_records(datetime(2026, 3, 9), 3)
+    store = PredictionStore(records, "v1", AREAS, CRIMES)
+
+    now = datetime(2026, 3, 10)
+    dates = {r["dates"] for r in store.window(now, now + timedelta(days=1))}
+
+    assert dates == {"10/03/2026"}
+
+
+def test_records_are_date_sorted_and_unparsable_dates_dropped():
+    records = [
+        record(datetime(2026, 3, 12), "Rampart"),
+        {**record(datetime(2026, 3, 11)), "dates": "not a date"},
+        record(datetime(2026, 3, 11), "Central"),
+        record(datetime(2026, 3, 12), "Central"),
+    ]
+    store = PredictionStore(records, "v1", AREAS, CRIMES)
+
+    rows = store.window(datetime(2026, 3, 1), datetime(2026, 4, 1))
+    assert len(store) == 3
+    assert [(r["dates"], r["AREA NAME"]) for r in rows] == [
+        ("11/03/2026", "Central"),
+        ("12/03/2026", "Rampart"),
+        ("12/03/2026", "Central"),
+    ]
+
+
+def test_empty_and_out_of_range_windows():
+    store = PredictionStore(make_records(datetime(2026, 3, 1), 5), "v1", AREAS, CRIMES)
+
+    assert store.window(datetime(2027, 1, 1), datetime(2027, 2, 1)) == []
+    assert store.window_bounds(datetime(2026, 3, 3), datetime(2026, 3, 2)) == (4, 4)
+    assert PredictionStore([], "v1").window(datetime(2026, 3, 1), datetime(2026, 4, 1)) == []
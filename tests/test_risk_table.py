@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from model_serving import FeatureScaler
+from risk_table import SCALE, RiskTable, load_risk_table, metadata_path, model_fingerprint
+
+
+AXES = [[1, 2, 3], [310, 510], [0, 1], [0, 4, 7], [0, 2], [2026, 2027], [0, 1]]
+
+
+@pytest.fixture
+def table():
+    shape = tuple(len(values) for values in AXES)
+    cells = np.random.default_rng(0).integers(0, 65536, size=shape, dtype=np.uint16)
+    return RiskTable(cells, AXES, {"model_sha256": "m", "scaler_sha256": "s"})
+
+
+def grid_rows(n, seed=1):
+    rng = np.random.default_rng(seed)
+    indices = np.column_stack([rng.integers(0, len(values), n) for values in AXES])
+    rows = np.column_stack([np.asarray(values)[indices[:, j]] for j, values in enumerate(AXES)])
+    return rows.astype(np.float32), indices
+
+
+def test_batch_lookup_hits(table):
+    X, indices = grid_rows(200)
+
+    probabilities, hit = table.lookup(X)
+
+    assert hit.all()
+    expected = table.table[tuple(indices.T)] / SCALE
+    np.testing.assert_array_equal(probabilities, expected)
+
+
+def test_single_row_lookup_matches_batch(table):
+    X, _ = grid_rows(20)
+    batch, _ = table.lookup(X)
+
+    for row, expected in zip(X, batch):
+        probability, hit = table.lookup(row)
+        assert hit.tolist() == [True]
+        assert probability[0] == expected
+
+
+@pytest.mark.filterwarnings("ignore:invalid value encountered in cast")
+@pytest.mark.parametrize("column, value", [
+    (0, 4),         # past the last area
+    (1, 311),       # between crime codes
+    (3, 2),         # inside the range of an axis but not on it
+    (5, 2025),      # year not covered
+    (2, -1),
+    (4, 0.5),
+    (6, np.nan),
+])
+def test_rows_off_the_grid_miss(table, column, value):
+    X, _ = grid_rows(3)
+    X[1, column] = value
+
+    probabilities, hit = table.lookup(X)
+    assert hit.tolist() == [True, False, True]
+    assert np.isnan(probabilities[1])
+
+    probability, hit = table.lookup(X[1])
+    assert hit.tolist() == [False]
+    assert np.isnan(probability[0])
+
+
+def test_stale_or_unscaled_table_is_not_loaded(tmp_path, table):
+    path = str(tmp_path / "risk_table.npy")
+    model_path = str(tmp_path / "model.npz")
+    scaler_path = str(tmp_path / "scaler.json")
+    with open(model_path, "wb") as f:
+        f.write(b"weights")
+    FeatureScaler.identity().save(scaler_path)
+
+    np.save(path, table.table)
+    with open(metadata_path(path), "w") as f:
+        json.dump({"axes": AXES, "fingerprint": model_fingerprint(model_path, scaler_path)}, f)
+
+    loaded = load_risk_table(path, model_path, scaler_path)
+    assert loaded is not None
+    np.testing.assert_array_equal(loaded.table, table.table)
+
+    with open(model_path, "wb") as f:
+        f.write(b"retrained weights")
+    assert load_risk_table(path, model_path, scaler_path) is None
+
+    assert load_risk_table(path, model_path, str(tmp_path / "missing.json")) is None
+    assert load_risk_table(str(tmp_path / "missing.npy"), model_path, scaler_path) is None
@@ -0,0 +1,126 @@
+import json
+import os
+
+import pytest
+
+from ingestion import CSV_COLUMNS, CsvAppender
+from storage import CONVERSION_FILE, CsvStore, ParquetStore, convert_csv, open_store, parquet_path
+
+
+def row(area_name, area, crm_cd, date_occ, lat=34.05):
+    values = dict.fromkeys(CSV_COLUMNS, "")
+    values.update({
+        "AREA NAME": area_name,
+        "AREA": str(area),
+        "Crm Cd": str(crm_cd),
+        "DATE OCC": date_occ,
+        "LAT": str(lat),
+    })
+    return [values[col] for col in CSV_COLUMNS]
+
+
+ROWS = [
+    row("Central", 1, 310, "01/15/2023 12:00:00 AM"),
+    row("Central", 1, 510, "02/03/2024 12:00:00 AM"),
+    row("Rampart", 2, 310, "02/20/2024 12:00:00 AM"),
+    row("Rampart", 2, 624, "11/05/2024 12:00:00 AM"),
+]
+
+FILTERS = [("year", "==", 2024), ("AREA", "in", [1, 2])]
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = str(tmp_path / "dataset.csv")
+    CsvAppender(path).append(ROWS)
+    return path
+
+
+def counts(df):
+    return df["AREA NAME"].astype(str).value_counts().to_dict()
+
+
+def test_csv_store_reads_typed_columns_and_filters(csv_path):
+    df = CsvStore(csv_path).read(columns=["AREA NAME", "Crm Cd", "month"], filters=FILTERS)
+
+    assert list(df.columns) == ["AREA NAME", "Crm Cd", "month"]
+    assert str(df["AREA NAME"].dtype) == "category"
+    assert str(df["Crm Cd"].dtype) == "Int64"
+    assert df["Crm Cd"].tolist() == [510, 310, 624]
+    assert df["month"].tolist() == [2, 2, 11]
+
+
+def test_csv_store_reads_from_offset(csv_path):
+    with open(csv_path, "rb") as f:
+        f.readline()
+        f.readline()
+        offset = f.tell()
+
+    df = CsvStore(csv_path, offset).read(columns=["Crm Cd"])
+    assert df["Crm Cd"].tolist() == [510, 310, 624]
+
+
+def test_missing_csv_has_no_columns(tmp_path):
+    assert CsvStore(str(tmp_path / "missing.csv")).columns() == []
+
+
+def test_parquet_store_matches_csv(csv_path):
+    pytest.importorskip("pyarrow")
+    assert convert_csv(csv_path) == len(ROWS)
+
+    store = open_store(csv_path)
+    assert isinstance(store, ParquetStore)
+    columns = ["AREA NAME", "AREA", "Crm Cd"]
+    parquet = store.read(columns=columns, filters=FILTERS)
+    csv = CsvStore(csv_path).read(columns=columns, filters=FILTERS)
+    key = ["AREA", "Crm Cd"]
+    assert (
+        parquet.sort_values(key).reset_index(drop=True).astype(str)
+        .equals(csv.sort_values(key).reset_index(drop=True).astype(str))
+    )
+
+
+def test_rows_appended_after_conversion_are_read(csv_path):
+    pytest.importorskip("pyarrow")
+    convert_csv(csv_path)
+    CsvAppender(csv_path).append([row("Harbor", 5, 310, "03/01/2024 12:00:00 AM")] * 2)
+
+    store = open_store(csv_path)
+    assert isinstance(store, ParquetStore)
+    assert counts(store.read(columns=["AREA NAME"])) == {"Central": 2, "Rampart": 2, "Harbor": 2}
+    assert counts(store.read(columns=["AREA NAME"], filters=[("year", "==", 2024)])) == {
+        "Central": 1, "Rampart": 2, "Harbor": 2,
+    }
+    # Whole rows from the tail get the partition columns too
+    assert store.read()["year"].notna().all()
+
+
+def test_parquet_copy_without_conversion_record_is_not_used(csv_path):
+    pytest.importorskip("pyarrow")
+    convert_csv(csv_path)
+    os.remove(os.path.join(parquet_path(csv_path), CONVERSION_FILE))
+
+    assert isinstance(open_store(csv_path), CsvStore)
+
+
+def test_parquet_copy_of_a_longer_csv_is_not_used(csv_path):
+    pytest.importorskip("pyarrow")
+    convert_csv(csv_path)
+    record = os.path.join(parquet_path(csv_path), CONVERSION_FILE)
+    with open(record, "w") as f:
+        json.dump({"csv_bytes": os.path.getsize(csv_path) + 1, "rows": len(ROWS)}, f)
+
+    assert isinstance(open_store(csv_path), CsvStore)
+
+
+def test_crime_storage_csv_forces_the_csv(csv_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    convert_csv(csv_path)
+    monkeypatch.setenv("CRIME_STORAGE", "csv")
+
+    assert isinstance(open_store(csv_path), CsvStore)
+
+
+def test_unsupported_filter_op(csv_path):
+    with pytest.raises(ValueError):
+        CsvStore(csv_path).read(filters=[("year", "~", 2024)])
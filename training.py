@@ -0,0 +1,303 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from feature_encoders import ENCODED_COLUMNS, FeatureEncoder, raw_features
+from model_export import export_model
+from model_serving import FEATURE_COLUMNS, FeatureScaler
+from storage import csv_dtypes
+
+
+# Columns of the crime CSV the training set is built from
+SOURCE_COLUMNS = [
+    "AREA", "AREA NAME", "Crm Cd", "Vict Sex", "Vict Descent", "Weapon Desc",
+    "Status Desc", "DATE OCC", "Crm Cd 1", "Premis Cd",
+]
+
+CANDIDATES = ["logistic_regression", "random_forest", "xgboost", "mlp"]
+
+ARTIFACTS_DIR = "artifacts"
+
+
+def clean_chunk(df):
+    """
+    Apply the notebook's row filtering to a chunk of the crime CSV
+
+    Drops rows without Crm Cd 1 or Premis Cd, or without a parseable DATE
+    OCC, and derives the model's input columns with ``raw_features``. Text
+    features stay raw, as categoricals, for the fitted FeatureEncoder.
+
+    Returns:
+        DataFrame: AREA NAME and FEATURE_COLUMNS
+    """
+    df = df.dropna(subset=["Crm Cd 1", "Premis Cd", "AREA", "Crm Cd"])
+    features = raw_features(df)
+    features = features[features["year"].notna()]
+    return pd.DataFrame(
+        {
+            "AREA NAME": df.loc[features.index, "AREA NAME"].astype("category"),
+            **{
+                col: features[col].astype("category" if col in ENCODED_COLUMNS else "int16")
+                for col in FEATURE_COLUMNS
+            },
+        }
+    )
+
+
+def read_training_frame(csv_path, chunksize=500_000):
+    """
+    Read and clean the crime CSV in typed chunks
+
+    Text columns are kept as categoricals, so the cleaned frame of the full
+    dataset is a fraction of the size of the raw CSV.
+
+    Args:
+        csv_path (str): Crime_Data_from_2020_to_Present.csv or a compatible file
+        chunksize (int): Rows parsed per chunk, bounds peak memory
+
+    Returns:
+        DataFrame: Cleaned rows, see ``clean_chunk``
+    """
+    chunks = []
+    for chunk in pd.read_csv(
+        csv_path, usecols=SOURCE_COLUMNS, dtype=csv_dtypes(SOURCE_COLUMNS), chunksize=chunksize
+    ):
+        chunks.append(clean_chunk(chunk))
+        logging.info(f"Read {sum(len(c) for c in chunks)} training rows from {csv_path}.")
+    frame = {}
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            frame[col] = union_categoricals([chunk[col] for chunk in chunks])
+        else:
+            frame[col] = np.concatenate([chunk[col].to_numpy() for chunk in chunks])
+    return pd.DataFrame(frame)
+
+
+def risk_labels(area_names):
+    """
+    1 for records in areas with more crimes than the median area, else 0
+
+    This is the notebook's 'High risk' split, which hard-coded the median
+    area count of its extract.
+    """
+    counts = area_names.value_counts()
+    high_risk = counts[counts > counts.quantile(0.5)].index
+    return area_names.isin(high_risk).to_numpy().astype(np.int8)
+
+
+def build_features(df):
+    """
+    Fit the feature encoders and encode a cleaned frame with them
+
+    Returns:
+        tuple: float32 X in FEATURE_COLUMNS order, int8 y and the fitted
+        FeatureEncoder
+    """
+    encoder = FeatureEncoder.fit(df)
+    return encoder.transform(df), risk_labels(df["AREA NAME"]), encoder
+
+
+def split_indices(n, test_size=0.2, seed=42):
+    order = np.random.default_rng(seed).permutation(n)
+    n_test = int(round(n * test_size))
+    return order[n_test:], order[:n_test]
+
+
+def _fit_candidate(name, data_dir, out_dir, n_jobs, seed):
+    """
+    Train one candidate model in a worker process and save it
+
+    Returns:
+        dict: Model file name, accuracies and training time
+    """
+    X_train = np.load(os.path.join(data_dir, "X_train.npy"), mmap_mode="r")
+    y_train = np.load(os.path.join(data_dir, "y_train.npy"), mmap_mode="r")
+    X_test = np.load(os.path.join(data_dir, "X_test.npy"), mmap_mode="r")
+    y_test = np.load(os.path.join(data_dir, "y_test.npy"), mmap_mode="r")
+    started = time.perf_counter()
+
+    if name == "mlp":
+        try:
+            from tensorflow import keras
+        except ImportError:
+            import keras
+
+        model = keras.Sequential([
+            keras.Input(shape=(len(FEATURE_COLUMNS),)),
+            keras.layers.Dense(64, activation="relu"),
+            keras.layers.Dense(32, activation="relu"),
+            keras.layers.Dense(1, activation="sigmoid"),
+        ])
+        model.compile(optimizer="adam", loss="binary_crossentropy", metrics=["accuracy"])
+        model.fit(X_train, y_train, epochs=5, batch_size=1024, validation_split=0.1, verbose=0)
+        model_file = f"{name}.h5"
+        model.save(os.path.join(out_dir, model_file))
+
+        def predict(X):
+            return (model.predict(X, batch_size=65536, verbose=0).reshape(-1) >= 0.5).astype(np.int8)
+    else:
+        import joblib
+
+        if name == "logistic_regression":
+            from sklearn.linear_model import LogisticRegression
+
+            model = LogisticRegression(max_iter=1000)
+        elif name == "random_forest":
+            from sklearn.ensemble import RandomForestClassifier
+
+            model = RandomForestClassifier(n_estimators=100, n_jobs=n_jobs, random_state=seed)
+        elif name == "xgboost":
+            import xgboost as xgb
+
+            model = xgb.XGBClassifier(
+                n_estimators=100, learning_rate=0.1, random_state=seed, n_jobs=n_jobs
+            )
+        else:
+            raise ValueError(f"Unknown candidate model: {name}")
+        model.fit(X_train, y_train)
+        model_file = f"{name}.joblib"
+        joblib.dump(model, os.path.join(out_dir, model_file))
+        predict = model.predict
+
+    train_seconds = time.perf_counter() - started
+    return {
+        "model": model_file,
+        "train_seconds": train_seconds,
+        "train_accuracy": float(np.mean(predict(X_train) == y_train)),
+        "test_accuracy": float(np.mean(predict(X_test) == y_test)),
+    }
+
+
+def run_training(csv_path, artifacts_dir=ARTIFACTS_DIR, candidates=CANDIDATES,
+                 sample=None, chunksize=500_000, workers=None, seed=42):
+    """
+    Train every candidate on the crime dataset and write a versioned artifact
+
+    Candidates train concurrently, one process each, on the same scaled
+    split. The artifact directory ``<artifacts_dir>/<version>`` holds each
+    candidate's model, the scaler, the fitted feature encoders and a manifest
+    naming the most accurate model; ``<artifacts_dir>/current`` is then
+    pointed at the new version.
+
+    Args:
+        csv_path (str): Crime dataset CSV
+        artifacts_dir (str): Root directory of artifact versions
+        candidates (list): Names from CANDIDATES to train
+        sample (int): Train on this many sampled rows instead of all rows
+        chunksize (int): Rows per CSV chunk
+        workers (int): Parallel training processes, one per candidate by default
+        seed (int): Seed of the sample, the split and the models
+
+    Returns:
+        str: Path of the new artifact version
+    """
+    started = time.perf_counter()
+    df = read_training_frame(csv_path, chunksize)
+    if sample is not None and sample < len(df):
+        df = df.sample(n=sample, random_state=seed)
+    X, y, encoder = build_features(df)
+    del df
+    train, test = split_indices(len(X), seed=seed)
+    scaler = FeatureScaler(X[train].mean(axis=0), X[train].std(axis=0))
+    scaler.scale[scaler.scale == 0] = 1
+    logging.info(f"Prepared {len(X)} rows in {time.perf_counter() - started:.1f}s.")
+
+    version = datetime.now().strftime("%Y%m%d-%H%M%S")
+    out_dir = os.path.join(artifacts_dir, version)
+    os.makedirs(out_dir)
+    scaler.save(os.path.join(out_dir, "scaler.json"))
+    encoder.save(os.path.join(out_dir, "encoders.json"))
+
+    # Workers memory-map the split instead of receiving pickled copies
+    data_dir = tempfile.mkdtemp(prefix="crps-train-")
+    try:
+        np.save(os.path.join(data_dir, "X_train.npy"), scaler.transform(X[train]))
+        np.save(os.path.join(data_dir, "y_train.npy"), y[train])
+        np.save(os.path.join(data_dir, "X_test.npy"), scaler.transform(X[test]))
+        np.save(os.path.join(data_dir, "y_test.npy"), y[test])
+        del X, y
+
+        workers = workers or len(candidates)
+        n_jobs = max(1, (os.cpu_count() or 1) // workers)
+        results = {}
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {
+                name: pool.submit(_fit_candidate, name, data_dir, out_dir, n_jobs, seed)
+                for name in candidates
+            }
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                    logging.info(f"Trained {name}: {results[name]}")
+                except Exception as e:
+                    results[name] = {"error": str(e)}
+                    logging.error(f"Error training {name}: {e}")
+    finally:
+        shutil.rmtree(data_dir)
+
+    trained = {name: result for name, result in results.items() if "error" not in result}
+    if not trained:
+        raise RuntimeError("No candidate model trained successfully.")
+    best = max(trained, key=lambda name: trained[name]["test_accuracy"])
+    manifest = {
+        "version": version,
+        "source": os.path.abspath(csv_path),
+        "rows": {"train": int(len(train)), "test": int(len(test))},
+        "features": FEATURE_COLUMNS,
+        "model": trained[best]["model"],
+        "best": best,
+        "scaler": "scaler.json",
+        "encoders": "encoders.json",
+        "encoders_version": encoder.version,
+        "candidates": results,
+        "seconds": time.perf_counter() - started,
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    # Serving prefers the NumPy export when one can be made
+    if best in ("mlp", "xgboost"):
+        try:
+            export_model(os.path.join(out_dir, manifest["model"]))
+        except Exception as e:
+            logging.warning(f"Could not export {best} to NumPy: {e}")
+
+    current = os.path.join(artifacts_dir, "current")
+    with open(f"{current}.tmp", "w") as f:
+        f.write(version)
+    os.replace(f"{current}.tmp", current)
+    logging.info(f"Wrote artifact {out_dir}; best model is {best}.")
+    return out_dir
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    parser = argparse.ArgumentParser(
+        description="Train the hotspot model candidates on the crime dataset."
+    )
+    parser.add_argument("csv_path")
+    parser.add_argument("--artifacts-dir", default=ARTIFACTS_DIR)
+    parser.add_argument("--candidates", nargs="+", choices=CANDIDATES, default=CANDIDATES)
+    parser.add_argument("--sample", type=int, help="train on a sample of this many rows")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    run_training(
+        args.csv_path, args.artifacts_dir, args.candidates, args.sample,
+        args.chunksize, args.workers, args.seed,
+    )